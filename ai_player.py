@@ -8,54 +8,151 @@
   5. 尾牌加速: 手牌少时主动出大牌抢控制权
 """
 
-SUITS = ['diamond', 'club', 'heart', 'spade']
-RANKS = ['3','4','5','6','7','8','9','10','J','Q','K','A','2']
-RANK_ORDER = {r: i for i, r in enumerate(RANKS)}
+import json
+import os
+
+from cards import SUITS, RANKS, RANK_ORDER, SUIT_ORDER, classify_cards, classify_signature, signature
+from move_gen import legal_moves
+from decision_log import DecisionTrace, LazyCards
+from opponent_model import OpponentModel
+from hand_solver import best_next_play, min_plays
+from endgame import PASS, THREAD_TABLE_SIZE, TIME_BUDGET, ThreadLocalSolver, is_endgame, take_cards
+from opening_book import default_book
+
+# 跟单张只剩 2 可压时, 对手有炸弹的概率低于此值就出 2 抢出牌权
+BOMB_RISK = 0.1
+# 开局表估计的胜率不低于此值时跟牌转入进攻
+AGGRESSIVE_WIN_RATE = 0.6
+
+# 可调的决策阈值: 名字 -> (缺省值, 下限, 上限); 缺省值即原先写死的规则, 整数参数的上下限也是整数
+PARAM_SPACE = {
+    'urgent_enemy': (2, 1, 5),              # 对手最少牌数不超过此值时进入紧急
+    'urgent_enemy_quiet': (3, 1, 6),        # 最近无人过牌时, 对手最少牌数不超过此值也算紧急
+    'aggressive_count': (4, 1, 8),          # 自己手牌不超过此值时跟牌进攻
+    'aggressive_count_passing': (6, 1, 10), # 对手频繁过牌时, 自己手牌不超过此值也进攻
+    'aggressive_passes': (2, 1, 6),         # "对手频繁过牌"的最近过牌次数
+    'few_cards': (6, 1, 13),                # 手牌不超过此值时大牌也跟
+    'play_anyway': (10, 5, 14),             # 手牌不少于此值时即使只剩大牌也跟单张
+    'bomb_risk': (BOMB_RISK, 0.0, 0.5),
+    'aggressive_win_rate': (AGGRESSIVE_WIN_RATE, 0.3, 1.0),
+}
+# 已删除的参数(跟单张时候选从小到大, 这几个阈值不影响出哪张); 读旧参数文件时忽略
+RETIRED_PARAMS = ('safe_limit', 'safe_limit_late', 'late_high_cards')
+
+PARAMS_PATH = os.environ.get('AI_PARAMS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ai_params.json'))
 
 def rv(rank):
     return RANK_ORDER[rank]
 
 def ck(c):
-    return (RANK_ORDER[c[1]], SUITS.index(c[0]))
+    return (RANK_ORDER[c[1]], SUIT_ORDER[c[0]])
 
 
-class AIPlayer:
+class AIParams:
+    """一组决策阈值; 未给出的取 PARAM_SPACE 的缺省值"""
+    __slots__ = tuple(PARAM_SPACE)
+
+    def __init__(self, **values):
+        for name, (default, lo, hi) in PARAM_SPACE.items():
+            value = values.pop(name, default)
+            if not lo <= value <= hi:
+                raise ValueError(f'AI param {name}={value} out of range [{lo}, {hi}]')
+            setattr(self, name, type(default)(value))
+        if values:
+            raise ValueError(f'unknown AI params {sorted(values)}')
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in PARAM_SPACE}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            values = json.load(f)
+        for name in RETIRED_PARAMS:
+            values.pop(name, None)
+        return cls(**values)
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def __eq__(self, other):
+        return isinstance(other, AIParams) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        changed = ', '.join(f'{k}={v!r}' for k, v in self.to_dict().items() if v != PARAM_SPACE[k][0])
+        return f'AIParams({changed})'
 
-    def decide(self, hand, last_type, last_value, last_count, is_free, first_turn, other_counts, player_idx, history=None):
-        log = []
+
+def default_params():
+    """PARAMS_PATH 存在时读取调好的参数, 否则为缺省参数"""
+    return AIParams.load(PARAMS_PATH) if os.path.exists(PARAMS_PATH) else AIParams()
+
+
+class AIPlayer:
+    # 决策阈值(tune.py 离线调参); 实例可传入自己的一组
+    params = default_params()
+    # 残局求解器: 每个线程一个(置换表在线程内跨对局复用, AI 调度器的线程之间互不加锁), 有时间预算;
+    # 置为 None 关闭残局搜索
+    endgame = ThreadLocalSolver(time_budget=TIME_BUDGET, table_size=THREAD_TABLE_SIZE)
+    # 开局手牌强度表(mmap 共享); 没有表文件时为 None, 沿用原有规则
+    book = default_book()
+
+    def __init__(self, params=None):
+        if params is not None:
+            self.params = params
+
+    def decide(self, hand, last_type, last_value, last_count, is_free, first_turn, other_counts, player_idx,
+               history=None, tracker=None, trace=None):
+        # trace 为 NULL_TRACE 时思考过程不记录也不格式化; 缺省时记录完整过程
+        log = DecisionTrace() if trace is None else trace
         hand = sorted(hand, key=ck)
         groups = self._group(hand)
-        log.append(f"手牌({len(hand)}): {' '.join(c[1] for c in hand)}")
+        log.append("手牌(%d): %s", len(hand), LazyCards(hand))
 
         min_enemy = min(other_counts[i] for i in range(4) if i != player_idx)
-        log.append(f"对手最少牌数: {min_enemy}")
+        log.append("对手最少牌数: %s", min_enemy)
 
-        self.history_profile = self._analyze_history(history or [], player_idx)
+        # 有记牌器时 O(1) 读取整局信息, 否则退回扫描最近历史
+        if tracker is not None:
+            self.history_profile = tracker.profile(player_idx)
+            self.opponents = OpponentModel(tracker, hand, player_idx, other_counts)
+        else:
+            self.history_profile = self._analyze_history(history or [], player_idx)
+            self.opponents = None
         hp = self.history_profile
-        log.append(
-            f"历史观测: 最近过牌{hp['recent_enemy_passes']}次 高牌已见{hp['high_cards_seen']}/8 炸弹已见{hp['bombs_seen']}"
-        )
+        log.append("历史观测: 最近过牌%s次 高牌已见%s/8 炸弹已见%s",
+                   hp['recent_enemy_passes'], hp['high_cards_seen'], hp['bombs_seen'])
 
+        # 合法出法只生成一次, 各策略分支在其上筛选
         if is_free:
-            result = self._free_play(hand, groups, first_turn, min_enemy, log)
+            moves = legal_moves(hand)
+            result = self._free_play(hand, groups, moves, first_turn, min_enemy, log)
         else:
-            result = self._response_play(hand, groups, last_type, last_value, last_count, min_enemy, log)
+            moves = legal_moves(hand, last_type, last_value, last_count)
+            result = self._response_play(hand, groups, moves, last_type, last_value, last_count, min_enemy, log)
+
+        # 残局: 四家牌都很少时用搜索校验启发式的选择
+        if (self.endgame is not None and tracker is not None and not first_turn
+                and is_endgame(hand, other_counts, player_idx)):
+            last = None if is_free else (last_type, last_value, last_count)
+            result = self._endgame_play(hand, result, last, player_idx, tracker, log)
 
         if result:
-            log.append(f"决策 -> 出: {' '.join(c[1] for c in result)}")
+            log.append("决策 -> 出: %s", LazyCards(result))
         else:
-            log.append(f"决策 -> 不出")
+            log.append("决策 -> 不出")
         return log, result
 
     # ========== 自由出牌 ==========
 
-    def _free_play(self, hand, groups, first_turn, min_enemy, log):
+    def _free_play(self, hand, groups, moves, first_turn, min_enemy, log):
         if first_turn:
-            return self._first_turn_play(hand, groups, log)
+            return self._first_turn_play(hand, groups, moves, log)
 
         decomp = self._decompose(hand, groups, log)
         hp = getattr(self, 'history_profile', {})
-        urgent = min_enemy <= 2 or (min_enemy <= 3 and hp.get('recent_enemy_passes', 0) == 0)
+        urgent = self._urgent(min_enemy, hp)
 
         kill_shot = self._find_kill_shot(hand)
         if kill_shot:
@@ -70,8 +167,7 @@ class AIPlayer:
 
         # 手牌<=2张直接全出(如果合法)
         if len(hand) <= 2:
-            from game_logic import classify_hand
-            t, v = classify_hand(hand)
+            t, v = classify_cards(hand)
             if t:
                 log.append("手牌很少，直接全出")
                 return list(hand)
@@ -79,90 +175,53 @@ class AIPlayer:
         # 紧急: 对手快赢了，出炸弹或最大的牌抢控制
         if urgent:
             log.append("对手快赢了! 紧急出牌")
-            bombs = self._find_bombs(hand)
+            bombs = self._moves_of(moves, 'bomb')
             if bombs:
                 log.append("用炸弹压制")
                 return list(bombs[-1])
 
-        # 手牌结构过碎时，优先减少孤张，避免后续被卡单
-        if decomp['singles'] >= 4 and decomp['pairs'] <= 1:
-            singles = self._get_smart_singles(hand, groups)
-            if singles:
-                log.append(f"手牌偏碎，先走单张{singles[0][1]}")
-                return [singles[0]]
-
-        # 策略优先级: 飞机 > 顺子 > 连对 > 三带二 > 对子 > 单张
-        # 优先出张数多的组合来快速减手牌
-
-        # 飞机
-        air = self._find_airplanes(hand)
-        if air:
-            air.sort(key=lambda a: -len(a))
-            log.append("出飞机(大组合优先)")
-            return list(air[0])
-
-        # 顺子
-        straights = self._find_straights(hand)
-        if straights:
-            straights.sort(key=lambda s: (-len(s), min(rv(c[1]) for c in s)))
-            log.append("出顺子(最长优先)")
-            return list(straights[0])
-
-        # 连对
-        cp = self._find_consecutive_pairs(hand)
-        if cp:
-            cp.sort(key=lambda x: -len(x))
-            log.append("出连对")
-            return list(cp[0])
-
-        # 三带二
-        t2 = self._find_triple_twos(hand, groups)
-        if t2:
-            # 出最小的三条
-            t2.sort(key=lambda t: self._triple_rank(t))
-            log.append("出三带二(最小三条)")
-            return list(t2[0])
-
-        # 对子 - 出最小的
-        pairs = self._find_pairs_no_break(groups)
-        if pairs:
-            pairs.sort(key=lambda p: rv(p[0][1]))
-            # 不出对2除非快赢了
-            for p in pairs:
-                if rv(p[0][1]) < 12 or len(hand) <= 4:
-                    log.append(f"出对子{p[0][1]}")
-                    return list(p)
-            log.append(f"出对子{pairs[0][0][1]}")
-            return list(pairs[0])
-
-        # 单张 - 出孤张最小的，不拆对
-        singles = self._get_smart_singles(hand, groups)
-        if singles:
-            log.append(f"出单张{singles[0][1]}(不拆对)")
-            return [singles[0]]
+        # 按最优拆法(最少手数)出牌: 先出张数多的组合, 炸弹和 A/2 的单张、对子留作控制
+        lead = best_next_play(hand)
+        if lead:
+            log.append("最优拆法%s手, 先出%s: %s", decomp['plays'], lead[0], LazyCards(lead[2]))
+            return list(lead[2])
 
         # 兜底
         log.append("兜底出最小牌")
         return [hand[0]]
 
-    def _first_turn_play(self, hand, groups, log):
+    def _first_turn_play(self, hand, groups, moves, log):
         d3 = ('diamond', '3')
         log.append("首轮必须含方块3")
 
-        # 尝试顺子含d3
-        for s in self._find_straights(hand):
+        # 有开局表时: 在所有含方块3的出法中选出后剩余手牌期望名次最好的
+        if self.book is not None:
+            best = None
+            for _, _, cards in moves:
+                if d3 in cards:
+                    played = set(cards)
+                    rest = [c for c in hand if c not in played]
+                    rank = self.book.estimate(rest)['expected_rank'] if rest else 1.0
+                    if best is None or (rank, -len(cards)) < best[0]:
+                        best = ((rank, -len(cards)), cards)
+            if best:
+                log.append("开局表: 出后期望名次%.2f", best[0][0])
+                return list(best[1])
+
+        # 尝试顺子含d3(最短优先)
+        for s in sorted(self._moves_of(moves, 'straight'), key=len):
             if d3 in s:
-                log.append(f"顺子含方块3, 长度{len(s)}")
+                log.append("顺子含方块3, 长度%d", len(s))
                 return list(s)
 
         # 连对含d3
-        for cp in self._find_consecutive_pairs(hand):
+        for cp in sorted(self._moves_of(moves, 'consecutive_pairs'), key=len):
             if d3 in cp:
                 log.append("连对含方块3")
                 return list(cp)
 
         # 三带二含d3
-        for t in self._find_triple_twos(hand, groups):
+        for t in self._triple_twos(moves, groups):
             if d3 in t:
                 log.append("三带二含方块3")
                 return list(t)
@@ -177,48 +236,56 @@ class AIPlayer:
 
     # ========== 跟牌 ==========
 
-    def _response_play(self, hand, groups, lt, lv, lc, min_enemy, log):
+    def _response_play(self, hand, groups, moves, lt, lv, lc, min_enemy, log):
         hp = getattr(self, 'history_profile', {})
-        urgent = min_enemy <= 2 or (min_enemy <= 3 and hp.get('recent_enemy_passes', 0) == 0)
+        urgent = self._urgent(min_enemy, hp)
         my_count = len(hand)
 
         # 如果我也快赢了，激进出
-        hp = getattr(self, 'history_profile', {})
-        aggressive = my_count <= 4 or (my_count <= 6 and hp.get('recent_enemy_passes', 0) >= 2)
+        prm = self.params
+        aggressive = my_count <= prm.aggressive_count or (
+            my_count <= prm.aggressive_count_passing and hp.get('recent_enemy_passes', 0) >= prm.aggressive_passes)
+        if not aggressive and self.book is not None:
+            win_rate = self.book.estimate(hand)['win_rate']
+            if win_rate >= prm.aggressive_win_rate:
+                log.append("开局表估计胜率%.2f, 转入进攻", win_rate)
+                aggressive = True
+
+        # moves 已只含能压住上一手的出法, 从弱到强排列
+        plays = [m for m in moves if m[0] == lt]
+        bombs = self._moves_of(moves, 'bomb')
 
         if lt == 'single':
-            return self._resp_single(hand, groups, lv, urgent, aggressive, log)
+            return self._resp_single(hand, groups, plays, bombs, urgent, aggressive, log)
         elif lt == 'pair':
-            return self._resp_pair(hand, groups, lv, urgent, aggressive, log)
+            return self._resp_pair(hand, groups, plays, bombs, urgent, aggressive, log)
         elif lt == 'triple':
-            return self._resp_triple(hand, groups, lv, urgent, log)
+            return self._resp_triple(hand, plays, bombs, urgent, log)
         elif lt == 'triple_two':
-            return self._resp_triple_two(hand, groups, lv, urgent, log)
+            return self._resp_triple_two(groups, plays, bombs, urgent, log)
         elif lt == 'straight':
-            return self._resp_straight(hand, lv, lc, urgent, log)
+            return self._resp_straight(plays, bombs, urgent, log)
         elif lt == 'consecutive_pairs':
-            return self._resp_consec_pairs(hand, lv, lc, urgent, log)
+            return self._resp_consec_pairs(plays, bombs, urgent, log)
         elif lt == 'bomb':
-            return self._resp_bomb(hand, lv, urgent, log)
+            return self._resp_bomb(bombs, log)
         elif lt in ('airplane', 'airplane_pure'):
-            return self._resp_airplane(hand, lv, lc, urgent, log)
+            return self._resp_airplane(plays, bombs, urgent, log)
 
         # 兜底: 炸弹
         if urgent:
-            bombs = self._find_bombs(hand)
             if bombs:
                 log.append("紧急炸弹")
                 return list(bombs[0])
         return None
 
-    def _resp_single(self, hand, groups, lv, urgent, aggressive, log):
+    def _resp_single(self, hand, groups, plays, bombs, urgent, aggressive, log):
         # 优先用孤张压(不拆对子/三条)
-        singles = self._get_smart_singles(hand, groups)
-        cands = [c for c in singles if rv(c[1]) > lv]
+        cands = [m[2][0] for m in plays if len(groups[m[2][0][1]]) == 1]
 
         win_play = self._find_finishing_play(hand, [[c] for c in cands])
         if win_play:
-            log.append(f"压单并做收尾: {win_play[0][1]}")
+            log.append("压单并做收尾: %s", win_play[0][1])
             return list(win_play)
 
         if cands:
@@ -226,41 +293,40 @@ class AIPlayer:
                 log.append("紧急/快赢, 出最小能压的单张")
                 return [cands[0]]
 
-            # 正常: 不浪费A和2，除非没别的选择
-            hp = getattr(self, 'history_profile', {})
-            high_remaining = hp.get('high_cards_remaining', 8)
-            safe_limit = 10 if high_remaining > 2 else 11  # 高牌快出尽时可放宽到A
-            safe = [c for c in cands if rv(c[1]) <= safe_limit]
-            if safe:
-                log.append(f"出孤张{safe[0][1]}(保留大牌)")
-                return [safe[0]]
-
-            # 中等大牌也可以出
-            mid = [c for c in cands if rv(c[1]) <= 11]  # <=A
-            if mid:
-                log.append(f"出{mid[0][1]}")
-                return [mid[0]]
+            # 正常: 候选从小到大, 最小的孤张不是 2 就出它, 不浪费 2 除非没别的选择
+            prm = self.params
+            if rv(cands[0][1]) <= 11:  # <=A
+                log.append("出孤张%s", cands[0][1])
+                return [cands[0]]
 
             # 只剩2了
-            if len(hand) <= 6 or urgent:
-                log.append(f"牌不多了, 出{cands[0][1]}")
+            if len(hand) <= prm.few_cards or urgent:
+                log.append("牌不多了, 出%s", cands[0][1])
                 return [cands[0]]
 
+            # 有对手模型时: 对手大概率没有炸弹, 2 出去就能拿回出牌权
+            model = getattr(self, 'opponents', None)
+            if model is not None:
+                risk = model.p_beat('bomb', -1)
+                log.append("对手有炸弹的概率 %.2f", risk)
+                if risk < prm.bomb_risk:
+                    log.append("出%s抢出牌权", cands[0][1])
+                    return [cands[0]]
+
             log.append("大牌太贵, 考虑不出")
             # 但如果手牌很多还是得出
-            if len(hand) >= 10:
+            if len(hand) >= prm.play_anyway:
                 return [cands[0]]
             return None
 
         # 孤张压不了, 考虑拆对
-        all_cands = sorted([c for c in hand if rv(c[1]) > lv], key=lambda c: rv(c[1]))
-        if all_cands and (urgent or aggressive):
-            log.append(f"拆牌出{all_cands[0][1]}(紧急)")
-            return [all_cands[0]]
+        if plays and (urgent or aggressive):
+            card = plays[0][2][0]
+            log.append("拆牌出%s(紧急)", card[1])
+            return [card]
 
         # 炸弹
         if urgent:
-            bombs = self._find_bombs(hand)
             if bombs:
                 log.append("炸弹压单张")
                 return list(bombs[0])
@@ -268,39 +334,38 @@ class AIPlayer:
         log.append("压不了单张")
         return None
 
-    def _resp_pair(self, hand, groups, lv, urgent, aggressive, log):
-        pairs = self._find_pairs_no_break(groups)
-        cands = sorted([p for p in pairs if rv(p[0][1]) > lv], key=lambda p: rv(p[0][1]))
+    def _resp_pair(self, hand, groups, plays, bombs, urgent, aggressive, log):
+        cands = [m[2] for m in plays if len(groups[m[2][0][1]]) == 2]
 
         win_play = self._find_finishing_play(hand, cands)
         if win_play:
-            log.append(f"压对并做收尾: {win_play[0][1]}")
+            log.append("压对并做收尾: %s", win_play[0][1])
             return list(win_play)
 
         if cands:
             if urgent or aggressive:
-                log.append(f"出对{cands[0][0][1]}")
+                log.append("出对%s", cands[0][0][1])
                 return list(cands[0])
             # 不浪费对2
             safe = [p for p in cands if rv(p[0][1]) < 12]
             if safe:
-                log.append(f"出对{safe[0][0][1]}")
+                log.append("出对%s", safe[0][0][1])
                 return list(safe[0])
-            if len(hand) <= 6:
-                log.append(f"牌少, 出对{cands[0][0][1]}")
+            if len(hand) <= self.params.few_cards:
+                log.append("牌少, 出对%s", cands[0][0][1])
                 return list(cands[0])
             log.append("对子太大, 不出")
             return None
 
         # 拆三条出对
         if urgent or aggressive:
-            for r in sorted(groups, key=rv):
-                if len(groups[r]) >= 3 and rv(r) > lv:
-                    log.append(f"拆三条{r}出对(紧急)")
-                    return list(groups[r][:2])
+            for m in plays:
+                r = m[2][0][1]
+                if len(groups[r]) >= 3:
+                    log.append("拆三条%s出对(紧急)", r)
+                    return list(m[2])
 
         if urgent:
-            bombs = self._find_bombs(hand)
             if bombs:
                 log.append("炸弹压对子")
                 return list(bombs[0])
@@ -308,112 +373,82 @@ class AIPlayer:
         log.append("压不了对子")
         return None
 
-    def _resp_triple(self, hand, groups, lv, urgent, log):
-        triples = sorted(
-            [r for r, cs in groups.items() if len(cs) >= 3 and rv(r) > lv],
-            key=rv
-        )
-        triple_plays = [tuple(groups[r][:3]) for r in triples]
+    def _resp_triple(self, hand, plays, bombs, urgent, log):
+        triple_plays = [m[2] for m in plays]
         win_play = self._find_finishing_play(hand, triple_plays)
         if win_play:
-            log.append(f"压三条并做收尾: {win_play[0][1]}")
+            log.append("压三条并做收尾: %s", win_play[0][1])
             return list(win_play)
 
-        if triples:
-            r = triples[0]
-            log.append(f"出三条{r}")
-            return list(groups[r][:3])
+        if triple_plays:
+            log.append("出三条%s", triple_plays[0][0][1])
+            return list(triple_plays[0])
 
         if urgent:
-            bombs = self._find_bombs(hand)
             if bombs:
                 log.append("炸弹压三条")
                 return list(bombs[0])
         return None
 
-    def _resp_triple_two(self, hand, groups, lv, urgent, log):
-        combos = self._find_triple_twos(hand, groups)
-        valid = []
-        for combo in combos:
-            tr = self._triple_rank(combo)
-            if tr > lv:
-                valid.append((tr, combo))
-        valid.sort(key=lambda x: x[0])
+    def _resp_triple_two(self, groups, plays, bombs, urgent, log):
+        valid = self._triple_twos(plays, groups)
 
         if valid:
-            log.append(f"出三带二")
-            return list(valid[0][1])
+            log.append("出三带二")
+            return list(valid[0])
 
         if urgent:
-            bombs = self._find_bombs(hand)
             if bombs:
                 log.append("炸弹压三带二")
                 return list(bombs[0])
         return None
 
-    def _resp_straight(self, hand, lv, lc, urgent, log):
-        straights = self._find_straights(hand, length=lc)
-        cands = sorted(
-            [s for s in straights if len(s) == lc and max(rv(c[1]) for c in s) > lv],
-            key=lambda s: max(rv(c[1]) for c in s)
-        )
-        if cands:
-            log.append(f"压顺子")
-            return list(cands[0])
+    def _resp_straight(self, plays, bombs, urgent, log):
+        if plays:
+            log.append("压顺子")
+            return list(plays[0][2])
 
         if urgent:
-            bombs = self._find_bombs(hand)
             if bombs:
                 log.append("炸弹压顺子")
                 return list(bombs[0])
         return None
 
-    def _resp_consec_pairs(self, hand, lv, lc, urgent, log):
-        needed = lc // 2
-        cps = self._find_consecutive_pairs(hand, count=needed)
-        cands = sorted(
-            [cp for cp in cps if len(cp) == lc and max(rv(c[1]) for c in cp) > lv],
-            key=lambda s: max(rv(c[1]) for c in s)
-        )
-        if cands:
+    def _resp_consec_pairs(self, plays, bombs, urgent, log):
+        if plays:
             log.append("压连对")
-            return list(cands[0])
+            return list(plays[0][2])
 
         if urgent:
-            bombs = self._find_bombs(hand)
             if bombs:
                 log.append("炸弹压连对")
                 return list(bombs[0])
         return None
 
-    def _resp_bomb(self, hand, lv, urgent, log):
-        bombs = sorted(self._find_bombs(hand), key=lambda b: rv(b[0][1]))
-        cands = [b for b in bombs if rv(b[0][1]) > lv]
-        if cands:
+    def _resp_bomb(self, bombs, log):
+        if bombs:
             log.append("大炸弹压小炸弹")
-            return list(cands[0])
+            return list(bombs[0])
         return None
 
-    def _resp_airplane(self, hand, lv, lc, urgent, log):
-        airs = self._find_airplanes(hand)
-        for a in airs:
-            if len(a) == lc:
-                rc = {}
-                for c in a:
-                    rc[c[1]] = rc.get(c[1], 0) + 1
-                trs = [r for r, cnt in rc.items() if cnt >= 3]
-                mv = max(rv(r) for r in trs) if trs else -1
-                if mv > lv:
-                    log.append("压飞机")
-                    return list(a)
+    def _resp_airplane(self, plays, bombs, urgent, log):
+        # 同点数的飞机按带牌从小到大生成, 第一个即带最小翅膀
+        if plays:
+            log.append("压飞机")
+            return list(plays[0][2])
 
         if urgent:
-            bombs = self._find_bombs(hand)
             if bombs:
                 log.append("炸弹压飞机")
                 return list(bombs[0])
         return None
 
+    def _urgent(self, min_enemy, hp):
+        """对手快出完了: 牌数很少, 或最近无人过牌且牌数较少"""
+        prm = self.params
+        return min_enemy <= prm.urgent_enemy or (
+            min_enemy <= prm.urgent_enemy_quiet and hp.get('recent_enemy_passes', 0) == 0)
+
     # ========== 手牌分析 ==========
 
     def _decompose(self, hand, groups, log):
@@ -422,34 +457,9 @@ class AIPlayer:
         triples = sum(1 for r, cs in groups.items() if len(cs) == 3)
         pairs = sum(1 for r, cs in groups.items() if len(cs) == 2)
         singles = sum(1 for r, cs in groups.items() if len(cs) == 1)
-        log.append(f"结构: 炸弹{bombs} 三条{triples} 对子{pairs} 单张{singles}")
-        return {'bombs': bombs, 'triples': triples, 'pairs': pairs, 'singles': singles}
-
-    def _get_smart_singles(self, hand, groups):
-        """获取孤张(不属于对子/三条/炸弹的牌), 从小到大排序"""
-        singles = []
-        for r, cs in groups.items():
-            if len(cs) == 1:
-                singles.append(cs[0])
-        singles.sort(key=ck)
-        return singles
-
-    def _find_pairs_no_break(self, groups):
-        """只找自然对子(不从三条/炸弹拆)"""
-        result = []
-        for r, cs in groups.items():
-            if len(cs) == 2:
-                result.append(tuple(cs))
-        return result
-
-    def _triple_rank(self, combo):
-        rc = {}
-        for c in combo:
-            rc[c[1]] = rc.get(c[1], 0) + 1
-        for r, cnt in rc.items():
-            if cnt >= 3:
-                return rv(r)
-        return -1
+        plays = min_plays(hand)
+        log.append("结构: 炸弹%s 三条%s 对子%s 单张%s, 最少%s手出完", bombs, triples, pairs, singles, plays)
+        return {'bombs': bombs, 'triples': triples, 'pairs': pairs, 'singles': singles, 'plays': plays}
 
     # ========== 牌型查找 ==========
 
@@ -462,118 +472,70 @@ class AIPlayer:
             rc[r].append(card)
         return rc
 
-    def _find_bombs(self, hand):
-        g = self._group(hand)
-        bombs = [tuple(cs) for r, cs in g.items() if len(cs) == 4]
-        bombs.sort(key=lambda b: rv(b[0][1]))
-        return bombs
-
-    def _find_triple_twos(self, hand, groups):
-        """三带任意两张(不拆炸弹带)"""
-        triples = [(r, cs[:3]) for r, cs in groups.items() if len(cs) >= 3]
-        results = []
-        for tr, tcards in triples:
-            remaining = [c for c in hand if c not in tcards]
-            if len(remaining) < 2:
+    def _moves_of(self, moves, htype):
+        """从合法出法中取出某一牌型的牌, 保持从弱到强的顺序"""
+        return [m[2] for m in moves if m[0] == htype]
+
+    def _triple_twos(self, moves, groups):
+        """每个三条点数选一种带法(优先带孤张, 其次带最小的非炸弹牌), 按三条从小到大"""
+        total_safe = sum(len(cs) for cs in groups.values() if len(cs) < 4)
+        best = {}
+        for htype, hvalue, cards in moves:
+            if htype != 'triple_two':
                 continue
-            remaining.sort(key=ck)
-            # 优先带孤张, 减少手牌碎片
-            lonely = [c for c in remaining if len(groups.get(c[1], [])) == 1]
-            if len(lonely) >= 2:
-                results.append(tuple(tcards + lonely[:2]))
-            elif len(lonely) == 1:
-                others = [c for c in remaining if c != lonely[0]]
-                results.append(tuple(tcards + [lonely[0]] + others[:1]))
+            tr = RANKS[hvalue]
+            body = groups[tr][:3]
+            kickers = [c for c in cards if c not in body]
+            lonely = sum(1 for c in kickers if len(groups[c[1]]) == 1)
+            if lonely:
+                key = (-lonely, 0, cards)
             else:
-                # 带最小的两张(尽量不拆炸弹)
-                safe = [c for c in remaining if len(groups.get(c[1], [])) < 4]
-                if len(safe) >= 2:
-                    results.append(tuple(tcards + safe[:2]))
-                else:
-                    results.append(tuple(tcards + remaining[:2]))
-        return results
-
-    def _find_pairs(self, hand):
-        g = self._group(hand)
-        return [tuple(cs[:2]) for r, cs in g.items() if len(cs) >= 2]
-
-    def _find_straights(self, hand, length=None):
-        g = self._group(hand)
-        available = sorted([r for r in RANKS if r in g], key=lambda x: rv(x))
-        results = []
-        min_l = length or 3
-        max_l = length or len(available)
-        for l in range(min_l, max_l + 1):
-            for start in range(len(available) - l + 1):
-                grp = available[start:start+l]
-                vals = [rv(r) for r in grp]
-                if vals[-1] - vals[0] == l - 1 and len(set(vals)) == l:
-                    results.append(tuple(g[r][0] for r in grp))
-        return results
-
-    def _find_consecutive_pairs(self, hand, count=None):
-        g = self._group(hand)
-        available = sorted([r for r in RANKS if r in g and len(g[r]) >= 2], key=lambda x: rv(x))
-        results = []
-        min_c = count or 2
-        max_c = count or len(available)
-        for l in range(min_c, max_c + 1):
-            for start in range(len(available) - l + 1):
-                grp = available[start:start+l]
-                vals = [rv(r) for r in grp]
-                if vals[-1] - vals[0] == l - 1 and len(set(vals)) == l:
-                    cards = []
-                    for r in grp:
-                        cards.extend(g[r][:2])
-                    results.append(tuple(cards))
-        return results
-
-    def _find_airplanes(self, hand):
-        g = self._group(hand)
-        triple_ranks = sorted([r for r in RANKS if r in g and len(g[r]) >= 3], key=lambda x: rv(x))
-        results = []
-        for l in range(2, len(triple_ranks) + 1):
-            for start in range(len(triple_ranks) - l + 1):
-                grp = triple_ranks[start:start+l]
-                vals = [rv(r) for r in grp]
-                if max(vals) - min(vals) == l - 1:
-                    tcards = []
-                    for r in grp:
-                        tcards.extend(g[r][:3])
-                    results.append(tuple(tcards))
-                    remaining = sorted([c for c in hand if c not in tcards], key=ck)
-                    if len(remaining) >= l * 2:
-                        results.append(tuple(tcards + remaining[:l*2]))
-        return results
+                safe_left = total_safe - (3 if len(groups[tr]) < 4 else 0)
+                unsafe = sum(1 for c in kickers if len(groups[c[1]]) >= 4) if safe_left >= 2 else 0
+                key = (0, unsafe, cards)
+            key = key[:2] + (tuple(ck(c) for c in kickers),)
+            if hvalue not in best or key < best[hvalue][0]:
+                best[hvalue] = (key, cards)
+        return [best[v][1] for v in sorted(best)]
 
     def _find_kill_shot(self, hand):
         """如果整手牌本身是合法牌型，直接一手走完。"""
-        from game_logic import classify_hand
-        htype, _ = classify_hand(hand)
+        htype, _ = classify_cards(hand)
         if htype:
             return list(hand)
         return None
 
     def _find_finishing_play(self, hand, candidates):
         """优先选择出牌后能在下一次自由回合一手走完的候选。"""
-        from game_logic import classify_hand
+        # 剩余牌的点数签名 = 整手签名 - 候选签名, 无需逐张复制删除
+        held = set(hand)
+        hand_sig = signature(hand)
+        n = len(hand)
         for cand in candidates:
-            remaining = list(hand)
-            ok = True
-            for card in cand:
-                if card in remaining:
-                    remaining.remove(card)
-                else:
-                    ok = False
-                    break
-            if not ok or not remaining:
+            if len(cand) >= n or not all(card in held for card in cand):
                 continue
-            htype, _ = classify_hand(remaining)
+            htype, _ = classify_signature(hand_sig - signature(cand), n - len(cand))
             if htype:
                 return cand
         return None
 
 
+    def _endgame_play(self, hand, result, last, player_idx, tracker, log):
+        """采样世界里必胜次数多于启发式选择的出法替换之"""
+        leader, passes = (None, 0) if last is None else tracker.trick()
+        seed = hash((signature(hand), tracker.remaining, player_idx)) & 0xFFFFFFFF
+        scores, worlds = self.endgame.evaluate(hand, player_idx, last, leader, passes, self.opponents, seed)
+        if not worlds:
+            log.append("残局搜索: 预算内未完成, 沿用启发式")
+            return result
+        current = signature(result) if result else PASS
+        best = max(scores, key=lambda m: (scores[m], m == current))
+        log.append("残局搜索: %s 个世界, 启发式出法必胜 %s 个, 最优出法必胜 %s 个",
+                   worlds, scores.get(current, 0), scores[best])
+        if scores[best] > scores.get(current, 0):
+            return take_cards(hand, best) if best != PASS else None
+        return result
+
     def _analyze_history(self, history, player_idx):
         """从历史出牌中提取可用于决策的轻量信息。"""
         recent = history[-12:]
@@ -602,3 +564,4 @@ class AIPlayer:
             'high_cards_seen': high_cards_seen,
             'high_cards_remaining': max(0, 8 - high_cards_seen),
             'bombs_seen': bombs_seen
+        }
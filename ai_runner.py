@@ -0,0 +1,224 @@
+"""
+AI 回合调度
+  - 所有牌桌的 AI 决策都经同一组工作线程执行, 线程数固定, 与在线牌桌数无关
+  - 每局一个 TurnFeed: AI 每走一步发布一个带序号的事件, 最后发布 done 事件(含最终状态)
+  - 客户端通过长轮询或 SSE 按序号拉取事件, 同步请求则在请求线程里等待 done;
+    同一局同时只会有一批 AI 回合在跑
+  - 公平: 每张牌桌每次只占一步, 走完回到队尾; 背压: 等待中的牌桌数有上限, 请求先用 admit() 预留位置,
+    改动对局之后的 start() 一定能入队; 截止时间: 排队太久的决策改用快速 AI
+  - 停机: drain() 之后不再接收新的一批回合, 已开始的牌桌把这批回合走完, 保证响应与 done 事件都发出
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+# 最多保留多少局的事件流(超出时淘汰最久未用且已结束的)
+MAX_FEEDS = 10000
+# 就绪队列上限(等待 AI 出牌的牌桌数)
+MAX_QUEUE = 1000
+# 一次决策从入队到开始执行的最长等待秒数, 超出后改用快速 AI
+DECISION_DEADLINE = 2.0
+
+
+class TurnFeed:
+
+    def __init__(self):
+        self.events = []
+        self.running = False
+        self.cond = threading.Condition()
+
+    def reset(self):
+        with self.cond:
+            self.events = []
+            self.running = True
+
+    def publish(self, event):
+        with self.cond:
+            event['seq'] = len(self.events) + 1
+            self.events.append(event)
+            self.cond.notify_all()
+
+    def finish(self, event):
+        with self.cond:
+            event['seq'] = len(self.events) + 1
+            event['type'] = 'done'
+            self.events.append(event)
+            self.running = False
+            self.cond.notify_all()
+
+    def wait(self, since, timeout):
+        """等待序号大于 since 的事件; 返回 (事件列表, 是否已结束)"""
+        with self.cond:
+            self.cond.wait_for(lambda: len(self.events) > since or not self.running, timeout)
+            return self.events[since:], not self.running
+
+
+class QueueFull(Exception):
+    """就绪队列已满(或正在排空)且没有预留位置"""
+
+
+class _Task:
+    __slots__ = ('game_id', 'step', 'finish', 'feed', 'deadline')
+
+    def __init__(self, game_id, step, finish, feed, deadline):
+        self.game_id = game_id
+        self.step = step
+        self.finish = finish
+        self.feed = feed
+        self.deadline = deadline
+
+
+class AIRunner:
+    """所有牌桌共用的 AI 工作线程
+
+    调度单位是一次 AI 决策而不是一整批回合: 牌桌走完一步后回到就绪队列末尾,
+    多张牌桌轮流占用工作线程, 慢 AI(如蒙特卡洛)的牌桌不会让其他牌桌排长队。
+    就绪队列有上限, 调用方在改动对局之前用 admit() 预留一个位置, 满时拒绝请求;
+    预留的位置由 start(reserved=True) 用掉, 用不上时 release(); 不带预留的 start 在队列满时抛出 QueueFull;
+    一次决策排队超过 deadline 秒才轮到时, 以 late=True 调用 step, 由调用方换用快速 AI。
+    """
+
+    def __init__(self, workers=4, max_queue=MAX_QUEUE, deadline=DECISION_DEADLINE):
+        self.deadline = deadline
+        self.max_queue = max_queue
+        self._feeds = OrderedDict()
+        self._lock = threading.Lock()
+        self._ready = deque()
+        lock = threading.Lock()
+        self._cond = threading.Condition(lock)
+        # 排空等待者单独用一个条件变量, 不会抢走发给工作线程的 notify
+        self._idle = threading.Condition(lock)
+        self._active = 0
+        self._reserved = 0
+        self.closed = False
+        self.draining = False
+        self.counters = {'decisions': 0, 'late': 0, 'rejected': 0, 'errors': 0}
+        self._threads = [threading.Thread(target=self._work, name=f'ai-turn-{i}', daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def feed(self, game_id):
+        with self._lock:
+            feed = self._feeds.get(game_id)
+            if feed is not None:
+                self._feeds.move_to_end(game_id)
+            return feed
+
+    def busy(self, game_id):
+        feed = self.feed(game_id)
+        return feed is not None and feed.running
+
+    def _full(self):
+        return len(self._ready) + self._reserved >= self.max_queue or self.draining
+
+    def admit(self):
+        """就绪队列(含已预留的位置)未满且未在排空时预留一个位置并返回 True; 否则计一次拒绝并返回 False"""
+        with self._cond:
+            if not self._full():
+                self._reserved += 1
+                return True
+            self.counters['rejected'] += 1
+            return False
+
+    def release(self):
+        """归还 admit 预留而没有用掉的位置"""
+        with self._cond:
+            self._reserved -= 1
+            self._notify_idle()
+
+    def start(self, game_id, step, finish, reserved=False):
+        """开始一批 AI 回合
+        step(feed, late) 执行一步并返回是否还有下一步; finish(feed) 在结束时发布 done 事件;
+        reserved 为 True 时用掉 admit 预留的位置, 否则队列已满时抛出 QueueFull(事件流不变)"""
+        with self._lock:
+            feed = self._feeds.get(game_id)
+            if feed is None:
+                feed = self._feeds[game_id] = TurnFeed()
+            self._feeds.move_to_end(game_id)
+            self._prune()
+        self._enqueue(_Task(game_id, step, finish, feed, 0), reserved)
+        return feed
+
+    def _enqueue(self, task, reserved):
+        task.deadline = time.monotonic() + self.deadline
+        with self._cond:
+            if reserved:
+                self._reserved -= 1
+            elif self._full():
+                self.counters['rejected'] += 1
+                raise QueueFull
+            # 入队前置为运行中, 入队后工作线程随时可能发布事件
+            task.feed.reset()
+            self._ready.append(task)
+            self._cond.notify()
+
+    def _notify_idle(self):
+        if not self._ready and not self._active and not self._reserved:
+            self._idle.notify_all()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._ready or self.closed)
+                if not self._ready:
+                    return
+                task = self._ready.popleft()
+                self._active += 1
+            late = time.monotonic() > task.deadline
+            try:
+                more = task.step(task.feed, late)
+                if not more:
+                    task.finish(task.feed)
+            except Exception as exc:
+                more = False
+                task.feed.finish({'error': str(exc)})
+                with self._cond:
+                    self.counters['errors'] += 1
+            with self._cond:
+                self.counters['decisions'] += 1
+                self.counters['late'] += late
+                self._active -= 1
+                # 与 _active 在同一把锁内回队, 排空判断不会看到两者之间的空档
+                if more:
+                    # 回到队尾, 让其他牌桌先走一步
+                    task.deadline = time.monotonic() + self.deadline
+                    self._ready.append(task)
+                    self._cond.notify()
+                else:
+                    self._notify_idle()
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._ready)
+            active = self._active
+            reserved = self._reserved
+        return dict(self.counters, queued=queued, active=active, reserved=reserved, max_queue=self.max_queue,
+                    workers=len(self._threads), deadline=self.deadline, draining=self.draining)
+
+    def _prune(self):
+        excess = len(self._feeds) - MAX_FEEDS
+        for gid in list(self._feeds):
+            if excess <= 0:
+                break
+            if not self._feeds[gid].running:
+                del self._feeds[gid]
+                excess -= 1
+
+    def drain(self, timeout=None):
+        """停止接收新请求(admit 返回 False), 等已预留的请求入队或归还、已开始的各批 AI 回合走完;
+        返回是否在 timeout 内排空"""
+        with self._cond:
+            self.draining = True
+            return self._idle.wait_for(lambda: not self._ready and not self._active and not self._reserved, timeout)
+
+    def shutdown(self, wait=True):
+        """不再接收新步骤; 已在队列中的牌桌走完当前一步后停止"""
+        with self._cond:
+            self.closed = True
+            self._ready.clear()
+            self._cond.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join()
@@ -1,13 +1,162 @@
-from flask import Flask, render_template, jsonify, request
-from game_logic import Game, classify_hand
+from flask import Flask, Response, g, render_template, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from cards import CARD_INDEX, index_to_card
+from game_logic import Game, classify_hand, encode_action
+from ai_player import AIPlayer
+from mc_player import MonteCarloAIPlayer
+from game_store import GameStore
+from sqlite_store import SQLiteGameStore
+from ai_runner import AIRunner
+from table_hub import TableHub, seat_of, seat_token
+from decision_log import log_decision, log_event, setup_logging
+from replay import ReplayWriter
+from metrics import FAST_BUCKETS, Registry, SamplingProfiler
+import json
 import os
+import threading
+import time
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
-games = {}
+
+# 进程级资源(日志线程、对局存储、AI 调度线程、回放文件)由 create_app() 在工作进程里创建,
+# 没有显式调用时由本进程的第一个请求创建(WSGI 服务器直接加载 app:app 也能用):
+# 后台线程不能跨 fork 存活, 预加载应用再 fork 的服务器也能正常工作
+_init_lock = threading.Lock()
+log_listener = None
+games = None
+runner = None
+replays = None
+# 多进程部署时本进程的编号, 写在对局号开头(两位十六进制)
+WORKER_ID = 0
+
+def load_secret_key(path=None):
+    """座位令牌的 HMAC 密钥, 各工作进程之间、重启前后都必须相同
+    优先取环境变量 SECRET_KEY; 否则读 SECRET_KEY_FILE(默认 secret_key), 文件不存在时生成一次"""
+    key = os.environ.get('SECRET_KEY')
+    if key:
+        return key.encode()
+    path = path or os.environ.get('SECRET_KEY_FILE', 'secret_key')
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.write(fd, os.urandom(32).hex().encode())
+        finally:
+            os.close(fd)
+        try:
+            # 硬链接的创建是原子的: 多个进程同时生成时只有第一个的密钥生效, 其余读到的都是它
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp)
+    with open(path, 'rb') as f:
+        return f.read().strip()
+
+def make_store():
+    """GAME_STORE=sqlite(默认, 持久化) 或 memory(仅进程内)"""
+    limits = dict(
+        ttl=int(os.environ.get('GAME_TTL', 3600)),
+        finished_ttl=int(os.environ.get('FINISHED_GAME_TTL', 300)),
+    )
+    if os.environ.get('GAME_STORE', 'sqlite') == 'memory':
+        return GameStore(max_games=int(os.environ.get('MAX_GAMES', 10000)), **limits)
+    return SQLiteGameStore(
+        path=os.environ.get('GAME_DB', 'games.db'),
+        max_cached=int(os.environ.get('MAX_GAMES', 10000)),
+        validate_cache=os.environ.get('GAME_CACHE_VALIDATE', '0') == '1',
+        **limits,
+    )
+
+def create_app(worker_id=None):
+    """WSGI 应用工厂: 在当前进程创建进程级资源并返回 app; 同一进程内重复调用返回同一个 app
+    worker_id 为多进程部署中本进程的编号(0~255, 缺省读环境变量 WORKER_ID)"""
+    with _init_lock:
+        if runner is None:
+            _init(worker_id)
+    return app
+
+def _init(worker_id):
+    global log_listener, games, runner, replays, WORKER_ID
+    WORKER_ID = int(os.environ.get('WORKER_ID', 0)) if worker_id is None else worker_id
+    if not 0 <= WORKER_ID <= 0xFF:
+        raise ValueError('WORKER_ID must be between 0 and 255')
+    app.secret_key = load_secret_key()
+    # AI 决策与对局事件经队列写入 logs/ai_decisions.jsonl(AI_LOG_* 环境变量可调)
+    log_listener = setup_logging()
+    games = make_store()
+    games.start_sweeper()
+    # 结束的对局追加写入回放文件(REPLAY_FILE, 为空则不记录), 标签为对局号
+    replays = ReplayWriter(os.environ['REPLAY_FILE']) if os.environ.get('REPLAY_FILE') else None
+    # runner 最后创建: 其他线程以它不为空判断初始化已完成
+    # 所有牌桌的 AI 回合经同一组工作线程(AI_WORKERS)轮流执行; 等待中的牌桌超过 AI_MAX_QUEUE 时返回 429,
+    # 排队超过 AI_DEADLINE 秒的决策改用启发式 AI。请求中带 {"async": true} 时立即返回, 动作经 /api/events 或 /api/stream 推送
+    runner = AIRunner(
+        workers=int(os.environ.get('AI_WORKERS', 4)),
+        max_queue=int(os.environ.get('AI_MAX_QUEUE', 1000)),
+        deadline=float(os.environ.get('AI_DEADLINE', 2.0)),
+    )
+
+def drain(timeout=30):
+    """停机第一步: 拒绝新的对局与玩家动作(503), 等进行中的 AI 回合走完, 再断开牌桌订阅;
+    返回 AI 回合是否在 timeout 秒内走完"""
+    drained = runner.drain(timeout)
+    hub.close_all()
+    return drained
+
+def close():
+    """停机最后一步(请求线程都结束之后): 停止 AI 线程, 对局落盘, 关闭回放文件与日志线程"""
+    runner.shutdown(wait=False)
+    games.stop()
+    if replays is not None:
+        replays.close()
+    log_listener.stop()
+
+def new_game_id():
+    """对局号 = 工作进程编号(2 位) + 随机数(14 位), 前端代理按开头两位把同一局的请求都送到创建它的进程"""
+    return f'{WORKER_ID:02x}{os.urandom(7).hex()}'
+
+# 多人牌桌: 每张牌桌一个事件频道, 经 /api/table_stream 推送给该桌所有连接
+hub = TableHub()
+
+# 热路径计时, 经 /metrics 以 Prometheus 文本格式导出(每个进程一份)
+registry = Registry()
+REQUEST_SECONDS = registry.histogram(
+    'poker_http_request_seconds', '请求处理耗时(SSE 只计到开始推送)', ('route', 'method', 'status'))
+AI_SECONDS = registry.histogram(
+    'poker_ai_decision_seconds', 'AI 单次决策耗时', ('ai', 'situation', 'hand_type'))
+ENGINE_SECONDS = registry.histogram(
+    'poker_engine_call_seconds', '规则引擎调用与响应序列化耗时', ('call',), FAST_BUCKETS)
+registry.callback('poker_store', '对局存储', lambda: games.stats(),
+                  counters=('evicted_lru', 'evicted_ttl', 'flushed_writes', 'flush_batches', 'flush_errors', 'db_loads'))
+registry.callback('poker_ai_runner', 'AI 调度', lambda: runner.stats(),
+                  counters=('decisions', 'late', 'rejected', 'errors'))
+registry.callback('poker_tables', '多人牌桌频道', hub.stats)
+# PROFILE_SAMPLE: 按该比例抽样请求做 cProfile, 结果写入 PROFILE_DIR(默认 0, 不剖析)
+profiler = SamplingProfiler(float(os.environ.get('PROFILE_SAMPLE', 0)), os.environ.get('PROFILE_DIR', 'logs/profiles'))
+# AI 决策在调度线程里执行, 请求线程的剖析看不到; 单独一个剖析器, 同步请求等 AI 时两者可以同时进行
+ai_profiler = SamplingProfiler(profiler.rate, profiler.directory)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify 的序列化计入 poker_engine_call_seconds{call="json"}"""
+
+    def dumps(self, obj, **kwargs):
+        with ENGINE_SECONDS.time('json'):
+            return super().dumps(obj, **kwargs)
+
+
+app.json = TimedJSONProvider(app)
 
 NAMES = ['玩家', '电脑B', '电脑C', '电脑D']
 
+# 新对局可通过 {"ai": "mc"} 选择 AI 策略, 默认启发式
+AI_MODES = {
+    'heuristic': AIPlayer,
+    'mc': MonteCarloAIPlayer,
+}
+
 TYPE_NAMES = {
     'single': '单张',
     'pair': '对子',
@@ -20,14 +169,271 @@ TYPE_NAMES = {
     'airplane_pure': '飞机',
 }
 
-def print_thinking(player_idx, thinking):
-    name = NAMES[player_idx]
-    print(f"\n{'='*40}")
-    print(f"  {name} 的思考过程")
-    print(f"{'='*40}")
-    for line in thinking:
-        print(f"  > {line}")
-    print(f"{'='*40}\n")
+def state_for(game, game_id, seat=None):
+    """seat 缺省为第一个真人座位"""
+    if seat is None:
+        seat = game.humans[0]
+    with ENGINE_SECONDS.time('state'):
+        state = game.get_state_for_player(seat)
+    state['game_id'] = game_id
+    state['seat'] = seat
+    state['humans'] = list(game.humans)
+    return state
+
+def delta_for(game, since):
+    """单人牌桌(第一个真人座位)的增量协议响应"""
+    with ENGINE_SECONDS.time('delta'):
+        return game.get_delta_for_player(game.humans[0], since)
+
+def multi(game):
+    """多人牌桌: 动作经频道广播, 请求只返回确认"""
+    return len(game.humans) > 1
+
+def broadcast(game_id, game, pid, cards, htype):
+    """向牌桌频道发布一个动作; 牌数与轮到谁都是绝对值"""
+    st = game.state
+    seq = hub.publish(game_id, {
+        'type': 'action',
+        'player': pid,
+        'cards': [list(c) for c in cards] if cards else [],
+        'action': 'play' if cards else 'pass',
+        'hand_type': htype,
+        'counts': game.hand_sizes(),
+        'next': st.current,
+        'is_free': st.is_free(st.current),
+    })
+    if game.winner is not None:
+        seq = hub.publish(game_id, {'type': 'game_over', 'winner': game.winner})
+        hub.channel(game_id).close()
+    return seq
+
+def ai_step(game_id, game, emit, ai=None, compact=False):
+    """执行一个 AI 回合并把动作交给 emit(compact 时为增量协议的 {v, e}); 返回是否仍轮到 AI"""
+    st = game.state
+    situation = 'first' if st.first_turn else 'free' if st.is_free(st.current) else 'follow'
+    t0 = time.perf_counter()
+    thinking, ai_cards = game.ai_play(game.current_player, ai=ai)
+    elapsed = time.perf_counter() - t0
+    ai_player = game.current_player_before
+    htype = None
+    if ai_cards:
+        with ENGINE_SECONDS.time('classify_hand'):
+            htype, _ = classify_hand(ai_cards)
+    AI_SECONDS.observe(elapsed, type(ai or game.ai).__name__, situation, htype or 'pass')
+    log_decision(game_id, ai_player, ai_cards, thinking, elapsed, htype, full=game.trace)
+    if compact:
+        history = game.state.history
+        action = {'v': len(history), 'e': encode_action(history[-1])}
+    else:
+        action = {
+            'player': ai_player,
+            'cards': [list(c) for c in ai_cards] if ai_cards else [],
+            'action': 'play' if ai_cards else 'pass',
+            'hand_type': htype,
+            'other_counts': game.hand_sizes()
+        }
+    emit(action)
+    if multi(game):
+        broadcast(game_id, game, ai_player, ai_cards, htype)
+    if game.winner is not None:
+        game_over(game_id, game)
+    return ai_turn(game)
+
+def game_over(game_id, game):
+    log_event('game_over', game_id=game_id, winner=game.winner)
+    if replays is not None:
+        replays.write(game, tag=int(game_id, 16))
+
+# 同步请求等一批 AI 回合的最长秒数, 超出后返回错误(AI 回合仍在后台继续)
+AI_WAIT_TIMEOUT = float(os.environ.get('AI_WAIT_TIMEOUT', 60))
+
+# 按对局号分段的锁: 从轮次检查到改动对局持有, 同一局的并发请求只有一个能改动对局
+GAME_LOCKS = [threading.Lock() for _ in range(256)]
+
+def game_lock(game_id):
+    return GAME_LOCKS[hash(game_id) % len(GAME_LOCKS)]
+
+def ai_turn(game):
+    return game.winner is None and not game.is_human(game.current_player)
+
+def start_ai_turns(game_id, game, compact=False):
+    """把 AI 回合交给调度器; 异步模式下调用前应先生成本次响应的状态"""
+    def step(feed, late):
+        ai = None
+        if late:
+            # 排队超过截止时间: 这一步用启发式 AI, 保证牌桌响应时间
+            ai = AIPlayer()
+            log_event('ai_fallback', game_id=game_id, player=game.current_player)
+        prof = ai_profiler.start()
+        try:
+            return ai_step(game_id, game, lambda a: feed.publish(dict(a, type='ai_action')), ai, compact)
+        finally:
+            ai_profiler.stop(prof, f'ai_{type(ai or game.ai).__name__}')
+
+    def finish(feed):
+        games.put(game_id, game)
+        if multi(game):
+            # 多人牌桌的状态只经频道按座位推送, 这里不带任何手牌
+            feed.finish({})
+            return
+        if compact:
+            # 动作已逐个推送, 这里只带最新版本号与局面标量
+            feed.finish(delta_for(game, len(game.state.history)))
+            return
+        done = {'state': state_for(game, game_id)}
+        if game.winner is not None:
+            done['winner'] = game.winner
+        feed.finish(done)
+
+    # 用掉本请求在 load_game / new_game 里预留的队列位置
+    return runner.start(game_id, step, finish, reserved=g.pop('ai_slot', False))
+
+def wait_ai_turns(feed, result, timeout=None):
+    """同步请求: 在请求线程里等调度器跑完这批 AI 回合, 动作放进 ai_actions;
+    超过 timeout(缺省 AI_WAIT_TIMEOUT)秒或调度器已停止时抛出 RuntimeError"""
+    deadline = time.monotonic() + (AI_WAIT_TIMEOUT if timeout is None else timeout)
+    seq = 0
+    while True:
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise RuntimeError('电脑回合超时')
+        evts, _ = feed.wait(seq, min(left, 30))
+        if not evts and runner.closed:
+            raise RuntimeError('AI 调度已停止')
+        for e in evts:
+            seq = e['seq']
+            if e['type'] == 'done':
+                if 'error' in e:
+                    raise RuntimeError(e['error'])
+                result.update((k, v) for k, v in e.items() if k in ('state', 'winner'))
+                return result
+            result['ai_actions'].append({k: v for k, v in e.items() if k not in ('type', 'seq')})
+
+def finish_turn(game_id, game, result, use_async, since=None):
+    """玩家动作之后: 异步模式立即返回(pending), 否则等 AI 回合跑完并放进 ai_actions;
+    多人牌桌的 AI 回合总是异步执行, 动作只经频道推送。
+    since 不为 None 时按增量协议返回(见 finish_delta), 忽略 result"""
+    if multi(game):
+        games.put(game_id, game)
+        if ai_turn(game):
+            start_ai_turns(game_id, game)
+        return result
+    if since is not None:
+        return finish_delta(game_id, game, since, use_async)
+
+    if not ai_turn(game):
+        if game.winner is not None:
+            result['winner'] = game.winner
+        games.put(game_id, game)
+        result['state'] = state_for(game, game_id)
+        return result
+
+    if use_async:
+        result['state'] = state_for(game, game_id)
+        result['pending'] = True
+        start_ai_turns(game_id, game)
+        return result
+    return wait_ai_turns(start_ai_turns(game_id, game), result)
+
+def finish_delta(game_id, game, since, use_async):
+    """增量协议: 只返回客户端版本 since 之后的动作(含玩家自己的)与局面标量;
+    同步模式等 AI 回合跑完后一并返回"""
+    if not ai_turn(game):
+        games.put(game_id, game)
+        return delta_for(game, since)
+    if use_async:
+        delta = delta_for(game, since)
+        delta['pending'] = True
+        start_ai_turns(game_id, game, compact=True)
+        return delta
+    wait_ai_turns(start_ai_turns(game_id, game, compact=True), {'ai_actions': []})
+    return delta_for(game, since)
+
+def client_version(data):
+    """请求里的 v(客户端已见到的状态版本); 不带时返回 None, 按完整状态协议响应"""
+    v = data.get('v')
+    return None if v is None else int(v)
+
+def parse_cards(raw):
+    """出牌既可以是 [花色, 点数] 也可以是 0~51 的牌编号"""
+    cards = []
+    for c in raw:
+        # JSON 的 true/false 在 Python 里也是 int, 不能当作牌编号
+        if isinstance(c, bool):
+            raise ValueError('无效的牌')
+        if isinstance(c, int):
+            if not 0 <= c < 52:
+                raise ValueError('无效的牌')
+            cards.append(index_to_card(c))
+        else:
+            card = tuple(c)
+            try:
+                known = card in CARD_INDEX
+            except TypeError:
+                known = False
+            if not known:
+                raise ValueError('你没有这些牌')
+            cards.append(card)
+    return cards
+
+def overloaded():
+    if runner.draining:
+        return jsonify({'error': '服务器正在重启, 请稍后重试'}), 503, {'Retry-After': '1'}
+    return jsonify({'error': '服务器繁忙, 请稍后重试'}), 429, {'Retry-After': '1'}
+
+def request_seat(game, game_id, token):
+    """请求代表的座位: 多人牌桌必须带座位令牌, 单人牌桌不带令牌时为 0 号座位"""
+    if token:
+        return seat_of(app.secret_key, game_id, token, game.humans)
+    return None if multi(game) else game.humans[0]
+
+def load_game(game_id, token=None):
+    """取出轮到该座位操作的对局; 返回 (game, 座位, 错误响应)"""
+    game = games.get(game_id)
+    if game is None:
+        return None, None, (jsonify({'error': '游戏不存在'}), 400)
+    seat = request_seat(game, game_id, token)
+    if seat is None:
+        return None, None, (jsonify({'error': '座位令牌无效'}), 403)
+    if runner.busy(game_id):
+        return None, None, (jsonify({'error': '电脑正在出牌'}), 409)
+    if game.current_player != seat:
+        return None, None, (jsonify({'error': '不是你的回合'}), 400)
+    # 背压: 等待 AI 的牌桌已满时在改动对局之前拒绝; 预留的位置由 start_ai_turns 用掉, 用不上时请求结束时归还
+    if not runner.admit():
+        return None, None, overloaded()
+    g.ai_slot = True
+    return game, seat, None
+
+def parse_seats(data):
+    """真人座位: {"seats": [0, 2]} 或 {"humans": 2}(前 n 个座位), 缺省只有 0 号座位"""
+    seats = data.get('seats')
+    if seats is None:
+        seats = range(int(data.get('humans', 1)))
+    seats = sorted({int(p) for p in seats})
+    if not seats or seats[0] < 0 or seats[-1] > 3:
+        raise ValueError('真人座位必须是 0~3 之间的 1~4 个座位')
+    return seats
+
+@app.before_request
+def start_request():
+    if runner is None:
+        create_app()
+    g.t0 = time.perf_counter()
+    g.profile = profiler.start()
+
+@app.after_request
+def record_request(response):
+    # 按路由模板而不是实际路径打标签, 序列数有界
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.observe(time.perf_counter() - g.t0, route, request.method, str(response.status_code))
+    return response
+
+@app.teardown_request
+def stop_profile(exc):
+    if g.pop('ai_slot', False):
+        runner.release()
+    profiler.stop(g.pop('profile', None), request.endpoint or 'unmatched')
 
 @app.route('/')
 def index():
@@ -35,134 +441,198 @@ def index():
 
 @app.route('/api/new_game', methods=['POST'])
 def new_game():
-    game = Game()
+    data = request.get_json(silent=True) or {}
+    if not runner.admit():
+        return overloaded()
+    g.ai_slot = True
+    try:
+        seats = parse_seats(data)
+        since = client_version(data)
+    except (TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc)}), 400
+    ai_cls = AI_MODES.get(data.get('ai'), AIPlayer)
+    # {"trace": true} 时本局在服务端决策日志中记录完整 AI 思考过程(不返回给客户端)
+    game = Game(ai=ai_cls(), trace=bool(data.get('trace')), humans=seats)
     game.deal()
-    game_id = os.urandom(8).hex()
-    games[game_id] = game
-
-    starter = game.current_player
-    print(f"\n{'#'*50}")
-    print(f"  新游戏开始! 方块3在 {NAMES[starter]} 手中")
-    print(f"{'#'*50}")
-
-    ai_actions = []
-    while game.current_player != 0 and game.winner is None:
-        thinking, ai_cards = game.ai_play(game.current_player)
-        ai_player = game.current_player_before
-        print_thinking(ai_player, thinking)
-        htype = None
-        if ai_cards:
-            htype, _ = classify_hand(ai_cards)
-        ai_actions.append({
-            'player': ai_player,
-            'cards': [list(c) for c in ai_cards] if ai_cards else [],
-            'action': 'play' if ai_cards else 'pass',
-            'hand_type': htype,
-            'other_counts': [len(game.players[i]) for i in range(4)]
-        })
+    game_id = new_game_id()
+    games.put(game_id, game)
+    log_event('new_game', game_id=game_id, starter=game.current_player,
+              ai=type(game.ai).__name__, trace=game.trace, humans=seats)
 
-    state = game.get_state_for_player(0)
-    state['game_id'] = game_id
-    state['ai_actions'] = ai_actions
+    if multi(game):
+        # 多人牌桌: 创建者坐第一个真人座位, 其余座位的令牌作为邀请发给好友
+        tokens = {p: seat_token(app.secret_key, game_id, p) for p in seats}
+        state = state_for(game, game_id, seats[0])
+        state['token'] = tokens[seats[0]]
+        state['invites'] = [{'seat': p, 'token': tokens[p]} for p in seats[1:]]
+        hub.channel(game_id, create=True)
+        finish_turn(game_id, game, {}, True)
+        return jsonify(state)
+
+    if since is not None:
+        # 增量协议: 新对局从版本 0 开始, 响应带手牌与开局以来的全部动作
+        delta = finish_turn(game_id, game, None, data.get('async'), 0)
+        delta['game_id'] = game_id
+        return jsonify(delta)
+
+    result = finish_turn(game_id, game, {'ai_actions': []}, data.get('async'))
+    state = result.pop('state')
+    state.update(result)
     return jsonify(state)
 
 @app.route('/api/play', methods=['POST'])
 def play():
     data = request.get_json()
-    game_id = data.get('game_id')
-    cards = [tuple(c) for c in data.get('cards', [])]
+    # 对局号也放在查询串里, 供前端代理按对局路由
+    game_id = data.get('game_id') or request.args.get('game_id')
+    try:
+        cards = parse_cards(data.get('cards', []))
+        since = client_version(data)
+    except (TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc)}), 400
 
-    if game_id not in games:
-        return jsonify({'error': '游戏不存在'}), 400
-    game = games[game_id]
-    if game.current_player != 0:
-        return jsonify({'error': '不是你的回合'}), 400
+    # 从轮次检查到出牌(多人牌桌含广播)持有本局的锁; 锁释放后轮到电脑, 其他请求在轮次检查处被拒绝
+    with game_lock(game_id):
+        game, seat, error = load_game(game_id, data.get('token'))
+        if error:
+            return error
 
-    success, msg = game.play_cards(0, cards)
-    if not success:
-        return jsonify({'error': msg}), 400
+        with ENGINE_SECONDS.time('play_cards'):
+            success, msg = game.play_cards(seat, cards)
+        if not success:
+            return jsonify({'error': msg}), 400
 
-    desc = ' '.join(c[1] for c in cards)
-    print(f"\n  [玩家] 出牌: {desc}")
+        log_event('player_action', game_id=game_id, seat=seat, action='play', cards=[list(c) for c in cards])
+        if game.winner is not None:
+            game_over(game_id, game)
+        if multi(game):
+            with ENGINE_SECONDS.time('classify_hand'):
+                htype, _ = classify_hand(cards)
+            seq = broadcast(game_id, game, seat, cards, htype)
+    if multi(game):
+        return jsonify(finish_turn(game_id, game, {'ok': True, 'seq': seq}, True))
 
     result = {
-        'player_action': {'player': 0, 'cards': [list(c) for c in cards], 'action': 'play'},
+        'player_action': {'player': seat, 'cards': [list(c) for c in cards], 'action': 'play'},
         'ai_actions': []
     }
-
-    if game.winner is not None:
-        result['winner'] = game.winner
-        result['state'] = game.get_state_for_player(0)
-        result['state']['game_id'] = game_id
-        print(f"\n  *** {NAMES[game.winner]} 获胜! ***\n")
-        return jsonify(result)
-
-    while game.current_player != 0 and game.winner is None:
-        thinking, ai_cards = game.ai_play(game.current_player)
-        ai_player = game.current_player_before
-        print_thinking(ai_player, thinking)
-        htype = None
-        if ai_cards:
-            htype, _ = classify_hand(ai_cards)
-        result['ai_actions'].append({
-            'player': ai_player,
-            'cards': [list(c) for c in ai_cards] if ai_cards else [],
-            'action': 'play' if ai_cards else 'pass',
-            'hand_type': htype,
-            'other_counts': [len(game.players[i]) for i in range(4)]
-        })
-        if game.winner is not None:
-            result['winner'] = game.winner
-            print(f"\n  *** {NAMES[game.winner]} 获胜! ***\n")
-            break
-
-    state = game.get_state_for_player(0)
-    state['game_id'] = game_id
-    result['state'] = state
-    return jsonify(result)
+    return jsonify(finish_turn(game_id, game, result, data.get('async'), since))
 
 @app.route('/api/pass_turn', methods=['POST'])
 def pass_turn():
     data = request.get_json()
-    game_id = data.get('game_id')
+    # 对局号也放在查询串里, 供前端代理按对局路由
+    game_id = data.get('game_id') or request.args.get('game_id')
+    try:
+        since = client_version(data)
+    except (TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    with game_lock(game_id):
+        game, seat, error = load_game(game_id, data.get('token'))
+        if error:
+            return error
+
+        with ENGINE_SECONDS.time('pass_turn'):
+            success, msg = game.pass_turn(seat)
+        if not success:
+            return jsonify({'error': msg}), 400
+
+        log_event('player_action', game_id=game_id, seat=seat, action='pass')
+        if multi(game):
+            seq = broadcast(game_id, game, seat, None, None)
+    if multi(game):
+        return jsonify(finish_turn(game_id, game, {'ok': True, 'seq': seq}, True))
+
+    result = {'player_action': {'player': seat, 'cards': [], 'action': 'pass'}, 'ai_actions': []}
+    return jsonify(finish_turn(game_id, game, result, data.get('async'), since))
+
+@app.route('/api/events')
+def events():
+    """长轮询: 返回序号大于 since 的 AI 事件, 没有新事件时最多等待 timeout 秒"""
+    feed = runner.feed(request.args.get('game_id'))
+    if feed is None:
+        return jsonify({'error': '没有电脑回合'}), 404
+    since = request.args.get('since', 0, type=int)
+    timeout = min(request.args.get('timeout', 25, type=float), 60)
+    evts, done = feed.wait(since, timeout)
+    return jsonify({'events': evts, 'done': done})
 
-    if game_id not in games:
+@app.route('/api/stream')
+def stream():
+    """SSE: 逐个推送 AI 事件, 推送 done 事件后结束"""
+    feed = runner.feed(request.args.get('game_id'))
+    if feed is None:
+        return jsonify({'error': '没有电脑回合'}), 404
+    since = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0, type=int))
+
+    def gen():
+        seq = since
+        while True:
+            evts, done = feed.wait(seq, 15)
+            if not evts and not done:
+                yield ': keepalive\n\n'
+                continue
+            for e in evts:
+                seq = e['seq']
+                yield f"id: {seq}\ndata: {json.dumps(e, ensure_ascii=False)}\n\n"
+            if done:
+                return
+
+    return Response(stream_with_context(gen()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/table_stream')
+def table_stream():
+    """多人牌桌的 SSE 长连接: 先推送该座位的完整状态(sync), 之后推送每个动作, 牌局结束后断开"""
+    game_id = request.args.get('game_id')
+    game = games.get(game_id)
+    if game is None:
         return jsonify({'error': '游戏不存在'}), 400
-    game = games[game_id]
-    if game.current_player != 0:
-        return jsonify({'error': '不是你的回合'}), 400
+    seat = request_seat(game, game_id, request.args.get('token'))
+    if seat is None:
+        return jsonify({'error': '座位令牌无效'}), 403
+    channel = hub.channel(game_id, create=True)
+    since = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0, type=int))
 
-    success, msg = game.pass_turn(0)
-    if not success:
-        return jsonify({'error': msg}), 400
+    def sync():
+        # 先取序号再取状态: 之后的事件都会推送, 与快照重叠的部分重复应用无害
+        seq = channel.seq
+        state = state_for(games.get(game_id) or game, game_id, seat)
+        state.update(type='sync', seq=seq)
+        return f"id: {seq}\ndata: {json.dumps(state, ensure_ascii=False)}\n\n", seq
 
-    print(f"\n  [玩家] 不出")
+    def gen():
+        seq = since
+        if not seq:
+            frame, seq = sync()
+            yield frame
+        while True:
+            evts, closed, gap = channel.wait(seq, 15)
+            if gap:
+                frame, seq = sync()
+                yield frame
+                continue
+            if not evts and not closed:
+                yield ': keepalive\n\n'
+                continue
+            for e in evts:
+                seq = e['seq']
+                yield f"id: {seq}\ndata: {json.dumps(e, ensure_ascii=False)}\n\n"
+            if closed and not evts:
+                return
 
-    result = {'player_action': {'player': 0, 'cards': [], 'action': 'pass'}, 'ai_actions': []}
+    return Response(stream_with_context(gen()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-    while game.current_player != 0 and game.winner is None:
-        thinking, ai_cards = game.ai_play(game.current_player)
-        ai_player = game.current_player_before
-        print_thinking(ai_player, thinking)
-        htype = None
-        if ai_cards:
-            htype, _ = classify_hand(ai_cards)
-        result['ai_actions'].append({
-            'player': ai_player,
-            'cards': [list(c) for c in ai_cards] if ai_cards else [],
-            'action': 'play' if ai_cards else 'pass',
-            'hand_type': htype,
-            'other_counts': [len(game.players[i]) for i in range(4)]
-        })
-        if game.winner is not None:
-            result['winner'] = game.winner
-            print(f"\n  *** {NAMES[game.winner]} 获胜! ***\n")
-            break
+@app.route('/api/stats')
+def stats():
+    return jsonify(dict(games.stats(), ai=runner.stats(), tables=hub.stats()))
 
-    state = game.get_state_for_player(0)
-    state['game_id'] = game_id
-    result['state'] = state
-    return jsonify(result)
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # 开发服务器; 生产环境用 server.py(多进程、优雅停机)
+    create_app().run(debug=True, port=5000)
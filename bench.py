@@ -0,0 +1,309 @@
+"""
+规则引擎与 AI 决策的基准测试
+  - 语料全部由固定种子生成: 每种牌型的样例手牌、出牌生成的最坏情况手牌、自我对局中截取的局面
+  - 微基准: classify_hand(逐牌型)、can_beat、legal_moves 及各牌型枚举(自由出牌/跟牌)、发牌
+  - AI 决策: AIPlayer.decide 在自由出牌与跟牌两类局面上的延迟, 以及手牌拆解查询与残局求解
+  - 端到端: simulate.play_game 单进程每秒局数
+  - 每项给出 p50/p99/均值与单次调用的峰值内存分配(tracemalloc 单独一轮测量, 不影响计时)
+结果写成 JSON, 可用 --compare 与另一次提交的结果逐项对比。
+
+用法:
+  python bench.py -o bench.json
+  python bench.py --quick -k decide --compare bench.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from ai_player import AIPlayer
+from cards import ALL_CARDS, SUITS, signature
+from dealer import SecureDealer, deal_from_seed
+from decision_log import NULL_TRACE
+from endgame import EndgameSolver
+from game_logic import Game, classify_hand
+from game_state import HAND_TYPES
+from hand_solver import min_plays
+from move_gen import _airplanes, _consecutive_pairs, _straights, _triple_twos, can_beat, group_hand, legal_moves
+from simulate import play_game
+
+# 计时样本至少持续这么久(纳秒), 过快的调用在一个样本里重复多次
+SAMPLE_NS = 20000
+CORPUS_SEED = 20240601
+
+CLASSIFY_CASES = {
+    'single': ['7', '2'],
+    'pair': ['9 9', 'A A'],
+    'triple': ['K K K', '3 3 3'],
+    'triple_two': ['5 5 5 J J', '8 8 8 3 Q'],
+    'straight': ['3 4 5 6 7', '3 4 5 6 7 8 9 10 J Q K A'],
+    'consecutive_pairs': ['3 3 4 4', '6 6 7 7 8 8 9 9 10 10'],
+    'bomb': ['8 8 8 8', '2 2 2 2'],
+    'airplane_pure': ['3 3 3 4 4 4', '9 9 9 10 10 10 J J J'],
+    'airplane': ['3 3 3 4 4 4 7 7 9 9', '5 5 5 6 6 6 7 7 7 3 3 4 4 8 8'],
+    'invalid': ['3 4 6', '3 3 4 4 5', '3 5 7 9'],
+}
+
+# 出牌生成的最坏情况: 三条连片(飞机带牌组合爆炸)、长顺子、长连对、多炸弹
+WORST_HANDS = {
+    'many_triples': '3 3 3 4 4 4 5 5 5 6 6 6 7',
+    'long_straight': '3 4 5 6 7 8 9 10 J Q K A 2',
+    'pair_chain': '3 3 4 4 5 5 6 6 7 7 8 8 9',
+    'bombs': '3 3 3 3 4 4 4 4 5 5 5 6 6',
+}
+
+# 跟牌基准使用的上一手(取最小点数, 能压的出法最多)
+RESPONSES = {
+    'single': '3',
+    'pair': '3 3',
+    'triple_two': '3 3 3 4 4',
+    'straight': '3 4 5 6 7',
+    'consecutive_pairs': '3 3 4 4',
+    'airplane': '3 3 3 4 4 4 5 5 6 6',
+}
+
+
+def parse_hand(text):
+    """'3 3 4' -> [('diamond', '3'), ('club', '3'), ('diamond', '4')], 同点数按花色顺序取"""
+    used = {}
+    hand = []
+    for rank in text.split():
+        k = used.get(rank, 0)
+        used[rank] = k + 1
+        hand.append((SUITS[k], rank))
+    return hand
+
+
+def random_hands(rng, n):
+    deck = [(s, r) for s in SUITS for r in ('3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A', '2')]
+    hands = []
+    for _ in range(n):
+        rng.shuffle(deck)
+        hands.append(deck[:13])
+    return hands
+
+
+def game_positions(seeds):
+    """截取自我对局中每个 AI 回合的 decide 参数, 分为自由出牌与跟牌两组"""
+    free, response = [], []
+    for seed in seeds:
+        game = Game()
+        game.deal(rng=random.Random(seed))
+        while game.winner is None:
+            st = game.state
+            pid = st.current
+            pos = dict(hand=game.hand(pid), last_type=HAND_TYPES[st.last_type], last_value=st.last_value,
+                       last_count=st.last_count, is_free=st.is_free(pid), first_turn=st.first_turn,
+                       other_counts=st.hand_sizes(), player_idx=pid, history=None,
+                       tracker=game.tracker.copy(), trace=NULL_TRACE)
+            (free if pos['is_free'] else response).append(pos)
+            game.ai_play(pid, trace=NULL_TRACE)
+    return free, response
+
+
+def build_suite(quick=False):
+    """返回 [(名称, 函数, 参数列表)]"""
+    rng = random.Random(CORPUS_SEED)
+    suite = []
+
+    for htype, texts in CLASSIFY_CASES.items():
+        hands = [parse_hand(t) for t in texts]
+        for hand in hands:
+            got = classify_hand(hand)[0]
+            if got != (None if htype == 'invalid' else htype):
+                raise ValueError(f'corpus hand {hand} classified as {got}, expected {htype}')
+        suite.append((f'classify/{htype}', classify_hand, [(h,) for h in hands]))
+
+    beats = [(lt, lv, lc, nt, nv, nc)
+             for lt, lv, lc in (('single', 3, 1), ('straight', 8, 5), ('bomb', 5, 4))
+             for nt, nv, nc in (('single', 9, 1), ('straight', 10, 5), ('bomb', 7, 4), ('pair', 2, 2))]
+    suite.append(('can_beat', can_beat, beats))
+
+    worst = {name: parse_hand(t) for name, t in WORST_HANDS.items()}
+    for name, hand in worst.items():
+        suite.append((f'legal_moves/free/{name}', legal_moves, [(hand,)]))
+    rand = random_hands(rng, 8 if quick else 32)
+    suite.append(('legal_moves/free/random', legal_moves, [(h,) for h in rand]))
+    for rtype, text in RESPONSES.items():
+        lt, lv = classify_hand(parse_hand(text))
+        lc = len(text.split())
+        args = [(h, lt, lv, lc) for h in list(worst.values()) + rand]
+        suite.append((f'legal_moves/response/{rtype}', legal_moves, args))
+
+    gens = {'straights': _straights, 'consecutive_pairs': _consecutive_pairs,
+            'airplanes': _airplanes, 'triple_twos': _triple_twos}
+    for gname, gen in gens.items():
+        groups = [(group_hand(h),) for h in worst.values()]
+        suite.append((f'gen/{gname}', lambda g, gen=gen: sum(1 for _ in gen(g)), groups))
+
+    # 手牌拆解缓存在第一轮后即热, 计时反映命中缓存时的查询开销
+    suite.append(('solver/min_plays', min_plays, [(h,) for h in list(worst.values()) + rand]))
+
+    # 残局: 每次用新的求解器, 计时包含置换表从空开始的完整搜索
+    deals = []
+    for _ in range(5 if quick else 20):
+        deck = list(ALL_CARDS)
+        rng.shuffle(deck)
+        deals.append(([signature(deck[i * 5:(i + 1) * 5]) for i in range(4)],))
+    suite.append(('endgame/solve', lambda hands: EndgameSolver().solve(hands, 0), deals))
+
+    suite.append(('deal/secure', SecureDealer().deal, [()] * 8))
+    suite.append(('deal/seeded', deal_from_seed, [(s,) for s in range(CORPUS_SEED, CORPUS_SEED + 8)]))
+
+    ai = AIPlayer()
+    free, response = game_positions(range(CORPUS_SEED, CORPUS_SEED + (5 if quick else 30)))
+    suite.append(('decide/free', lambda pos: ai.decide(**pos), [(p,) for p in free]))
+    suite.append(('decide/response', lambda pos: ai.decide(**pos), [(p,) for p in response]))
+
+    seeds = range(CORPUS_SEED, CORPUS_SEED + (10 if quick else 60))
+    suite.append(('e2e/game', play_game, [(s,) for s in seeds]))
+    return suite
+
+
+def _pass(fn, inputs, repeat):
+    """每个输入连续调用 repeat 次为一个样本, 返回每次调用的纳秒数"""
+    clock = time.perf_counter_ns
+    samples = []
+    for args in inputs:
+        t0 = clock()
+        for _ in range(repeat):
+            fn(*args)
+        samples.append((clock() - t0) / repeat)
+    return samples
+
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    i = min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))
+    return sorted_vals[i]
+
+
+def measure_time(fn, inputs, min_time):
+    first = _pass(fn, inputs, 1)
+    mean = sum(first) / len(first)
+    repeat = max(1, int(SAMPLE_NS // max(mean, 1)))
+    samples = []
+    spent = 0
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while spent < min_time * 1e9 or not samples:
+            t0 = time.perf_counter_ns()
+            samples.extend(_pass(fn, inputs, repeat))
+            spent += time.perf_counter_ns() - t0
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    samples.sort()
+    mean = sum(samples) / len(samples)
+    return {
+        'samples': len(samples),
+        'repeat': repeat,
+        'p50_us': round(_percentile(samples, 0.5) / 1000, 3),
+        'p99_us': round(_percentile(samples, 0.99) / 1000, 3),
+        'mean_us': round(mean / 1000, 3),
+        'ops_per_sec': round(1e9 / mean, 1) if mean else 0,
+    }
+
+
+def measure_alloc(fn, inputs):
+    """逐次调用的峰值分配与调用结束后仍未释放的字节数"""
+    peaks = []
+    retained = 0
+    tracemalloc.start()
+    try:
+        for args in inputs:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn(*args)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - base)
+            retained += max(0, current - base)
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+    return {
+        'alloc_peak_p50_bytes': _percentile(peaks, 0.5),
+        'alloc_peak_max_bytes': peaks[-1] if peaks else 0,
+        'alloc_retained_bytes': retained,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(pattern=None, quick=False, min_time=None):
+    min_time = min_time if min_time is not None else (0.1 if quick else 0.5)
+    results = {}
+    for name, fn, inputs in build_suite(quick):
+        if pattern and pattern not in name:
+            continue
+        res = measure_time(fn, inputs, min_time)
+        res.update(measure_alloc(fn, inputs))
+        results[name] = res
+        print(f"{name:40s} p50 {res['p50_us']:>11.2f}us  p99 {res['p99_us']:>11.2f}us  "
+              f"peak {res['alloc_peak_p50_bytes']:>8d}B", file=sys.stderr)
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'quick': quick,
+            'corpus_seed': CORPUS_SEED,
+        },
+        'results': results,
+    }
+
+
+def compare(base, new, threshold=0.1):
+    """逐项对比 p50; 变慢超过 threshold 的项标记 '!'"""
+    lines = [f"{'benchmark':40s} {'base p50':>12s} {'new p50':>12s} {'ratio':>7s}"]
+    for name, res in new['results'].items():
+        old = base['results'].get(name)
+        if old is None:
+            continue
+        ratio = res['p50_us'] / old['p50_us'] if old['p50_us'] else float('inf')
+        flag = ' !' if ratio > 1 + threshold else ''
+        lines.append(f"{name:40s} {old['p50_us']:>10.2f}us {res['p50_us']:>10.2f}us {ratio:>6.2f}x{flag}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='规则引擎与 AI 决策基准测试')
+    parser.add_argument('-k', '--filter', default=None, help='只运行名称包含该字符串的项')
+    parser.add_argument('--quick', action='store_true', help='缩小语料、缩短计时')
+    parser.add_argument('--min-time', type=float, default=None, help='每项最少计时秒数')
+    parser.add_argument('-o', '--output', default=None, help='JSON 结果文件(默认标准输出)')
+    parser.add_argument('--compare', default=None, help='与之前保存的 JSON 结果对比')
+    parser.add_argument('--threshold', type=float, default=0.1, help='对比时标记变慢的比例')
+    args = parser.parse_args(argv)
+
+    report = run(args.filter, args.quick, args.min_time)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            base = json.load(f)
+        print(compare(base, report, args.threshold), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
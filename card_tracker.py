@@ -0,0 +1,126 @@
+"""
+增量记牌器
+由 Game 在出牌/过牌时更新(每次 O(出牌张数)), AI 直接引用, 不再每次决策重扫历史。
+记录:
+  - 尚未打出的牌(掩码)与每家已出的牌
+  - A/2 已出张数、炸弹已出次数(整局, 不受观察窗口限制)
+  - 每家过牌时面对的牌型记录
+  - 推断的缺牌: 某家面对单张 v 选择不出, 视为其没有大于 v 的点数; 之后打出该点数则撤销
+  - 推断的持有上限: 面对单张/对子/三条 v 不出, 大于 v 的点数最多持有 0/1/2 张(撤销规则同上)
+  - 最近 12 手的出牌/过牌序列, 供"最近过牌次数"使用
+注意缺牌是推断而非确定信息, AI 可能出于策略主动过牌。
+"""
+
+from collections import deque
+
+from cards import FULL_MASK, RANK_ORDER, classify_cards, hand_to_mask, mask_to_hand
+
+RECENT_WINDOW = 12
+HIGH_RANKS = ('A', '2')
+_ALL_RANKS = (1 << 13) - 1
+# 面对这些牌型过牌时, 大于其点数的每个点数最多持有几张
+PASS_CAPS = {'single': 0, 'pair': 1, 'triple': 2}
+
+
+class CardTracker:
+
+    def __init__(self):
+        self.remaining = FULL_MASK
+        self.played_by = [0, 0, 0, 0]
+        self.rank_left = [4] * 13
+        self.high_cards_seen = 0
+        self.bombs_seen = 0
+        self.passes = [[], [], [], []]
+        self.voids = [0, 0, 0, 0]
+        self.caps = [[4] * 13 for _ in range(4)]
+        self.recent = deque(maxlen=RECENT_WINDOW)
+
+    def copy(self):
+        other = CardTracker.__new__(CardTracker)
+        other.remaining = self.remaining
+        other.played_by = list(self.played_by)
+        other.rank_left = list(self.rank_left)
+        other.high_cards_seen = self.high_cards_seen
+        other.bombs_seen = self.bombs_seen
+        other.passes = [list(p) for p in self.passes]
+        other.voids = list(self.voids)
+        other.caps = [list(c) for c in self.caps]
+        other.recent = deque(self.recent, maxlen=RECENT_WINDOW)
+        return other
+
+    @classmethod
+    def from_history(cls, history):
+        """从 Game.history 重建(用于没有记牌器的旧数据或外部局面)"""
+        tracker = cls()
+        last = (None, -1, 0)
+        for action in history:
+            pid = action.get('player')
+            cards = action.get('cards', [])
+            if action.get('action') == 'play' and cards:
+                htype, hvalue = classify_cards(cards)
+                tracker.on_play(pid, cards, htype, hvalue)
+                last = (htype, hvalue, len(cards))
+            else:
+                tracker.on_pass(pid, *last)
+        return tracker
+
+    # ========== 更新 ==========
+
+    def on_play(self, pid, cards, htype, hvalue):
+        mask = hand_to_mask(cards)
+        self.remaining &= ~mask
+        self.played_by[pid] |= mask
+        for c in cards:
+            r = RANK_ORDER[c[1]]
+            self.rank_left[r] -= 1
+            self.voids[pid] &= ~(1 << r)
+            self.caps[pid][r] = 4
+            if c[1] in HIGH_RANKS:
+                self.high_cards_seen += 1
+        if htype == 'bomb':
+            self.bombs_seen += 1
+        self.recent.append((pid, True))
+
+    def on_pass(self, pid, last_type, last_value, last_count):
+        self.passes[pid].append((last_type, last_value, last_count))
+        if last_type == 'single':
+            # 比 last_value 大的点数全部记为推断缺牌
+            self.voids[pid] |= _ALL_RANKS & ~((1 << (last_value + 1)) - 1)
+        cap = PASS_CAPS.get(last_type)
+        if cap is not None:
+            caps = self.caps[pid]
+            for r in range(last_value + 1, 13):
+                if caps[r] > cap:
+                    caps[r] = cap
+        self.recent.append((pid, False))
+
+    # ========== 查询 ==========
+
+    def unseen(self, hand):
+        """除自己手牌外尚未出现的牌"""
+        return mask_to_hand(self.remaining & ~hand_to_mask(hand))
+
+    def recent_enemy_passes(self, player_idx):
+        return sum(1 for pid, played in self.recent if not played and pid != player_idx)
+
+    def trick(self):
+        """当前这一轮: (上一手出牌者, 其后连续过牌数); 最近窗口内没有出牌时出牌者为 None"""
+        passes = 0
+        for pid, played in reversed(self.recent):
+            if played:
+                return pid, passes
+            passes += 1
+        return None, passes
+
+    def may_hold(self, pid, rank):
+        """按推断缺牌判断 pid 是否可能持有该点数"""
+        return self.rank_left[RANK_ORDER[rank]] > 0 and not self.voids[pid] >> RANK_ORDER[rank] & 1
+
+    def profile(self, player_idx):
+        """与 AIPlayer._analyze_history 返回格式一致"""
+        return {
+            'recent_enemy_passes': self.recent_enemy_passes(player_idx),
+            'high_cards_seen': self.high_cards_seen,
+            'high_cards_remaining': max(0, 8 - self.high_cards_seen),
+            'bombs_seen': self.bombs_seen,
+        }
@@ -0,0 +1,250 @@
+"""
+牌的紧凑编码与查表牌型判定
+编码:
+  - 单张牌: 0~51 的整数, index = 点数序号 * 4 + 花色序号 (天然满足 card_sort_key 的排序)
+  - 一手牌: 52 位掩码, 第 index 位为 1 表示持有该牌
+  - 点数计数: 长度 13 的列表, 每格 0~4
+  - 点数签名: 每个点数占 3 位的整数 (共 39 位), 由计数向量唯一确定
+判定:
+  牌型只与点数计数有关, 因此预先枚举所有 <=13 张的合法牌型签名建表,
+  运行时一次字典查找即可得到 (牌型, 点数)。超过 13 张的牌走计数算法并缓存结果。
+"""
+
+SUITS = ['diamond', 'club', 'heart', 'spade']
+RANKS = ['3','4','5','6','7','8','9','10','J','Q','K','A','2']
+RANK_ORDER = {r: i for i, r in enumerate(RANKS)}
+SUIT_ORDER = {s: i for i, s in enumerate(SUITS)}
+
+# 建表覆盖的最大张数(一手牌最多 13 张)
+TABLE_MAX_CARDS = 13
+
+ALL_CARDS = [(s, r) for r in RANKS for s in SUITS]
+CARD_INDEX = {c: i for i, c in enumerate(ALL_CARDS)}
+FULL_MASK = (1 << 52) - 1
+
+# 每个点数在签名中的增量, 按点数字符串索引, 兼容 tuple 与 JSON 传来的 list
+_SIG_SHIFT = 3
+_SIG_UNIT = {r: 1 << (_SIG_SHIFT * i) for i, r in enumerate(RANKS)}
+_SIG_FIELD = (1 << _SIG_SHIFT) - 1
+# 单个点数四张牌在掩码中的位
+_RANK_NIBBLE = 0xF
+
+
+def card_to_index(card):
+    return RANK_ORDER[card[1]] * 4 + SUIT_ORDER[card[0]]
+
+
+def index_to_card(idx):
+    return ALL_CARDS[idx]
+
+
+def hand_to_mask(cards):
+    mask = 0
+    for c in cards:
+        mask |= 1 << (RANK_ORDER[c[1]] * 4 + SUIT_ORDER[c[0]])
+    return mask
+
+
+def mask_to_hand(mask):
+    """掩码还原为按 card_sort_key 排好序的牌列表"""
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(ALL_CARDS[low.bit_length() - 1])
+        mask ^= low
+    return cards
+
+
+def mask_to_indices(mask):
+    """掩码还原为从小到大的牌编号列表(前端使用的紧凑编码)"""
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return out
+
+
+def mask_count(mask):
+    return bin(mask).count('1')
+
+
+def mask_rank_counts(mask):
+    return [bin((mask >> (4 * i)) & _RANK_NIBBLE).count('1') for i in range(13)]
+
+
+def rank_counts(cards):
+    counts = [0] * 13
+    for c in cards:
+        counts[RANK_ORDER[c[1]]] += 1
+    return counts
+
+
+def signature(cards):
+    sig = 0
+    for c in cards:
+        sig += _SIG_UNIT[c[1]]
+    return sig
+
+
+def counts_to_signature(counts):
+    sig = 0
+    for i, n in enumerate(counts):
+        sig |= n << (_SIG_SHIFT * i)
+    return sig
+
+
+def signature_to_counts(sig):
+    return [(sig >> (_SIG_SHIFT * i)) & _SIG_FIELD for i in range(13)]
+
+
+def mask_signature(mask):
+    return counts_to_signature(mask_rank_counts(mask))
+
+
+# ========== 计数算法(建表与超长牌的兜底) ==========
+
+def classify_counts(counts):
+    """按点数计数判定牌型, 规则与判定顺序同原 classify_hand 完全一致"""
+    n = sum(counts)
+    if n == 0:
+        return None, -1
+    present = [i for i in range(13) if counts[i]]
+    lo, hi = present[0], present[-1]
+    distinct = len(present)
+
+    if n == 1:
+        return 'single', lo
+    if n == 2 and distinct == 1:
+        return 'pair', lo
+
+    if n == 4 and distinct == 1:
+        return 'bomb', lo
+
+    if n >= 3 and distinct == n and hi - lo == n - 1:
+        return 'straight', hi
+
+    if n >= 4 and n % 2 == 0 and distinct >= 2 and all(counts[i] == 2 for i in present) \
+            and hi - lo == distinct - 1:
+        return 'consecutive_pairs', hi
+
+    if n == 3 and distinct == 1:
+        return 'triple', lo
+
+    if n == 5:
+        for i in present:
+            if counts[i] >= 3:
+                return 'triple_two', i
+
+    triples = [i for i in present if counts[i] >= 3]
+    if len(triples) >= 2:
+        for length in range(len(triples), 1, -1):
+            for start in range(len(triples) - length + 1):
+                group = triples[start:start + length]
+                if group[-1] - group[0] == length - 1:
+                    remaining = n - 3 * length
+                    if remaining == 0:
+                        return 'airplane_pure', group[-1]
+                    if remaining == length * 2:
+                        return 'airplane', group[-1]
+
+    return None, -1
+
+
+# ========== 查表 ==========
+
+def _extra_distributions(base, extra):
+    """在 base 计数上再任意加 extra 张牌(每个点数不超过 4 张)的所有结果"""
+    if extra == 0:
+        yield list(base)
+        return
+
+    def rec(counts, start, left):
+        if left == 0:
+            yield list(counts)
+            return
+        for i in range(start, 13):
+            if counts[i] < 4:
+                counts[i] += 1
+                yield from rec(counts, i, left - 1)
+                counts[i] -= 1
+
+    yield from rec(list(base), 0, extra)
+
+
+def _candidate_counts():
+    """枚举所有 <=13 张时可能成型的计数向量(再由 classify_counts 过滤)"""
+    for i in range(13):
+        for k in range(1, 5):
+            c = [0] * 13
+            c[i] = k
+            yield c
+    # 顺子 / 连对
+    for mult, min_len in ((1, 3), (2, 2)):
+        for length in range(min_len, 14):
+            if length * mult > TABLE_MAX_CARDS:
+                break
+            for start in range(13 - length + 1):
+                c = [0] * 13
+                for i in range(start, start + length):
+                    c[i] = mult
+                yield c
+    # 三带二: 三条 + 任意两张
+    for i in range(13):
+        base = [0] * 13
+        base[i] = 3
+        yield from _extra_distributions(base, 2)
+    # 飞机: 连续 L 个三条 + 0 或 2L 张翅膀
+    for length in range(2, 14):
+        if length * 3 > TABLE_MAX_CARDS:
+            break
+        for start in range(13 - length + 1):
+            base = [0] * 13
+            for i in range(start, start + length):
+                base[i] = 3
+            yield base
+            if length * 5 <= TABLE_MAX_CARDS:
+                yield from _extra_distributions(base, length * 2)
+
+
+def _build_table():
+    table = {}
+    for counts in _candidate_counts():
+        htype, hvalue = classify_counts(counts)
+        if htype is not None:
+            table[counts_to_signature(counts)] = (htype, hvalue)
+    return table
+
+
+HAND_TABLE = _build_table()
+_NO_HAND = (None, -1)
+# 超过 13 张的牌型结果缓存(极少出现)
+_LARGE_CACHE = {}
+
+
+def classify_signature(sig, n):
+    """按签名查表; n 为张数, 仅用于判断是否落在表覆盖范围内"""
+    hit = HAND_TABLE.get(sig)
+    if hit is not None:
+        return hit
+    if n <= TABLE_MAX_CARDS:
+        return _NO_HAND
+    hit = _LARGE_CACHE.get(sig)
+    if hit is None:
+        hit = _LARGE_CACHE[sig] = classify_counts(signature_to_counts(sig))
+    return hit
+
+
+def classify_cards(cards):
+    if not cards:
+        return _NO_HAND
+    sig = 0
+    for c in cards:
+        sig += _SIG_UNIT[c[1]]
+    return classify_signature(sig, len(cards))
+
+
+def classify_mask(mask):
+    if not mask:
+        return _NO_HAND
+    return classify_signature(mask_signature(mask), mask_count(mask))
@@ -0,0 +1,166 @@
+"""
+AI 决策日志
+  - DecisionTrace: 决策过程的结构化记录, 每步只保存 (格式串, 参数), 需要输出时才格式化
+  - NULL_TRACE: 未开启追踪时使用的空记录, append 不做任何事(自我对局、推演走这条路径)
+  - 日志经 QueueHandler 进入队列, 由后台 QueueListener 写入按大小轮转的 JSONL 文件,
+    请求线程不做文件/终端 I/O
+级别: INFO 每步一条摘要(玩家、出牌、耗时), DEBUG 额外附带完整思考过程;
+单局开启追踪(trace)时无论级别如何都输出完整思考过程。
+"""
+
+import json
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+logger = logging.getLogger('poker')
+ai_logger = logging.getLogger('poker.ai')
+
+
+class LazyCards:
+    """格式化时才拼接的牌面文本"""
+    __slots__ = ('cards',)
+
+    def __init__(self, cards):
+        self.cards = cards
+
+    def __str__(self):
+        return ' '.join(c[1] for c in self.cards)
+
+
+class DecisionTrace:
+    __slots__ = ('steps',)
+
+    def __init__(self):
+        self.steps = []
+
+    def append(self, msg, *args):
+        self.steps.append((msg, args))
+
+    def lines(self):
+        return [msg % args if args else msg for msg, args in self.steps]
+
+    def __iter__(self):
+        return iter(self.lines())
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __bool__(self):
+        return True
+
+
+class _NullTrace:
+    __slots__ = ()
+
+    def append(self, msg, *args):
+        pass
+
+    def lines(self):
+        return []
+
+    def __iter__(self):
+        return iter(())
+
+    def __len__(self):
+        return 0
+
+    def __bool__(self):
+        return False
+
+
+NULL_TRACE = _NullTrace()
+
+
+def new_trace(full=False):
+    """需要完整思考过程(单局追踪或 DEBUG 级别)时返回 DecisionTrace, 否则返回 NULL_TRACE"""
+    if full or ai_logger.isEnabledFor(logging.DEBUG):
+        return DecisionTrace()
+    return NULL_TRACE
+
+
+def log_decision(game_id, player, cards, trace, elapsed, hand_type=None, full=False):
+    """记录一步 AI 决策; 级别未开启且该局未追踪时不构造任何记录"""
+    if not full and not ai_logger.isEnabledFor(logging.INFO):
+        return
+    fields = {
+        'event': 'ai_decision',
+        'game_id': game_id,
+        'player': player,
+        'action': 'play' if cards else 'pass',
+        'cards': [list(c) for c in cards] if cards else [],
+        'hand_type': hand_type,
+        'ms': round(elapsed * 1000, 2),
+    }
+    if trace:
+        fields['thinking'] = trace.lines()
+    record = ai_logger.makeRecord(ai_logger.name, logging.INFO, __file__, 0,
+                                  'ai_decision', (), None, extra={'fields': fields})
+    # 直接 handle: 单局追踪时绕过级别判断
+    ai_logger.handle(record)
+
+
+def log_event(event, **fields):
+    """记录对局事件(开局、玩家出牌、胜负)"""
+    if logger.isEnabledFor(logging.INFO):
+        fields['event'] = event
+        logger.info(event, extra={'fields': fields})
+
+
+class JsonlFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {'ts': round(record.created, 3), 'level': record.levelname, 'logger': record.name}
+        entry.update(getattr(record, 'fields', None) or {'msg': record.getMessage()})
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """终端可读格式, 思考过程逐行缩进"""
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None)
+        if not fields:
+            return super().format(record)
+        head = ' '.join(f'{k}={v}' for k, v in fields.items() if k != 'thinking')
+        lines = [time.strftime('%H:%M:%S', time.localtime(record.created)) + ' ' + head]
+        lines.extend(f'  > {line}' for line in fields.get('thinking', ()))
+        return '\n'.join(lines)
+
+
+def setup_logging(path=None, level=None, max_bytes=None, backups=None, console=None):
+    """为 poker.* 日志挂上队列, 返回已启动的 QueueListener(退出前调用 stop() 刷完队列)
+
+    参数缺省时读取环境变量 AI_LOG_FILE / AI_LOG_LEVEL / AI_LOG_MAX_BYTES /
+    AI_LOG_BACKUPS / AI_LOG_CONSOLE; AI_LOG_FILE 为空字符串时不写文件。
+    """
+    env = os.environ.get
+    path = env('AI_LOG_FILE', 'logs/ai_decisions.jsonl') if path is None else path
+    level = env('AI_LOG_LEVEL', 'INFO') if level is None else level
+    max_bytes = int(env('AI_LOG_MAX_BYTES', 10 * 1024 * 1024)) if max_bytes is None else max_bytes
+    backups = int(env('AI_LOG_BACKUPS', 5)) if backups is None else backups
+    console = env('AI_LOG_CONSOLE', '0') == '1' if console is None else console
+
+    handlers = []
+    if path:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        sink = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        sink.setFormatter(JsonlFormatter())
+        handlers.append(sink)
+    if console:
+        out = logging.StreamHandler()
+        out.setFormatter(ConsoleFormatter())
+        handlers.append(out)
+
+    q = queue.SimpleQueue()
+    for h in list(logger.handlers):
+        if isinstance(h, QueueHandler):
+            logger.removeHandler(h)
+    logger.addHandler(QueueHandler(q))
+    logger.setLevel(level)
+    logger.propagate = False
+    listener = QueueListener(q, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
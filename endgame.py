@@ -0,0 +1,306 @@
+"""
+残局求解
+  - 局面只看点数: 四家手牌各是一个点数签名(cards.signature), 花色在残局里不影响胜负
+  - 搜索目标是"我能否保证先出完": 其余三家视为联手阻止我, 轮到我时任一出法能赢即赢,
+    轮到对手时所有出法都赢才算赢; 布尔值的与/或搜索天然带 alpha-beta 剪枝
+  - 置换表键为 (四家签名, 上一手, 上一手出牌者, 轮到谁, 过牌数, 求解方) 压成的整数, 值是确定的胜负,
+    不同根出法、不同采样世界之间共享
+  - 完全信息(四家手牌已知)时 solve 给出精确结论; 不完全信息时 evaluate 用对手模型采样若干世界,
+    统计每个根出法在多少个世界里必胜
+  - 每次调用有节点预算(可再加时间预算), 超出后只使用已完成的结论
+  - 求解器不加锁, 多线程共用时用 ThreadLocalSolver: 每个线程一个求解器和置换表
+联手假设偏悲观: 必胜是真正的必胜, 不能必胜的局面交给启发式。
+"""
+
+import threading
+import time
+
+from cards import SUITS, RANKS, RANK_ORDER, SUIT_ORDER, counts_to_signature, mask_signature, signature, signature_to_counts
+from game_state import HAND_TYPES, TYPE_CODE
+from hand_solver import signature_min_plays
+from move_gen import can_beat, legal_moves
+
+# 四家手牌都不超过这么多张时启用残局搜索
+ENDGAME_CARDS = 6
+# 只在自己的手牌需要这么多手出完时搜索: 一手能出完时启发式已是最优, 手数太多时几乎不可能必胜
+ENDGAME_PLAYS = (2, 4)
+# 每次决策最多展开的节点数
+NODE_BUDGET = 5000
+# AI 决策的时间预算(秒): 多个 AI 线程争用 CPU 时, 节点预算对应的耗时会成倍拉长
+TIME_BUDGET = 0.02
+# 每展开这么多节点看一次时钟
+CLOCK_EVERY = 16
+# 不完全信息时采样的世界数
+WORLDS = 8
+# 置换表 / 出法缓存的条目上限, 满了以后分两代淘汰(BoundedTable)
+TABLE_SIZE = 1 << 20
+MOVES_CACHE_SIZE = 1 << 16
+# ThreadLocalSolver 每个线程的置换表上限
+THREAD_TABLE_SIZE = 1 << 18
+
+PASS = 0
+# 一个点数签名的位数
+_SIG_BITS = 3 * len(RANKS)
+_SIG_MASK = (1 << _SIG_BITS) - 1
+# 置换表键里局面标量(上一手、出牌者、过牌数、轮到谁、求解方)的位数
+_STATE_BITS = 30
+
+
+class OutOfBudget(Exception):
+    """节点预算用尽"""
+
+
+class BoundedTable:
+    """两代字典组成的有界缓存: 新一代写满 limit // 2 条后降为旧一代, 原来的旧一代整体丢弃,
+    旧一代命中的条目提回新一代。整体清空上百万条目要上百毫秒, 期间所有 AI 线程都被卡住"""
+    __slots__ = ('limit', 'new', 'old')
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.new = {}
+        self.old = {}
+
+    def get(self, key):
+        value = self.new.get(key)
+        if value is None:
+            value = self.old.get(key)
+            if value is not None:
+                self.store(key, value)
+        return value
+
+    def store(self, key, value):
+        if len(self.new) >= self.limit // 2:
+            self.old = self.new
+            self.new = {}
+        self.new[key] = value
+
+    def __len__(self):
+        return len(self.new) + len(self.old)
+
+    def clear(self):
+        self.new = {}
+        self.old = {}
+
+
+def _pack_hands(hands):
+    """四家点数签名压成一个整数, 第 i 家占第 i 个 _SIG_BITS 位段"""
+    return hands[0] | hands[1] << _SIG_BITS | hands[2] << 2 * _SIG_BITS | hands[3] << 3 * _SIG_BITS
+
+
+def _last_code(htype, hvalue, count):
+    """上一手 (牌型, 点数, 张数) 的整数编码, 非零"""
+    return TYPE_CODE[htype] << 12 | hvalue << 6 | count
+
+
+def _cards_of(sig):
+    """签名对应的一手牌(同点数取花色最小的几张), 只用于生成出法"""
+    cards = []
+    for r, n in enumerate(signature_to_counts(sig)):
+        cards.extend((SUITS[s], RANKS[r]) for s in range(n))
+    return cards
+
+
+def take_cards(hand, sig):
+    """从实际手牌中取出签名为 sig 的牌(同点数取花色最小的)"""
+    need = signature_to_counts(sig)
+    cards = []
+    for c in sorted(hand, key=lambda c: (RANK_ORDER[c[1]], SUIT_ORDER[c[0]])):
+        r = RANK_ORDER[c[1]]
+        if need[r]:
+            need[r] -= 1
+            cards.append(c)
+    return cards
+
+
+class EndgameSolver:
+
+    def __init__(self, budget=NODE_BUDGET, worlds=WORLDS, table_size=TABLE_SIZE, time_budget=None):
+        self.budget = budget
+        self.time_budget = time_budget
+        self.worlds = worlds
+        self.table_size = table_size
+        self.table = BoundedTable(table_size)
+        self._moves = BoundedTable(MOVES_CACHE_SIZE)
+
+    def moves(self, hand, last):
+        """hand 面对 last((牌型, 点数, 张数, _last_code), None 表示自由出牌)的所有出法
+        ((签名, 牌型, 点数, 张数, _last_code), ...), 能出完的在前, 其余按出后剩余最少手数、张数从多到少排序; 不含过牌"""
+        key = hand << 16 | (0 if last is None else last[3])
+        hit = self._moves.get(key)
+        if hit is not None:
+            return hit
+        if last is None:
+            out = []
+            for htype, hvalue, cards in legal_moves(_cards_of(hand)):
+                out.append((signature(cards), htype, hvalue, len(cards), _last_code(htype, hvalue, len(cards))))
+            out.sort(key=lambda m: (m[0] != hand, signature_min_plays(hand - m[0]), -m[3], m[2]))
+        else:
+            # 跟牌的出法是自由出法的子集, 从缓存的自由出法中筛选
+            lt, lv, lc = last[0], last[1], last[2]
+            out = [m for m in self.moves(hand, None) if can_beat(lt, lv, lc, m[1], m[2], m[3])]
+        # 元组(而非列表)在垃圾回收扫过一次后不再被跟踪
+        out = tuple(out)
+        self._moves.store(key, out)
+        return out
+
+    def _left(self):
+        """一次调用的预算: [剩余节点数, 截止时刻(无时间预算时为 None)]"""
+        deadline = None if self.time_budget is None else time.perf_counter() + self.time_budget
+        return [self.budget, deadline]
+
+    def _wins(self, hands, cur, last, leader, passes, root, left):
+        """root 能否保证先出完; hands 为 _pack_hands 压成的整数, left 为 _left() 给出的预算"""
+        # 置换表键是整数: 只有整数键值的字典不受循环垃圾回收跟踪, 大置换表不会拖长每次完整回收
+        state = (((0 if last is None else last[3]) << 3 | (4 if leader is None else leader)) << 6
+                 | passes << 4 | cur << 2 | root)
+        key = hands << _STATE_BITS | state
+        hit = self.table.get(key)
+        if hit is not None:
+            return hit
+        left[0] -= 1
+        if left[0] < 0:
+            raise OutOfBudget
+        if left[1] is not None and not left[0] % CLOCK_EVERY and time.perf_counter() > left[1]:
+            raise OutOfBudget
+        mine = cur == root
+        result = not mine
+        nxt = (cur + 1) % 4
+        shift = _SIG_BITS * cur
+        hand = hands >> shift & _SIG_MASK
+        for move in self.moves(hand, last):
+            sig = move[0]
+            if sig == hand:
+                won = mine
+            else:
+                won = self._wins(hands - (sig << shift), nxt, move[1:], cur, 0, root, left)
+            if won == mine:
+                result = mine
+                break
+        else:
+            if last is not None:
+                # 过牌: 连续 3 家过牌后上一手出牌者自由出牌
+                if passes == 2:
+                    won = self._wins(hands, nxt, None, None, 0, root, left)
+                else:
+                    won = self._wins(hands, nxt, last, leader, passes + 1, root, left)
+                result = won
+        self.table.store(key, result)
+        return result
+
+    def _root(self, hands, cur, last, leader, passes, left, stop_on_win):
+        """对 cur 的每个出法(PASS 表示过牌)求是否必胜, 返回 {出法: 是否必胜}"""
+        results = {}
+        nxt = (cur + 1) % 4
+        packed = _pack_hands(hands)
+        shift = _SIG_BITS * cur
+        if last is not None:
+            last = last + (_last_code(*last),)
+        for move in self.moves(hands[cur], last):
+            sig = move[0]
+            if sig == hands[cur]:
+                results[sig] = True
+            else:
+                results[sig] = self._wins(packed - (sig << shift), nxt, move[1:], cur, 0, cur, left)
+            if stop_on_win and results[sig]:
+                return results
+        if last is not None:
+            if passes == 2:
+                results[PASS] = self._wins(packed, nxt, None, None, 0, cur, left)
+            else:
+                results[PASS] = self._wins(packed, nxt, last, leader, passes + 1, cur, left)
+        return results
+
+    def solve(self, hands, current, last=None, leader=None, passes=0):
+        """完全信息求解: hands 为四家点数签名, last 为 (牌型, 点数, 张数) 或 None;
+        返回 (必胜, 必胜出法签名 / PASS); 不能必胜时出法为 None, 超出预算时返回 (None, None)"""
+        hands = tuple(hands)
+        if leader == current:
+            last, leader, passes = None, None, 0
+        try:
+            results = self._root(hands, current, last, leader, passes, self._left(), True)
+        except OutOfBudget:
+            return None, None
+        for move, won in results.items():
+            if won:
+                return True, move
+        return False, None
+
+    def solve_state(self, state):
+        """对 GameState(四家手牌已知)求解当前玩家"""
+        last = None
+        if not state.is_free(state.current):
+            last = (HAND_TYPES[state.last_type], state.last_value, state.last_count)
+        return self.solve([mask_signature(m) for m in state.hands], state.current,
+                          last, state.last_player, state.pass_count)
+
+    def evaluate(self, hand, player_idx, last, leader, passes, model, seed=None):
+        """不完全信息: 按对手模型采样世界, 返回 ({出法签名: 必胜世界数}, 完成的世界数)"""
+        # 时间预算从采样开始算
+        left = self._left()
+        mine = signature(hand)
+        opponents = [(player_idx + d) % 4 for d in (1, 2, 3)]
+        # 相同的世界只搜索一次, 按出现次数计权
+        worlds = {}
+        for deal in model.sample(self.worlds, seed):
+            hands = [0] * 4
+            hands[player_idx] = mine
+            for i, p in enumerate(opponents):
+                hands[p] = counts_to_signature([int(x) for x in deal[i]])
+            key = tuple(hands)
+            worlds[key] = worlds.get(key, 0) + 1
+        if leader == player_idx:
+            last, leader, passes = None, None, 0
+        scores = {}
+        done = 0
+        for hands, weight in sorted(worlds.items()):
+            if any(not h for h in hands):
+                continue
+            try:
+                results = self._root(hands, player_idx, last, leader, passes, left, False)
+            except OutOfBudget:
+                break
+            for move, won in results.items():
+                scores[move] = scores.get(move, 0) + won * weight
+            done += weight
+        return scores, done
+
+    def clear(self):
+        self.table.clear()
+        self._moves.clear()
+
+
+class ThreadLocalSolver:
+    """每个线程一个 EndgameSolver(参数相同): 置换表在线程内跨对局复用, 线程之间不共享, 无需加锁"""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self._local = threading.local()
+
+    @property
+    def solver(self):
+        solver = getattr(self._local, 'solver', None)
+        if solver is None:
+            solver = self._local.solver = EndgameSolver(**self.kwargs)
+        return solver
+
+    def solve(self, hands, current, last=None, leader=None, passes=0):
+        return self.solver.solve(hands, current, last, leader, passes)
+
+    def solve_state(self, state):
+        return self.solver.solve_state(state)
+
+    def evaluate(self, hand, player_idx, last, leader, passes, model, seed=None):
+        return self.solver.evaluate(hand, player_idx, last, leader, passes, model, seed)
+
+    def clear(self):
+        """只清空当前线程的求解器"""
+        self.solver.clear()
+
+
+def is_endgame(hand, other_counts, player_idx, limit=ENDGAME_CARDS):
+    """四家手牌都不超过 limit 张, 且自己的最少出完手数在 ENDGAME_PLAYS 范围内"""
+    if len(hand) > limit or any(n > limit for i, n in enumerate(other_counts) if i != player_idx):
+        return False
+    low, high = ENDGAME_PLAYS
+    return low <= signature_min_plays(signature(hand)) <= high
+
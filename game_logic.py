@@ -1,254 +1,263 @@
-import secrets
 from ai_player import AIPlayer
-
-SUITS = ['diamond', 'club', 'heart', 'spade']
-RANKS = ['3','4','5','6','7','8','9','10','J','Q','K','A','2']
-RANK_ORDER = {r: i for i, r in enumerate(RANKS)}
+from card_tracker import CardTracker
+from cards import SUITS, RANKS, RANK_ORDER, SUIT_ORDER, classify_cards, classify_signature, hand_to_mask, mask_count, mask_to_hand, mask_to_indices
+from dealer import deal_from_seed, default_dealer
+from decision_log import new_trace
+from game_state import GameState, PackedHistory, HAND_TYPES, TYPE_CODE, D3_MASK, unpack_action
+from move_gen import can_beat, legal_moves
 
 
 def rank_value(r):
     return RANK_ORDER[r]
 
 def card_sort_key(c):
-    return (RANK_ORDER[c[1]], SUITS.index(c[0]))
+    return (RANK_ORDER[c[1]], SUIT_ORDER[c[0]])
 
 def classify_hand(cards):
-    if not cards:
-        return None, -1
-    n = len(cards)
-    ranks = [c[1] for c in cards]
-    values = sorted([rank_value(r) for r in ranks])
-
-    if n == 1:
-        return 'single', values[0]
-    if n == 2 and ranks[0] == ranks[1]:
-        return 'pair', values[0]
-
-    if n == 4 and len(set(ranks)) == 1:
-        return 'bomb', values[0]
-
-    if n >= 3 and _is_straight(values):
-        return 'straight', max(values)
-
-    if n >= 4 and n % 2 == 0 and _is_consecutive_pairs(cards):
-        return 'consecutive_pairs', max(values)
-
-    if n == 3 and len(set(ranks)) == 1:
-        return 'triple', values[0]
-
-    if n == 5:
-        rc = {}
-        for r in ranks:
-            rc[r] = rc.get(r, 0) + 1
-        counts = sorted(rc.values(), reverse=True)
-        if counts[0] >= 3:
-            triple_rank = [r for r, c in rc.items() if c >= 3][0]
-            return 'triple_two', rank_value(triple_rank)
-
-    ap = _check_airplane(cards)
-    if ap:
-        return ap
-
-    return None, -1
-
-def _is_straight(values):
-    s = sorted(set(values))
-    if len(s) != len(values):
-        return False
-    if len(s) < 3:
-        return False
-    return s[-1] - s[0] == len(s) - 1
-
-def _is_consecutive_pairs(cards):
-    rc = {}
-    for s, r in cards:
-        rc[r] = rc.get(r, 0) + 1
-    if len(rc) < 2:
-        return False
-    if not all(c == 2 for c in rc.values()):
-        return False
-    vals = sorted([rank_value(r) for r in rc])
-    return vals[-1] - vals[0] == len(vals) - 1
-
-def _check_airplane(cards):
-    rc = {}
-    for s, r in cards:
-        rc[r] = rc.get(r, 0) + 1
-    triples = sorted([r for r, c in rc.items() if c >= 3], key=lambda x: rank_value(x))
-    if len(triples) < 2:
-        return None
-    for length in range(len(triples), 1, -1):
-        for start in range(len(triples) - length + 1):
-            group = triples[start:start+length]
-            vals = [rank_value(r) for r in group]
-            if max(vals) - min(vals) == length - 1:
-                used = sum(3 for _ in group)
-                remaining = len(cards) - used
-                if remaining == 0:
-                    return 'airplane_pure', max(vals)
-                if remaining == length * 2:
-                    return 'airplane', max(vals)
-    return None
-
-def can_beat(last_type, last_value, last_count, new_type, new_value, new_count):
-    if new_type == 'bomb':
-        if last_type == 'bomb':
-            return new_value > last_value
-        return True
-    if last_type == 'bomb':
-        return False
-    if new_type != last_type:
-        return False
-    if new_count != last_count:
-        return False
-    return new_value > last_value
+    """兼容接口: 实际判定由 cards 模块按点数签名查表完成"""
+    return classify_cards(cards)
+
+def encode_action(entry):
+    """打包历史中的一步编码为增量协议的动作: [玩家] 为过牌, [玩家, 牌编号列表, 牌型编号] 为出牌"""
+    pid, mask = unpack_action(entry)
+    if not mask:
+        return [pid]
+    cards = mask_to_indices(mask)
+    # 签名直接由牌编号累加(编号 >> 2 为点数序号), 比逐点数扫描掩码快
+    sig = sum(1 << 3 * (i >> 2) for i in cards)
+    return [pid, cards, TYPE_CODE[classify_signature(sig, len(cards))[0]]]
 
 
 class Game:
-    def __init__(self):
-        self.players = [[] for _ in range(4)]
-        self.current_player = 0
-        self.current_player_before = 0
-        self.last_play = None
-        self.last_play_player = None
-        self.last_play_type = None
-        self.last_play_value = -1
-        self.last_play_count = 0
-        self.pass_count = 0
-        self.winner = None
-        self.ai = AIPlayer()
-        self.history = []
-        self.first_turn = True
-
-    def deal(self):
-        deck = [(s, r) for s in SUITS for r in RANKS]
-
-        # 使用系统随机源进行多轮 Fisher-Yates 洗牌
-        for _ in range(4):
-            for i in range(len(deck) - 1, 0, -1):
-                j = secrets.randbelow(i + 1)
-                deck[i], deck[j] = deck[j], deck[i]
-
-        # 随机切牌 + 随机翻转，进一步打散位置相关性
-        cut = secrets.randbelow(len(deck))
-        deck = deck[cut:] + deck[:cut]
-        if secrets.randbelow(2) == 1:
-            deck.reverse()
-
-        # 再执行少量随机互换，降低残余结构
-        for _ in range(12):
-            a = secrets.randbelow(len(deck))
-            b = secrets.randbelow(len(deck))
-            deck[a], deck[b] = deck[b], deck[a]
+    """对局流程与规则校验; 全部状态保存在紧凑的 GameState 中, 这里的属性都是它的视图"""
+    __slots__ = ('state', 'ai', 'tracker', 'trace', 'humans')
 
+    def __init__(self, ai=None, trace=False, humans=(0,)):
+        self.state = GameState()
+        self.ai = ai or AIPlayer()
+        self.tracker = CardTracker()
+        self.trace = trace  # 本局记录完整 AI 思考过程
+        self.humans = tuple(sorted(humans))  # 真人座位, 其余座位由 AI 出牌
+
+    # ========== 兼容属性 ==========
+
+    @property
+    def players(self):
+        return [mask_to_hand(m) for m in self.state.hands]
+
+    @property
+    def current_player(self):
+        return self.state.current
+
+    @property
+    def current_player_before(self):
+        return self.state.prev_player
+
+    @property
+    def last_play(self):
+        return mask_to_hand(self.state.last_mask) if self.state.last_mask else None
+
+    @property
+    def last_play_player(self):
+        return self.state.last_player
+
+    @property
+    def last_play_type(self):
+        return HAND_TYPES[self.state.last_type]
+
+    @property
+    def last_play_value(self):
+        return self.state.last_value
+
+    @property
+    def last_play_count(self):
+        return self.state.last_count
+
+    @property
+    def pass_count(self):
+        return self.state.pass_count
+
+    @property
+    def winner(self):
+        return self.state.winner
+
+    @property
+    def first_turn(self):
+        return self.state.first_turn
+
+    @property
+    def history(self):
+        return PackedHistory(self.state.history)
+
+    def is_human(self, pid):
+        return pid in self.humans
+
+    def hand(self, pid):
+        return mask_to_hand(self.state.hands[pid])
+
+    def hand_sizes(self):
+        return self.state.hand_sizes()
+
+    def set_hands(self, hands):
+        """直接设置四家手牌(牌列表), 并按方块3确定先手"""
+        self._set_masks([hand_to_mask(h) for h in hands])
+
+    def set_deck(self, deck):
+        """按一副牌(0~51 编号的排列, 每 13 张一家)发牌"""
+        hands = [0, 0, 0, 0]
+        for i, idx in enumerate(deck):
+            hands[i // 13] |= 1 << int(idx)
+        self._set_masks(hands)
+
+    def _set_masks(self, hands):
+        st = self.state
+        st.hands = hands
         for i in range(4):
-            self.players[i] = sorted(deck[i*13:(i+1)*13], key=card_sort_key)
-        for i in range(4):
-            if ('diamond', '3') in self.players[i]:
-                self.current_player = i
+            if st.hands[i] & D3_MASK:
+                st.current = i
                 break
-        self.first_turn = True
+        st.first_turn = True
+
+    def snapshot(self):
+        return self.state.snapshot(), self.tracker.copy()
+
+    def restore(self, snap):
+        state_snap, tracker = snap
+        self.state.restore(state_snap)
+        self.tracker = tracker.copy()
+
+    # ========== 发牌 ==========
+
+    def deal(self, rng=None, dealer=None, seed=None):
+        """seed: 按 dealer.deal_from_seed 发牌, 可复现; dealer: 发牌器(默认系统随机源的 SecureDealer);
+        rng: 兼容旧用法, 传入 random.Random 时按它洗牌"""
+        if rng is not None:
+            deck = [(s, r) for s in SUITS for r in RANKS]
+            rng.shuffle(deck)
+            self._assign(deck)
+        elif seed is not None:
+            self.set_deck(deal_from_seed(seed))
+        else:
+            self.set_deck((dealer or default_dealer).deal())
+
+    def _assign(self, deck):
+        self.set_hands([deck[i*13:(i+1)*13] for i in range(4)])
 
     def get_state_for_player(self, pid):
+        st = self.state
         return {
-            'hand': [list(c) for c in self.players[pid]],
-            'current_player': self.current_player,
-            'last_play': [list(c) for c in self.last_play] if self.last_play else None,
-            'last_play_player': self.last_play_player,
-            'other_counts': [len(self.players[i]) for i in range(4)],
-            'winner': self.winner,
+            'hand': [list(c) for c in self.hand(pid)],
+            'current_player': st.current,
+            'last_play': [list(c) for c in mask_to_hand(st.last_mask)] if st.last_mask else None,
+            'last_play_player': st.last_player,
+            'other_counts': st.hand_sizes(),
+            'winner': st.winner,
             'history': self.history[-20:],
-            'is_free': self.last_play_player is None or self.last_play_player == self.current_player,
-            'first_turn': self.first_turn
+            'is_free': st.is_free(st.current),
+            'first_turn': st.first_turn
         }
 
+    def get_delta_for_player(self, pid, since=0):
+        """版本化的增量状态: 版本号是已发生的动作数, 返回 since 之后的动作(encode_action)与当前局面的几个标量;
+        since 为 0 或无效时附带手牌与各家张数(牌用 0~51 的编号), 相当于完整状态"""
+        st = self.state
+        history = st.history
+        if not 0 <= since <= len(history):
+            since = 0
+        events = [encode_action(e) for e in history[since:]]
+        delta = {
+            'v': len(history),
+            'events': events,
+            'cur': st.current,
+            'free': st.is_free(st.current),
+            'first': st.first_turn,
+            'winner': st.winner,
+        }
+        if not since:
+            delta['hand'] = mask_to_indices(st.hands[pid])
+            delta['counts'] = st.hand_sizes()
+        return delta
+
     def play_cards(self, pid, cards):
-        if self.winner is not None:
+        st = self.state
+        if st.winner is not None:
             return False, '游戏已结束'
-        if pid != self.current_player:
+        if pid != st.current:
             return False, '不是你的回合'
         if not cards:
             return self.pass_turn(pid)
 
-        if self.first_turn:
-            if not any(c[0]=='diamond' and c[1]=='3' for c in cards):
-                return False, '第一手必须包含方块3'
+        try:
+            mask = hand_to_mask(cards)
+        except (KeyError, IndexError, TypeError):
+            # 花色或点数不存在的牌
+            return False, '你没有这些牌'
+        if st.first_turn and not mask & D3_MASK:
+            return False, '第一手必须包含方块3'
 
-        for card in cards:
-            if tuple(card) not in self.players[pid]:
-                return False, '你没有这些牌'
+        if mask_count(mask) != len(cards) or mask & ~st.hands[pid]:
+            return False, '你没有这些牌'
 
         htype, hvalue = classify_hand(cards)
         if htype is None:
             return False, '无效的牌型'
 
-        is_free = self.last_play_player is None or self.last_play_player == pid
-        if not is_free:
-            if not can_beat(self.last_play_type, self.last_play_value, self.last_play_count, htype, hvalue, len(cards)):
+        if not st.is_free(pid):
+            if not can_beat(HAND_TYPES[st.last_type], st.last_value, st.last_count, htype, hvalue, len(cards)):
                 return False, '出牌不够大'
 
-        for card in cards:
-            self.players[pid].remove(tuple(card))
-
-        self.last_play = list(cards)
-        self.last_play_player = pid
-        self.last_play_type = htype
-        self.last_play_value = hvalue
-        self.last_play_count = len(cards)
-        self.pass_count = 0
-        self.first_turn = False
-        self.history.append({'player': pid, 'cards': [list(c) for c in cards], 'action': 'play'})
-
-        # 先记录当前玩家，再检查胜利，修复赢家显示错位Bug
-        self.current_player_before = self.current_player
-
-        if not self.players[pid]:
-            self.winner = pid
-            return True, 'ok'
-
-        self.current_player = (self.current_player + 1) % 4
+        # apply 会先记录当前玩家再检查胜利, 赢家显示不会错位
+        st.apply(pid, mask, TYPE_CODE[htype], hvalue)
+        self.tracker.on_play(pid, cards, htype, hvalue)
         return True, 'ok'
 
+    def legal_moves(self, pid):
+        """pid 在当前局面下所有合法出法(不含过牌), 与 play_cards 的校验规则一致"""
+        st = self.state
+        hand = self.hand(pid)
+        if st.is_free(pid):
+            moves = legal_moves(hand)
+        else:
+            moves = legal_moves(hand, HAND_TYPES[st.last_type], st.last_value, st.last_count)
+        if st.first_turn:
+            moves = [m for m in moves if ('diamond', '3') in m[2]]
+        return moves
+
     def pass_turn(self, pid):
-        if self.winner is not None:
+        st = self.state
+        if st.winner is not None:
             return False, '游戏已结束'
-        if pid != self.current_player:
+        if pid != st.current:
             return False, '不是你的回合'
-        is_free = self.last_play_player is None or self.last_play_player == pid
-        if is_free:
+        if st.is_free(pid):
             return False, '自由出牌必须出'
-        if self.first_turn:
+        if st.first_turn:
             return False, '第一手必须出牌'
 
-        self.pass_count += 1
-        self.history.append({'player': pid, 'cards': [], 'action': 'pass'})
-        self.current_player_before = self.current_player
-        self.current_player = (self.current_player + 1) % 4
-
-        if self.pass_count >= 3:
-            self.last_play = None
-            self.last_play_player = None
-            self.last_play_type = None
-            self.last_play_value = -1
-            self.last_play_count = 0
-            self.pass_count = 0
+        self.tracker.on_pass(pid, HAND_TYPES[st.last_type], st.last_value, st.last_count)
+        st.apply(pid, 0)
         return True, 'ok'
 
-    def ai_play(self, pid):
-        is_free = self.last_play_player is None or self.last_play_player == pid
-        thinking, cards = self.ai.decide(
-            hand=self.players[pid],
-            last_type=self.last_play_type,
-            last_value=self.last_play_value,
-            last_count=self.last_play_count,
-            is_free=is_free,
-            first_turn=self.first_turn,
-            other_counts=[len(self.players[i]) for i in range(4)],
+    def ai_play(self, pid, trace=None, ai=None):
+        """trace 缺省时按本局开关与日志级别决定是否记录思考过程; ai 缺省为本局 AI(调度超时时换用快速 AI)"""
+        st = self.state
+        if trace is None:
+            trace = new_trace(self.trace)
+        thinking, cards = (ai or self.ai).decide(
+            hand=self.hand(pid),
+            last_type=HAND_TYPES[st.last_type],
+            last_value=st.last_value,
+            last_count=st.last_count,
+            is_free=st.is_free(pid),
+            first_turn=st.first_turn,
+            other_counts=st.hand_sizes(),
             player_idx=pid,
-            history=self.history
+            history=self.history,
+            tracker=self.tracker,
+            trace=trace
         )
         if cards:
             self.play_cards(pid, [tuple(c) for c in cards])
         else:
             self.pass_turn(pid)
-        return thinking, cards
\ No newline at end of file
+        return thinking, cards
@@ -0,0 +1,215 @@
+"""
+紧凑对局状态
+  - 四家手牌各是一个 52 位掩码
+  - 上一手出牌是固定几个槽位(掩码、出牌者、牌型编号、点数、张数)
+  - 历史是只追加的 array('Q'), 每步一个 64 位整数: 低 52 位为出牌掩码(过牌为 0), 其上 2 位为玩家
+  - snapshot()/restore() 为 O(1)(恢复时截断历史), apply()/undo() 为 O(出牌张数)
+undo 不需要额外的撤销栈: 上一手记录总能从历史末尾最多 4 步内还原
+(连续 3 家过牌后必然有人出牌)。
+to_bytes()/from_bytes() 给出定长头部 + 原样历史的紧凑序列化, 供持久化使用。
+"""
+
+import struct
+import sys
+from array import array
+
+from cards import classify_mask, mask_count, mask_to_hand
+
+HAND_TYPES = (None, 'single', 'pair', 'triple', 'triple_two', 'straight',
+              'consecutive_pairs', 'bomb', 'airplane', 'airplane_pure')
+TYPE_CODE = {t: i for i, t in enumerate(HAND_TYPES)}
+
+CARD_BITS = 52
+CARD_MASK = (1 << CARD_BITS) - 1
+D3_MASK = 1  # 方块3 的编号为 0
+
+
+# 序列化头部: 格式版本, 四家手牌, 当前/上一玩家, 上一手(掩码/出牌者/牌型/点数/张数), 过牌数, 赢家, 首轮
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<B4QBBQbBbBBbB')
+_NONE = -1
+
+
+def pack_action(pid, mask):
+    return mask | pid << CARD_BITS
+
+
+def unpack_action(entry):
+    return entry >> CARD_BITS, entry & CARD_MASK
+
+
+class GameState:
+    __slots__ = ('hands', 'current', 'prev_player', 'last_mask', 'last_player', 'last_type',
+                 'last_value', 'last_count', 'pass_count', 'winner', 'first_turn', 'history')
+
+    def __init__(self):
+        self.hands = [0, 0, 0, 0]
+        self.current = 0
+        self.prev_player = 0
+        self.last_mask = 0
+        self.last_player = None
+        self.last_type = 0
+        self.last_value = -1
+        self.last_count = 0
+        self.pass_count = 0
+        self.winner = None
+        self.first_turn = True
+        self.history = array('Q')
+
+    def is_free(self, pid):
+        return self.last_player is None or self.last_player == pid
+
+    def hand_sizes(self):
+        return [mask_count(m) for m in self.hands]
+
+    # ========== 执行 / 撤销 ==========
+
+    def apply(self, pid, mask, htype=None, hvalue=-1):
+        """执行一步(mask 为 0 表示过牌), 不做合法性校验; htype 为牌型编号, 缺省时查表"""
+        self.history.append(mask | pid << CARD_BITS)
+        self.prev_player = pid
+        if mask:
+            if htype is None:
+                name, hvalue = classify_mask(mask)
+                htype = TYPE_CODE[name]
+            self.hands[pid] &= ~mask
+            self.last_mask = mask
+            self.last_player = pid
+            self.last_type = htype
+            self.last_value = hvalue
+            self.last_count = mask_count(mask)
+            self.pass_count = 0
+            self.first_turn = False
+            if not self.hands[pid]:
+                self.winner = pid
+                return
+        else:
+            self.pass_count += 1
+            if self.pass_count >= 3:
+                self._clear_last()
+        self.current = (pid + 1) % 4
+
+    def undo(self):
+        """撤销最后一步, 返回 (玩家, 掩码)"""
+        pid, mask = unpack_action(self.history.pop())
+        if mask:
+            self.hands[pid] |= mask
+        self.winner = None
+        self.current = pid
+        self.prev_player = self.history[-1] >> CARD_BITS if self.history else 0
+        self._restore_last()
+        return pid, mask
+
+    def _clear_last(self):
+        self.last_mask = 0
+        self.last_player = None
+        self.last_type = 0
+        self.last_value = -1
+        self.last_count = 0
+        self.pass_count = 0
+
+    def _restore_last(self):
+        """从历史末尾找回上一手出牌与其后的过牌数"""
+        history = self.history
+        passes = 0
+        i = len(history) - 1
+        while i >= 0 and not history[i] & CARD_MASK:
+            passes += 1
+            i -= 1
+        if i < 0:
+            self._clear_last()
+            self.first_turn = True
+            return
+        self.first_turn = False
+        if passes >= 3:
+            self._clear_last()
+            return
+        pid, mask = unpack_action(history[i])
+        name, value = classify_mask(mask)
+        self.last_mask = mask
+        self.last_player = pid
+        self.last_type = TYPE_CODE[name]
+        self.last_value = value
+        self.last_count = mask_count(mask)
+        self.pass_count = passes
+
+    # ========== 快照 ==========
+
+    def snapshot(self):
+        return (tuple(self.hands), self.current, self.prev_player, self.last_mask, self.last_player,
+                self.last_type, self.last_value, self.last_count, self.pass_count, self.winner,
+                self.first_turn, len(self.history))
+
+    def restore(self, snap):
+        """恢复到 snapshot 时的状态; 历史只追加, 截断到当时长度即可"""
+        (hands, self.current, self.prev_player, self.last_mask, self.last_player,
+         self.last_type, self.last_value, self.last_count, self.pass_count, self.winner,
+         self.first_turn, n) = snap
+        self.hands = list(hands)
+        del self.history[n:]
+
+    def to_bytes(self):
+        head = _HEADER.pack(
+            _FORMAT_VERSION, *self.hands, self.current, self.prev_player, self.last_mask,
+            _NONE if self.last_player is None else self.last_player, self.last_type, self.last_value,
+            self.last_count, self.pass_count, _NONE if self.winner is None else self.winner,
+            self.first_turn)
+        history = self.history
+        if sys.byteorder != 'little':
+            history = array('Q', history)
+            history.byteswap()
+        return head + history.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        fields = _HEADER.unpack_from(data)
+        if fields[0] != _FORMAT_VERSION:
+            raise ValueError(f'unsupported state format {fields[0]}')
+        st = cls()
+        st.hands = list(fields[1:5])
+        (st.current, st.prev_player, st.last_mask, last_player, st.last_type, st.last_value,
+         st.last_count, st.pass_count, winner, first_turn) = fields[5:]
+        st.last_player = None if last_player == _NONE else last_player
+        st.winner = None if winner == _NONE else winner
+        st.first_turn = bool(first_turn)
+        st.history = array('Q')
+        st.history.frombytes(data[_HEADER.size:])
+        if sys.byteorder != 'little':
+            st.history.byteswap()
+        return st
+
+    def clone(self):
+        other = GameState.__new__(GameState)
+        for slot in GameState.__slots__:
+            setattr(other, slot, getattr(self, slot))
+        other.hands = list(self.hands)
+        other.history = array('Q', self.history)
+        return other
+
+
+class PackedHistory:
+    """把打包历史按 Game.history 原格式({'player', 'cards', 'action'})按需解码的只读视图"""
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __len__(self):
+        return len(self._data)
+
+    def _decode(self, entry):
+        pid, mask = unpack_action(entry)
+        return {'player': pid, 'cards': [list(c) for c in mask_to_hand(mask)],
+                'action': 'play' if mask else 'pass'}
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._decode(e) for e in self._data[idx]]
+        return self._decode(self._data[idx])
+
+    def __iter__(self):
+        for e in self._data:
+            yield self._decode(e)
+
+    def __bool__(self):
+        return len(self._data) > 0
@@ -0,0 +1,137 @@
+"""
+对局存储
+  - GameStore: 进程内 LRU + TTL 存储, 有最大对局数上限, 后台线程定期清理过期对局
+  - 已结束的对局使用更短的 TTL, 尽快释放内存
+  - stats() 给出在线对局数、淘汰次数与每局近似内存占用, 便于按数据规划容量
+其他后端只需实现 get / put / delete / stats 即可替换。
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+# 估算内存时每次最多抽样的对局数
+SIZE_SAMPLE = 50
+# 共享的常量对象不计入单局占用
+_ATOMS = (str, int, float, bool, type(None))
+
+
+def approx_size(obj, seen=None):
+    """递归估算对象占用字节数(容器与实例字典, 忽略字符串/数字等共享原子)"""
+    if seen is None:
+        seen = set()
+    if isinstance(obj, _ATOMS) or id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += approx_size(k, seen) + approx_size(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        for item in obj:
+            size += approx_size(item, seen)
+    if hasattr(obj, '__dict__'):
+        size += approx_size(vars(obj), seen)
+    for slot in getattr(type(obj), '__slots__', ()):
+        if hasattr(obj, slot):
+            size += approx_size(getattr(obj, slot), seen)
+    return size
+
+
+class GameStore:
+
+    def __init__(self, max_games=10000, ttl=3600, finished_ttl=300, sweep_interval=30):
+        self.max_games = max_games
+        self.ttl = ttl
+        self.finished_ttl = finished_ttl
+        self.sweep_interval = sweep_interval
+        self._games = OrderedDict()  # game_id -> (game, 最后访问时间)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = None
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+
+    def get(self, game_id):
+        with self._lock:
+            entry = self._games.get(game_id)
+            if entry is None:
+                return None
+            game = entry[0]
+            if self._expired(game, entry[1], time.time()):
+                del self._games[game_id]
+                self.evicted_ttl += 1
+                return None
+            self._games[game_id] = (game, time.time())
+            self._games.move_to_end(game_id)
+            return game
+
+    def put(self, game_id, game):
+        with self._lock:
+            self._games[game_id] = (game, time.time())
+            self._games.move_to_end(game_id)
+            while len(self._games) > self.max_games:
+                self._games.popitem(last=False)
+                self.evicted_lru += 1
+
+    def delete(self, game_id):
+        with self._lock:
+            self._games.pop(game_id, None)
+
+    def __contains__(self, game_id):
+        return self.get(game_id) is not None
+
+    def __len__(self):
+        return len(self._games)
+
+    def ids(self):
+        """当前缓存的对局号(不刷新访问时间)"""
+        with self._lock:
+            return set(self._games)
+
+    def _expired(self, game, touched, now):
+        ttl = self.finished_ttl if game.winner is not None else self.ttl
+        return now - touched > ttl
+
+    def sweep(self):
+        """清理过期对局, 返回清理数量"""
+        now = time.time()
+        with self._lock:
+            expired = [gid for gid, (game, touched) in self._games.items()
+                       if self._expired(game, touched, now)]
+            for gid in expired:
+                del self._games[gid]
+            self.evicted_ttl += len(expired)
+        return len(expired)
+
+    def start_sweeper(self):
+        if self._sweeper is not None:
+            return
+        self._sweeper = threading.Thread(target=self._sweep_loop, name='game-store-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            self.sweep()
+
+    def stats(self):
+        with self._lock:
+            games = [g for g, _ in self._games.values()]
+        live = len(games)
+        finished = sum(1 for g in games if g.winner is not None)
+        step = max(1, live // SIZE_SAMPLE)
+        sample = games[::step][:SIZE_SAMPLE]
+        per_game = int(sum(approx_size(g) for g in sample) / len(sample)) if sample else 0
+        return {
+            'live_games': live,
+            'finished_games': finished,
+            'max_games': self.max_games,
+            'evicted_lru': self.evicted_lru,
+            'evicted_ttl': self.evicted_ttl,
+            'approx_bytes_per_game': per_game,
+            'approx_total_bytes': per_game * live,
+        }
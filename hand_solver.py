@@ -0,0 +1,191 @@
+"""
+手牌最优拆解(最少出牌手数)
+  - 状态只是 13 个点数的张数(即 cards.signature), 与花色无关
+  - 每个状态只枚举包含最小点数的出法: 最小点数总要在某一手里打出, 这样不漏解也不重复
+  - 结果用进程内 lru_cache 缓存, 对局之间共享; 常见手型热身后查询基本是 O(1)
+  - min_plays: 出完手牌最少需要几手; decompose: 一种最优拆法; best_next_play: 自由出牌时先出哪一手
+只考虑自己出完所需手数, 不考虑对手能否压住。
+"""
+
+from functools import lru_cache
+
+from cards import HAND_TABLE, RANK_ORDER, SUIT_ORDER, counts_to_signature, signature, signature_to_counts
+
+CACHE_SIZE = 1 << 18
+_SHIFT = 3
+_NO_PLAY = 99
+# A 的点数; 不小于它的单张/对子留到后面出
+HIGH_VALUE = RANK_ORDER['A']
+
+# 不带牌的牌型(单张/对子/三条/炸弹/顺子/连对/纯飞机), 按最小点数分组; 带牌牌型在搜索时现生成
+_PLAIN_TYPES = ('single', 'pair', 'triple', 'bomb', 'straight', 'consecutive_pairs', 'airplane_pure')
+
+
+def _lowest(counts):
+    for r, n in enumerate(counts):
+        if n:
+            return r
+    return -1
+
+
+def _plain_index():
+    index = [[] for _ in range(13)]
+    for sig, (htype, _) in HAND_TABLE.items():
+        if htype in _PLAIN_TYPES:
+            counts = signature_to_counts(sig)
+            index[_lowest(counts)].append((sig, counts))
+    for plays in index:
+        # 张数多的在前, 同样手数时优先保留大组合
+        plays.sort(key=lambda p: -sum(p[1]))
+    return index
+
+
+_PLAIN = _plain_index()
+
+
+def _fits(play, counts):
+    return all(p <= c for p, c in zip(play, counts))
+
+
+def _extras(counts, k, start=0):
+    """从 counts 中选 k 张(只看点数)的所有组合, 产出各点数张数的稀疏列表 [(点数, 张数)]"""
+    if k == 0:
+        yield []
+        return
+    for r in range(start, 13):
+        for n in range(min(counts[r], k), 0, -1):
+            for rest in _extras(counts, k - n, r + 1):
+                yield [(r, n)] + rest
+
+
+def _with_kickers(counts, low, body, k, htype):
+    """body 加 k 张带牌, 结果必须包含最小点数 low 且查表为 htype"""
+    left = list(counts)
+    for r, n in body:
+        left[r] -= n
+    need_low = all(r != low for r, _ in body)
+    base = 0
+    for r, n in body:
+        base += n << (_SHIFT * r)
+    for extra in _extras(left, k, low):
+        if need_low and extra[0][0] != low:
+            continue
+        sig = base
+        for r, n in extra:
+            sig += n << (_SHIFT * r)
+        hit = HAND_TABLE.get(sig)
+        if hit is not None and hit[0] == htype:
+            yield sig
+
+
+def _plays(sig):
+    """当前状态下所有包含最小点数的出法签名"""
+    counts = signature_to_counts(sig)
+    low = _lowest(counts)
+    seen = set()
+    for play_sig, play in _PLAIN[low]:
+        if _fits(play, counts):
+            seen.add(play_sig)
+            yield play_sig
+    # 三带二: 三条本身是最小点数, 或最小点数作为带牌
+    for t in range(low, 13):
+        if counts[t] >= 3:
+            for s in _with_kickers(counts, low, [(t, 3)], 2, 'triple_two'):
+                if s not in seen:
+                    seen.add(s)
+                    yield s
+    # 带翅膀的飞机(13 张以内只有两连)
+    for t in range(low, 12):
+        if counts[t] >= 3 and counts[t + 1] >= 3:
+            for s in _with_kickers(counts, low, [(t, 3), (t + 1, 3)], 4, 'airplane'):
+                if s not in seen:
+                    seen.add(s)
+                    yield s
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _solve(sig):
+    """返回 (最少手数, 最优拆法中包含最小点数的那一手)"""
+    if sig == 0:
+        return 0, 0
+    if sig in HAND_TABLE:
+        return 1, sig
+    best = (_NO_PLAY, 0)
+    for play in _plays(sig):
+        n = _solve(sig - play)[0] + 1
+        if n < best[0]:
+            best = (n, play)
+            if n == 2:
+                break
+    return best
+
+
+def min_plays(hand):
+    """出完 hand 最少需要几手"""
+    return _solve(signature(hand))[0]
+
+
+def decompose_signature(sig):
+    """最优拆法: 每一手的签名列表"""
+    parts = []
+    while sig:
+        play = _solve(sig)[1]
+        if not play:
+            break
+        parts.append(play)
+        sig -= play
+    return parts
+
+
+def _cards_for(hand, play_sig, used):
+    """按签名从 hand 中取牌(同点数取花色最小的未用牌)"""
+    need = signature_to_counts(play_sig)
+    cards = []
+    for c in sorted(hand, key=lambda c: (RANK_ORDER[c[1]], SUIT_ORDER[c[0]])):
+        r = RANK_ORDER[c[1]]
+        if need[r] and c not in used:
+            need[r] -= 1
+            cards.append(c)
+            used.add(c)
+    return cards
+
+
+def decompose(hand):
+    """最优拆法: [(牌型, 点数, 牌列表)], 按出牌强度从弱到强排列"""
+    used = set()
+    parts = []
+    for play in decompose_signature(signature(hand)):
+        htype, hvalue = HAND_TABLE[play]
+        parts.append((htype, hvalue, _cards_for(hand, play, used)))
+    parts.sort(key=lambda p: (p[0] == 'bomb', p[1], -len(p[2])))
+    return parts
+
+
+def _lead_key(part):
+    """先出张数多的组合, 同张数先出小的; 炸弹和 A/2 的单张、对子留作控制"""
+    htype, hvalue, cards = part
+    return htype == 'bomb', hvalue >= HIGH_VALUE and len(cards) <= 2, -len(cards), hvalue
+
+
+def best_next_play(hand):
+    """自由出牌时先出的一手(取自最优拆法); 返回 (牌型, 点数, 牌列表) 或 None"""
+    parts = decompose(hand)
+    return min(parts, key=_lead_key) if parts else None
+
+
+def signature_min_plays(sig):
+    """按点数签名查询最少手数"""
+    return _solve(sig)[0]
+
+
+def counts_min_plays(counts):
+    """按 13 个点数的张数查询最少手数"""
+    return _solve(counts_to_signature(counts))[0]
+
+
+def cache_info():
+    return _solve.cache_info()
+
+
+def clear_cache():
+    _solve.cache_clear()
@@ -0,0 +1,225 @@
+"""
+蒙特卡洛采样 AI
+策略:
+  1. 确定化: 未见过的牌 = 整副牌 - 自己手牌 - 历史已出牌, 按各家剩余张数随机分给对手
+  2. 候选: 启发式 AIPlayer 的选择 + 每种牌型最弱的出法 + 过牌, 数量有上限
+  3. 推演: 每轮采样一个世界, 所有候选在同一世界里各推演一局(启发式 AI 作为推演策略)
+  4. 预算: 每次决策有硬性的时间与推演次数上限, 超时立即用已有统计作答
+可选传入进程池并行推演; 进程池由调用方持有, 多张牌桌可以共用。
+"""
+
+import random
+import time
+from concurrent.futures import wait
+
+from ai_player import AIPlayer
+from card_tracker import CardTracker
+from cards import hand_to_mask
+from decision_log import NULL_TRACE, LazyCards
+from game_logic import Game
+from game_state import TYPE_CODE
+
+# 单局推演的回合上限, 防止异常局面死循环
+MAX_ROLLOUT_TURNS = 400
+
+
+def _position(hand, last_type, last_value, last_count, is_free, first_turn, other_counts, player_idx, history, tracker):
+    """把决策现场整理成可跨进程传递的字典"""
+    if tracker is None:
+        tracker = CardTracker.from_history(history)
+    last_play_player = None
+    last_mask = 0
+    pass_count = 0
+    if not is_free:
+        # 上一手出牌者与其后的连续过牌数从历史尾部还原
+        for action in reversed(history):
+            if action.get('action') == 'play':
+                last_play_player = action.get('player')
+                last_mask = hand_to_mask(action.get('cards', []))
+                break
+            pass_count += 1
+    return {
+        'hand': [tuple(c) for c in hand],
+        'unseen': tracker.unseen(hand),
+        'counts': list(other_counts),
+        'pid': player_idx,
+        'last_type': None if is_free else last_type,
+        'last_value': -1 if is_free else last_value,
+        'last_count': 0 if is_free else last_count,
+        'last_play_player': last_play_player,
+        'last_mask': last_mask,
+        'pass_count': pass_count,
+        'first_turn': first_turn,
+        'tracker': tracker.copy(),
+    }
+
+
+class _RolloutAI(AIPlayer):
+    """推演用的启发式 AI; 推演本身就是前瞻, 不再做残局搜索"""
+    endgame = None
+
+
+def _world(pos, rng):
+    """按位置采样一个对手手牌确定的 Game"""
+    unseen = list(pos['unseen'])
+    rng.shuffle(unseen)
+    game = Game(ai=_RolloutAI())
+    st = game.state
+    at = 0
+    for i in range(4):
+        if i == pos['pid']:
+            st.hands[i] = hand_to_mask(pos['hand'])
+        else:
+            n = pos['counts'][i]
+            st.hands[i] = hand_to_mask(unseen[at:at + n])
+            at += n
+    st.current = pos['pid']
+    st.last_mask = pos['last_mask']
+    st.last_player = pos['last_play_player']
+    st.last_type = TYPE_CODE[pos['last_type']]
+    st.last_value = pos['last_value']
+    st.last_count = pos['last_count']
+    st.pass_count = pos['pass_count']
+    st.first_turn = pos['first_turn']
+    game.tracker = pos['tracker'].copy()
+    return game
+
+
+def _playout(game, pid, move):
+    """执行候选后用启发式 AI 下完整局, 返回 pid 是否获胜"""
+    if move:
+        game.play_cards(pid, list(move))
+    else:
+        game.pass_turn(pid)
+    turns = 0
+    while game.winner is None and turns < MAX_ROLLOUT_TURNS:
+        game.ai_play(game.current_player, trace=NULL_TRACE)
+        turns += 1
+    return game.winner == pid
+
+
+def rollout_batch(pos, candidates, seed, n_worlds, deadline):
+    """在 n_worlds 个采样世界里推演全部候选; 返回每个候选的 (胜局, 推演数)
+    deadline 为 time.monotonic() 时刻(同一台机器上各进程共用一个单调时钟, 不受系统校时影响)"""
+    rng = random.Random(seed)
+    wins = [0] * len(candidates)
+    runs = 0
+    for _ in range(n_worlds):
+        # 同一轮的候选使用同一个世界(公共随机数), 降低比较方差; 每个候选推演前恢复快照
+        game = _world(pos, rng)
+        snap = game.snapshot()
+        round_wins = []
+        for move in candidates:
+            if time.monotonic() >= deadline:
+                # 超时的半轮不计入, 保证各候选推演次数相同
+                return wins, runs
+            game.restore(snap)
+            round_wins.append(_playout(game, pos['pid'], move))
+        for i, won in enumerate(round_wins):
+            wins[i] += won
+        runs += 1
+    return wins, runs
+
+
+class MonteCarloAIPlayer(AIPlayer):
+
+    def __init__(self, time_limit=0.15, max_rollouts=600, max_candidates=8, pool=None, pool_tasks=4, seed=None):
+        self.time_limit = time_limit
+        self.max_rollouts = max_rollouts
+        self.max_candidates = max_candidates
+        self.pool = pool
+        self.pool_tasks = pool_tasks
+        self.rng = random.Random(seed)
+
+    def decide(self, hand, last_type, last_value, last_count, is_free, first_turn, other_counts, player_idx,
+               history=None, tracker=None, trace=None):
+        t0 = time.monotonic()
+        deadline = t0 + self.time_limit
+        history = history or []
+        log, heuristic = super().decide(hand, last_type, last_value, last_count, is_free,
+                                        first_turn, other_counts, player_idx, history, tracker, trace)
+
+        pos = _position(hand, last_type, last_value, last_count, is_free, first_turn,
+                        other_counts, player_idx, history, tracker)
+        candidates = self._candidates(pos, heuristic)
+        if len(candidates) <= 1:
+            log.append("蒙特卡洛: 只有一种选择, 沿用启发式")
+            return log, heuristic
+
+        n_worlds = max(1, self.max_rollouts // len(candidates))
+        if self.pool is not None:
+            wins, runs = self._search_pool(pos, candidates, n_worlds, deadline)
+        else:
+            wins, runs = rollout_batch(pos, candidates, self.rng.getrandbits(32), n_worlds, deadline)
+        if not runs:
+            log.append("蒙特卡洛: 预算内未完成推演, 沿用启发式")
+            return log, heuristic
+
+        heuristic_key = self._move_key(heuristic)
+        best = max(range(len(candidates)),
+                   key=lambda i: (wins[i], self._move_key(candidates[i]) == heuristic_key))
+        for move, w in zip(candidates, wins):
+            log.append("蒙特卡洛候选 %s: 胜率 %s/%s", LazyCards(move) if move else '不出', w, runs)
+        log.append("蒙特卡洛: %s 个采样世界, 耗时 %.0fms", runs, (time.monotonic() - t0) * 1000)
+
+        result = list(candidates[best]) if candidates[best] else None
+        # 启发式的决策已由父类记录, 这里只记录改选
+        if self._move_key(candidates[best]) == heuristic_key:
+            log.append("蒙特卡洛: 沿用启发式")
+        elif result:
+            log.append("蒙特卡洛改选 -> 出: %s", LazyCards(result))
+        else:
+            log.append("蒙特卡洛改选 -> 不出")
+        return log, result
+
+    def _move_key(self, move):
+        return tuple(sorted(tuple(c) for c in move)) if move else None
+
+    def _candidates(self, pos, heuristic):
+        """启发式选择优先, 然后每种牌型取最弱的出法, 最后按强度补足"""
+        moves = _world(pos, self.rng).legal_moves(pos['pid'])
+        candidates = []
+        keys = set()
+
+        def add(move):
+            key = self._move_key(move)
+            if key not in keys and len(candidates) < self.max_candidates:
+                keys.add(key)
+                candidates.append(move)
+
+        # 自由出牌时启发式必定出牌; 跟牌时过牌总是候选
+        add(tuple(tuple(c) for c in heuristic) if heuristic else None)
+        if pos['last_type'] is not None:
+            add(None)
+        seen_types = set()
+        for htype, _, cards in moves:
+            if htype not in seen_types:
+                seen_types.add(htype)
+                add(cards)
+        for _, _, cards in moves:
+            add(cards)
+        return candidates
+
+    def _search_pool(self, pos, candidates, n_worlds, deadline):
+        """把采样世界切块分发到进程池, 到点后只统计已完成的块"""
+        chunk = max(1, n_worlds // self.pool_tasks)
+        futures = []
+        left = n_worlds
+        while left > 0:
+            k = min(chunk, left)
+            futures.append(self.pool.submit(rollout_batch, pos, candidates,
+                                            self.rng.getrandbits(32), k, deadline))
+            left -= k
+        done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        for fut in not_done:
+            fut.cancel()
+        wins = [0] * len(candidates)
+        runs = 0
+        for fut in done:
+            if fut.cancelled() or fut.exception() is not None:
+                continue
+            w, r = fut.result()
+            runs += r
+            for i, x in enumerate(w):
+                wins[i] += x
+        return wins, runs
@@ -0,0 +1,193 @@
+"""
+热路径计时与 Prometheus 文本格式导出
+  - Histogram: 固定分桶的耗时直方图, 按标签取值分子序列; 一次 observe 只做一次二分查找和一次加锁计数,
+    开销在微秒级, 可以放在每个请求、每次 AI 决策和每次规则引擎调用上
+  - Callback: 抓取时现取的数值(对局存储、AI 调度器已有的统计), 平时没有任何开销
+  - Registry.render() 输出 Prometheus 文本格式(0.0.4), 供 /metrics 抓取; 每个进程一份, 多进程部署时各自导出
+  - SamplingProfiler: 按比例抽样请求和 AI 决策做 cProfile, 结果按路由(AI 决策按 AI 类型)写成 .prof 文件
+    (snakeviz / pstats 查看); cProfile 只剖析开启它的线程, AI 调度线程里的每步决策用另一个实例单独抽样;
+    每个实例同一时刻只剖析一处, 比例为 0 时完全不生效
+"""
+
+import bisect
+import cProfile
+import os
+import random
+import threading
+import time
+
+# 请求与 AI 决策(秒)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 规则引擎调用与序列化(秒), 通常在微秒级
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Timer:
+    __slots__ = ('child', 't0')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.t0)
+
+
+class _Series:
+    """一组标签取值的计数"""
+    __slots__ = ('upper', 'counts', 'sum', 'lock')
+
+    def __init__(self, upper):
+        self.upper = upper
+        self.counts = [0] * (len(upper) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.upper, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class Histogram:
+
+    def __init__(self, name, doc, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labels)
+        self.upper = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """取(必要时新建)一组标签取值的子序列; 取值按 labels 的顺序给出"""
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}')
+            with self._lock:
+                series = self._series.setdefault(values, _Series(self.upper))
+        return series
+
+    def observe(self, value, *values):
+        self.labels(*values).observe(value)
+
+    def time(self, *values):
+        """with hist.time('play_cards'): ... 记录代码块耗时"""
+        return _Timer(self.labels(*values))
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.doc}', f'# TYPE {self.name} histogram']
+        for values, series in list(self._series.items()):
+            with series.lock:
+                counts = list(series.counts)
+                total = series.sum
+            base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values))
+            sep = ',' if base else ''
+            cumulative = 0
+            for le, n in zip(self.upper + (float('inf'),), counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{_fmt(le)}"}} {cumulative}')
+            suffix = f'{{{base}}}' if base else ''
+            lines.append(f'{self.name}_sum{suffix} {_fmt(total)}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+
+class Callback:
+    """抓取时调用 fn() 取一个 {名字: 数值} 字典, 每项导出为 prefix_名字; 非数值项跳过"""
+
+    def __init__(self, prefix, doc, fn, counters=()):
+        self.prefix = prefix
+        self.doc = doc
+        self.fn = fn
+        self.counters = set(counters)
+
+    def collect(self):
+        lines = []
+        for key, value in self.fn().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f'{self.prefix}_{key}'
+            kind = 'counter' if key in self.counters else 'gauge'
+            if kind == 'counter':
+                name += '_total'
+            lines += [f'# HELP {name} {self.doc}: {key}', f'# TYPE {name} {kind}', f'{name} {_fmt(value)}']
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, name, doc, labels=(), buckets=LATENCY_BUCKETS):
+        hist = Histogram(name, doc, labels, buckets)
+        self._metrics.append(hist)
+        return hist
+
+    def callback(self, prefix, doc, fn, counters=()):
+        cb = Callback(prefix, doc, fn, counters)
+        self._metrics.append(cb)
+        return cb
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.collect()
+        return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler:
+    """以 rate 的概率剖析一个请求或一步 AI 决策(只覆盖调用 start 的线程); start 返回的句柄交给 stop 写出结果"""
+
+    def __init__(self, rate=0.0, directory='logs/profiles'):
+        self.rate = rate
+        self.directory = directory
+        self.dumped = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.rate <= 0 or random.random() >= self.rate:
+            return None
+        # 同一时刻只剖析一处, 正在剖析时跳过; Python 3.12 起解释器只允许一个剖析器, 另一个实例正在剖析时 enable 失败也跳过
+        if not self._lock.acquire(blocking=False):
+            return None
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            self._lock.release()
+            return None
+        return prof
+
+    def stop(self, prof, name):
+        if prof is None:
+            return None
+        try:
+            prof.disable()
+        finally:
+            self._lock.release()
+        os.makedirs(self.directory, exist_ok=True)
+        safe = ''.join(c if c.isalnum() else '_' for c in name).strip('_') or 'root'
+        path = os.path.join(self.directory, f'{safe}-{time.time_ns()}.prof')
+        prof.dump_stats(path)
+        self.dumped += 1
+        return path
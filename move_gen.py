@@ -0,0 +1,172 @@
+"""
+合法出牌生成器
+  - 手牌只按点数分组一次, 所有牌型在同一次遍历中枚举
+  - 同点数的牌按花色从小到大取用, 花色不同但点数相同的出法只生成一次
+  - 三带二 / 飞机枚举所有带牌组合, 顺子 / 连对枚举所有起点与长度
+  - 每手牌的牌型和点数都经 classify_cards 判定, 与 Game 的出牌校验完全一致
+返回的每一项为 (牌型, 点数, 牌元组), 牌元组按 card_sort_key 顺序排列。
+"""
+
+from cards import ALL_CARDS, CARD_INDEX, classify_cards, hand_to_mask
+
+
+def can_beat(last_type, last_value, last_count, new_type, new_value, new_count):
+    if new_type == 'bomb':
+        if last_type == 'bomb':
+            return new_value > last_value
+        return True
+    if last_type == 'bomb':
+        return False
+    if new_type != last_type:
+        return False
+    if new_count != last_count:
+        return False
+    return new_value > last_value
+
+
+def move_strength(move):
+    """排序键: 炸弹最后, 其余按点数从小到大, 同点数张数少的在前"""
+    htype, hvalue, cards = move
+    return (htype == 'bomb', hvalue, len(cards))
+
+
+def group_hand(hand):
+    """按点数分组, groups[i] 为点数序号 i 的牌(花色升序)"""
+    groups = [[] for _ in range(13)]
+    mask = hand_to_mask(hand)
+    while mask:
+        low = mask & -mask
+        idx = low.bit_length() - 1
+        groups[idx >> 2].append(ALL_CARDS[idx])
+        mask ^= low
+    return groups
+
+
+# ========== 各牌型枚举 ==========
+
+def _sets(groups, k):
+    """同点数 k 张: 单张/对子/三条/炸弹"""
+    for cs in groups:
+        if len(cs) >= k:
+            yield tuple(cs[:k])
+
+
+def _runs(groups, width, min_len, length=None):
+    """连续点数各取 width 张: 顺子(1)、连对(2)、飞机机身(3); 产出 (起点, 长度, 牌)"""
+    for start in range(13):
+        cards = []
+        for i in range(start, 13):
+            if len(groups[i]) < width:
+                break
+            cards.extend(groups[i][:width])
+            l = i - start + 1
+            if length is not None and l > length:
+                break
+            if l >= min_len and (length is None or l == length):
+                yield start, l, tuple(cards)
+
+
+def _wings(groups, body_start, body_len, k):
+    """机身之外任选 k 张带牌, 按点数组合枚举"""
+    spare = [cs[3:] if body_start <= i < body_start + body_len else cs
+             for i, cs in enumerate(groups)]
+
+    def rec(i, left):
+        if left == 0:
+            yield ()
+            return
+        if i == 13:
+            return
+        cs = spare[i]
+        for take in range(min(left, len(cs)), -1, -1):
+            head = tuple(cs[:take])
+            for tail in rec(i + 1, left - take):
+                yield head + tail
+
+    return rec(0, k)
+
+
+def _with_wings(groups, start, length, body, k):
+    for wing in _wings(groups, start, length, k):
+        yield tuple(sorted(body + wing, key=CARD_INDEX.__getitem__))
+
+
+def _triple_twos(groups):
+    for i, cs in enumerate(groups):
+        if len(cs) >= 3:
+            yield from _with_wings(groups, i, 1, tuple(cs[:3]), 2)
+
+
+def _airplanes(groups, length=None, pure=True, winged=True):
+    for start, l, body in _runs(groups, 3, 2, length):
+        if pure:
+            yield body
+        if winged:
+            yield from _with_wings(groups, start, l, body, l * 2)
+
+
+def _straights(groups, length=None):
+    for _, _, cards in _runs(groups, 1, 3, length):
+        yield cards
+
+
+def _consecutive_pairs(groups, length=None):
+    for _, _, cards in _runs(groups, 2, 2, length):
+        yield cards
+
+
+def _free_candidates(groups):
+    yield from _sets(groups, 1)
+    yield from _sets(groups, 2)
+    yield from _sets(groups, 3)
+    yield from _triple_twos(groups)
+    yield from _straights(groups)
+    yield from _consecutive_pairs(groups)
+    yield from _airplanes(groups)
+    yield from _sets(groups, 4)
+
+
+def _response_candidates(groups, last_type, last_count):
+    """只枚举可能压住上一手的牌型: 同牌型同张数, 以及炸弹"""
+    if last_type == 'single':
+        yield from _sets(groups, 1)
+    elif last_type == 'pair':
+        yield from _sets(groups, 2)
+    elif last_type == 'triple':
+        yield from _sets(groups, 3)
+    elif last_type == 'triple_two':
+        yield from _triple_twos(groups)
+    elif last_type == 'straight':
+        yield from _straights(groups, last_count)
+    elif last_type == 'consecutive_pairs':
+        yield from _consecutive_pairs(groups, last_count // 2)
+    elif last_type == 'airplane_pure':
+        yield from _airplanes(groups, last_count // 3, winged=False)
+    elif last_type == 'airplane':
+        yield from _airplanes(groups, last_count // 5, pure=False)
+    yield from _sets(groups, 4)
+
+
+def legal_moves(hand, last_type=None, last_value=-1, last_count=0):
+    """枚举 hand 中所有能出的牌, 按 move_strength 从弱到强排序。
+    last_type 为 None 表示自由出牌; 否则只返回能压住上一手的出法。"""
+    groups = group_hand(hand)
+    if last_type is None:
+        candidates = _free_candidates(groups)
+    else:
+        candidates = _response_candidates(groups, last_type, last_count)
+
+    moves = []
+    seen = set()
+    for cards in candidates:
+        if cards in seen:
+            continue
+        seen.add(cards)
+        htype, hvalue = classify_cards(cards)
+        if htype is None:
+            continue
+        if last_type is not None and not can_beat(last_type, last_value, last_count, htype, hvalue, len(cards)):
+            continue
+        moves.append((htype, hvalue, cards))
+    moves.sort(key=move_strength)
+    return moves
@@ -0,0 +1,278 @@
+"""
+开局手牌强度表
+  - 离线构建: 用现有 Game + AIPlayer 批量自我对局, 按点数签名(cards.signature)汇总
+    每手 13 张起手牌的对局数、胜局数与名次和(赢家第 1, 其余按剩余牌数排名, 并列取平均)
+  - 同时按粗粒度特征(张数、最少手数、2/A 张数、炸弹数)汇总对局中每一个手牌状态,
+    用作未收录签名与中途手牌的估计, 并作为精确条目的先验
+  - 结果写成定长头部 + 排好序的键/统计数组的二进制文件; 运行时只读 mmap,
+    多个工作进程共享同一份页缓存, 打开即用, 查询是数组上的二分查找
+文件不存在时 default_book() 返回 None, AI 退回原有规则。
+
+用法:
+  python opening_book.py -n 200000 -w 8 -o opening_book.bin
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+
+from cards import RANK_ORDER, mask_signature, signature, signature_to_counts
+from dealer import deal_batch
+from game_state import CARD_MASK, CARD_BITS
+from hand_solver import signature_min_plays
+
+BOOK_PATH = os.environ.get('OPENING_BOOK', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin'))
+
+_MAGIC = b'PKOB'
+_FORMAT_VERSION = 1
+# 魔数, 版本, 保留, 精确条目数, 特征条目数; 长度为 8 的倍数, 之后的数组自然对齐
+_HEADER = struct.Struct('<4sHHQQ')
+# 每个条目的统计: 对局数, 胜局数, 名次和 x2(并列名次取平均后仍为整数)
+_STATS = 3
+# 精确条目对局数少时向特征均值收缩的强度(相当于多少局先验)
+PRIOR_GAMES = 8
+# 防止 AI 出现非法出牌导致死循环
+MAX_TURNS = 1000
+
+_TWO = RANK_ORDER['2']
+_ACE = RANK_ORDER['A']
+
+
+def control_cards(sig):
+    """控制牌数: 2 与 A 的张数加炸弹个数"""
+    counts = signature_to_counts(sig)
+    return counts[_TWO] + counts[_ACE] + sum(1 for n in counts if n == 4)
+
+
+def feature_key(sig):
+    """粗粒度特征: 张数、最少手数、2 张数、A 张数、炸弹数, 打包成一个整数"""
+    counts = signature_to_counts(sig)
+    bombs = sum(1 for n in counts if n == 4)
+    key = sum(counts)
+    for v, width in ((signature_min_plays(sig), 16), (counts[_TWO], 8), (counts[_ACE], 8), (bombs, 4)):
+        key = key * width + v
+    return key
+
+
+def finishing_ranks(winner, cards_left):
+    """各家名次 x2: 赢家为 2, 其余按剩余牌数排名, 并列取平均"""
+    ranks = [0] * 4
+    for p in range(4):
+        if p == winner:
+            ranks[p] = 2
+            continue
+        ahead = sum(1 for q in range(4) if q != winner and q != p and cards_left[q] < cards_left[p])
+        tied = sum(1 for q in range(4) if q != winner and q != p and cards_left[q] == cards_left[p])
+        # 名次 = 2 + ahead + tied / 2, 乘 2 后为整数
+        ranks[p] = 2 * (2 + ahead) + tied
+    return ranks
+
+
+# ========== 构建 ==========
+
+def _add(table, key, won, rank2):
+    stats = table.get(key)
+    if stats is None:
+        table[key] = [1, won, rank2]
+    else:
+        stats[0] += 1
+        stats[1] += won
+        stats[2] += rank2
+
+
+def _play_batch(seeds):
+    """模拟一批对局, 返回 (精确条目, 特征条目) 两个 {键: [对局数, 胜局数, 名次和x2]}"""
+    # ai_player 在导入时读取本模块, 构建时才导入 Game 以避免循环导入
+    from game_logic import Game
+    exact, features = {}, {}
+    for deck in deal_batch(seeds):
+        game = Game()
+        game.set_deck(deck)
+        hands = list(game.state.hands)
+        turns = 0
+        while game.winner is None and turns < MAX_TURNS:
+            game.ai_play(game.current_player)
+            turns += 1
+        if game.winner is None:
+            continue
+        ranks = finishing_ranks(game.winner, game.hand_sizes())
+        seen = [[mask_signature(h)] for h in hands]
+        for entry in game.state.history:
+            mask = entry & CARD_MASK
+            if mask:
+                pid = entry >> CARD_BITS
+                hands[pid] &= ~mask
+                if hands[pid]:
+                    seen[pid].append(mask_signature(hands[pid]))
+        for p in range(4):
+            won = p == game.winner
+            _add(exact, seen[p][0], won, ranks[p])
+            for sig in seen[p]:
+                _add(features, feature_key(sig), won, ranks[p])
+    return exact, features
+
+
+def _merge(into, part):
+    for key, (n, w, r) in part.items():
+        stats = into.get(key)
+        if stats is None:
+            into[key] = [n, w, r]
+        else:
+            stats[0] += n
+            stats[1] += w
+            stats[2] += r
+
+
+def build(n_games, workers=None, seed=0, batch_size=500):
+    """模拟 n_games 局并汇总, 返回 (精确条目, 特征条目)"""
+    batches = [list(range(seed + s, seed + min(s + batch_size, n_games))) for s in range(0, n_games, batch_size)]
+    if workers == 1:
+        return _collect(map(_play_batch, batches))
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        return _collect(pool.map(_play_batch, batches))
+
+
+def _collect(parts):
+    exact, features = {}, {}
+    for part_exact, part_features in parts:
+        _merge(exact, part_exact)
+        _merge(features, part_features)
+    return exact, features
+
+
+def _arrays(table):
+    keys = sorted(table)
+    stats = array('I')
+    for k in keys:
+        stats.extend(table[k])
+    return array('Q', keys), stats
+
+
+def write_book(path, exact, features):
+    """写出二进制表; 先写临时文件再改名, 正在 mmap 旧文件的进程不受影响"""
+    parts = []
+    for table in (exact, features):
+        keys, stats = _arrays(table)
+        if sys.byteorder != 'little':
+            keys.byteswap()
+            stats.byteswap()
+        stats_bytes = stats.tobytes()
+        parts.append(keys.tobytes())
+        # 统计数组补齐到 8 字节, 下一段键数组保持对齐
+        parts.append(stats_bytes + b'\0' * (-len(stats_bytes) % 8))
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, 0, len(exact), len(features)))
+        for part in parts:
+            f.write(part)
+    os.replace(tmp, path)
+
+
+# ========== 查询 ==========
+
+class OpeningBook:
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, n_exact, n_features = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError(f'unsupported opening book {path}')
+        view = memoryview(self._mmap)
+        at = _HEADER.size
+        self._exact, at = self._section(view, at, n_exact)
+        self._features, at = self._section(view, at, n_features)
+        self.path = path
+
+    @staticmethod
+    def _section(view, at, n):
+        keys = view[at:at + 8 * n]
+        at += 8 * n
+        size = 4 * _STATS * n
+        stats = view[at:at + size]
+        at += size + (-size % 8)
+        if sys.byteorder != 'little':
+            # 大端机器上复制一份并翻转字节序, 不再共享页缓存
+            keys, stats = array('Q', keys.tobytes()), array('I', stats.tobytes())
+            keys.byteswap()
+            stats.byteswap()
+            return (keys, stats), at
+        return (keys.cast('Q'), stats.cast('I')), at
+
+    def __len__(self):
+        return len(self._exact[0])
+
+    @staticmethod
+    def _find(section, key):
+        keys, stats = section
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return tuple(stats[i * _STATS:(i + 1) * _STATS])
+        return None
+
+    def stats(self, sig):
+        """起手签名的原始统计 (对局数, 胜局数, 名次和x2); 未收录返回 None"""
+        return self._find(self._exact, sig)
+
+    def estimate(self, hand):
+        """手牌强度估计: 期望名次(1~4)、胜率、精确条目对局数、控制牌数"""
+        sig = signature(hand)
+        prior_rank, prior_win = 2.5, 0.25
+        base = self._find(self._features, feature_key(sig))
+        if base is not None:
+            prior_rank = base[2] / 2 / base[0]
+            prior_win = base[1] / base[0]
+        exact = self.stats(sig) if len(hand) == 13 else None
+        games = exact[0] if exact else 0
+        if exact:
+            rank = (exact[2] / 2 + PRIOR_GAMES * prior_rank) / (games + PRIOR_GAMES)
+            win = (exact[1] + PRIOR_GAMES * prior_win) / (games + PRIOR_GAMES)
+        else:
+            rank, win = prior_rank, prior_win
+        return {
+            'expected_rank': rank,
+            'win_rate': win,
+            'games': games,
+            'controls': control_cards(sig),
+        }
+
+    def close(self):
+        self._exact = self._features = None
+        self._mmap.close()
+
+
+# False 表示尚未尝试打开
+_default = False
+
+
+def default_book():
+    """按 BOOK_PATH 打开的共享表(每个进程只打开一次); 文件不存在时返回 None"""
+    global _default
+    if _default is False:
+        _default = OpeningBook(BOOK_PATH) if os.path.exists(BOOK_PATH) else None
+    return _default
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='构建开局手牌强度表')
+    parser.add_argument('-n', '--games', type=int, default=100000, help='对局数')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='进程数(默认 CPU 核数, 1 为单进程)')
+    parser.add_argument('--seed', type=int, default=0, help='基础种子')
+    parser.add_argument('-o', '--output', default=BOOK_PATH, help='输出文件')
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    exact, features = build(args.games, args.workers, args.seed)
+    write_book(args.output, exact, features)
+    print(f'{args.games} 局, 起手签名 {len(exact)} 个, 特征 {len(features)} 个, '
+          f'{os.path.getsize(args.output)} 字节, 耗时 {time.perf_counter() - t0:.1f}s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
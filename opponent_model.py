@@ -0,0 +1,156 @@
+"""
+对手手牌概率模型
+  - expected[i][r]: 第 i 个对手(按座次, 从下家起)持有点数 r 的期望张数, 3x13 矩阵
+    行和 = 该对手剩余牌数, 列和 = 该点数未见张数, 并以记牌器推断的持有上限(caps, 来自过牌)为上界;
+    用迭代比例拟合求解, 首次查询时计算, 纯 Python 即可
+  - p_hold / p_beat: 按期望张数做二项近似, 查询"某家至少有 k 张 r""我这手单张 A 会不会被压"只需几微秒
+  - sample(n): 一次抽取 n 组与剩余牌数一致、尽量满足持有上限的发牌, 每组为 3x13 点数计数;
+    装有 NumPy 时整批向量化抽样, 否则逐组抽样
+上限是推断而非确定信息; 上限与牌数矛盾时以牌数为准。
+"""
+
+import random
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖, 只影响 sample() 的速度
+    np = None
+
+from cards import RANK_ORDER
+
+# 迭代比例拟合的最大轮数与收敛阈值(期望张数)
+IPF_ROUNDS = 50
+IPF_TOL = 1e-3
+# 同牌型能压住所需的张数; 炸弹压不同牌型不计入
+BEAT_COUNT = {'single': 1, 'pair': 2, 'triple': 3, 'bomb': 4}
+
+
+class OpponentModel:
+
+    def __init__(self, tracker, hand, player_idx, other_counts):
+        # 构造只保存引用, 首次查询时才整理约束并拟合(多数决策用不到模型)
+        self._source = (tracker, hand, player_idx, other_counts)
+        self._expected = None
+
+    def _prepare(self):
+        tracker, hand, player_idx, other_counts = self._source
+        self.opponents = [(player_idx + d) % 4 for d in (1, 2, 3)]
+        self.counts = [other_counts[p] for p in self.opponents]
+        unseen = list(tracker.rank_left)
+        for c in hand:
+            unseen[RANK_ORDER[c[1]]] -= 1
+        self.unseen = unseen
+        self.caps = [[min(cap, u) for cap, u in zip(tracker.caps[p], unseen)] for p in self.opponents]
+        self._expected = self._fit()
+
+    @property
+    def expected(self):
+        if self._expected is None:
+            self._prepare()
+        return self._expected
+
+    def _fit(self):
+        """行和为牌数、列和为未见张数、不超过上限的期望张数矩阵"""
+        counts, unseen, caps = self.counts, self.unseen, self.caps
+        total = sum(counts) or 1
+        e = [[min(caps[i][r], unseen[r] * counts[i] / total) for r in range(13)] for i in range(3)]
+        for _ in range(IPF_ROUNDS):
+            for i in range(3):
+                row = sum(e[i])
+                if row > 0:
+                    f = counts[i] / row
+                    e[i] = [min(caps[i][r], x * f) for r, x in enumerate(e[i])]
+            err = 0.0
+            for r in range(13):
+                col = e[0][r] + e[1][r] + e[2][r]
+                if col > 0:
+                    f = unseen[r] / col
+                    for i in range(3):
+                        e[i][r] *= f
+                err = max(err, abs(col - unseen[r]))
+            if err < IPF_TOL:
+                break
+        return e
+
+    def p_hold(self, i, rank, k=1):
+        """第 i 个对手至少持有 k 张点数 rank 的概率"""
+        e = self.expected[i][rank]
+        u = self.unseen[rank]
+        if k > u or k > self.caps[i][rank]:
+            return 0.0
+        q = min(1.0, e / u)
+        # 二项分布 P(X >= k) = 1 - sum_{j<k} C(u, j) q^j (1-q)^(u-j)
+        below = 0.0
+        term = (1 - q) ** u
+        for j in range(k):
+            below += term
+            if q >= 1:
+                break
+            term *= (u - j) / (j + 1) * q / (1 - q)
+        return max(0.0, 1 - below)
+
+    def p_beat(self, htype, value, players=(0, 1, 2)):
+        """至少一个对手能用同牌型压住 (htype, value) 的概率; 组合牌型返回 None"""
+        k = BEAT_COUNT.get(htype)
+        if k is None:
+            return None
+        p_none = 1.0
+        for i in players:
+            for r in range(value + 1, 13):
+                p_none *= 1 - self.p_hold(i, r, k)
+        return 1 - p_none
+
+    # ========== 抽样 ==========
+
+    def sample(self, n, seed=None, max_rounds=20):
+        """返回 n 组发牌(每组 3x13 点数计数); 满足上限的样本不足时用不考虑上限的样本补足"""
+        if self._expected is None:
+            self._prepare()
+        if np is None:
+            return self._sample_py(n, random.Random(seed), max_rounds)
+        return self._sample_np(n, np.random.default_rng(seed), max_rounds)
+
+    def _sample_np(self, n, rng, max_rounds):
+        ranks = np.repeat(np.arange(13), self.unseen)
+        seats = np.repeat(np.arange(3), self.counts)[:len(ranks)]
+        caps = np.array(self.caps)
+        cells = 3 * 13
+        kept = []
+        kept_n = 0
+        fill = None
+        for _ in range(max_rounds):
+            # 每行是一副未见牌的随机排列, 按座次切分给三个对手
+            dealt = ranks[rng.random((n, len(ranks))).argsort(axis=1)][:, :len(seats)]
+            flat = (np.arange(n)[:, None] * cells + seats * 13 + dealt).ravel()
+            batch = np.bincount(flat, minlength=n * cells).reshape(n, 3, 13)
+            ok = (batch <= caps).all(axis=(1, 2))
+            kept.append(batch[ok])
+            kept_n += int(ok.sum())
+            if fill is None:
+                fill = batch[~ok]
+            if kept_n >= n:
+                break
+        out = np.concatenate(kept)[:n]
+        if len(out) < n:
+            out = np.concatenate([out, fill[:n - len(out)]])
+        return out
+
+    def _sample_py(self, n, rng, max_rounds):
+        ranks = [r for r in range(13) for _ in range(self.unseen[r])]
+        bounds = [sum(self.counts[:i + 1]) for i in range(3)]
+        kept, fill = [], []
+        for _ in range(n * max_rounds):
+            rng.shuffle(ranks)
+            deal = [[0] * 13 for _ in range(3)]
+            start = 0
+            for i, end in enumerate(bounds):
+                for r in ranks[start:end]:
+                    deal[i][r] += 1
+                start = end
+            if all(deal[i][r] <= self.caps[i][r] for i in range(3) for r in range(13)):
+                kept.append(deal)
+                if len(kept) >= n:
+                    break
+            elif len(fill) < n:
+                fill.append(deal)
+        return (kept + fill)[:n]
@@ -0,0 +1,292 @@
+"""
+AI 决策回归对比
+  - 局面语料来自回放文件(replay.py), 或用当前代码按种子现场生成若干局
+  - 沿着记录的出牌序列逐步推进, 在每一步让旧版与新版 AI 各自对同一局面做一次决策;
+    两侧都只看记录的局面, 不会因为前面的决策不同而走到不同的局面
+  - 旧版是一个 git 提交(git archive 解出到临时目录)或一个源码目录, 新版默认是当前工作区;
+    两侧各用一组 spawn 进程, 子进程只从对应目录导入规则与 AI, 互不干扰
+  - 报告: 决策不同的局面、每条思考分支(log.append 的模板)的命中次数变化、决策耗时对比
+每个局面决策前按 (标签, 步数) 重设 random 种子, 两侧的随机性一致。
+
+用法:
+  python regression.py --old HEAD -n 200
+  python regression.py --old v1.2 --replay replays.bin --games 5000 -w 8 --json diffs.json
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# 与 cards 模块一致的牌编号; 子进程可能加载没有 cards 模块的旧版本, 这里自带一份
+SUITS = ['diamond', 'club', 'heart', 'spade']
+RANKS = ['3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A', '2']
+_SUIT_LETTER = {'diamond': 'D', 'club': 'C', 'heart': 'H', 'spade': 'S'}
+_PLACEHOLDER = re.compile(r'%(?:\\\.\d+)?[sdf]')
+
+# 子进程里的 Game 类(由 _init_worker 从指定目录导入)
+_Game = None
+
+
+def _mask_to_hand(mask):
+    return [(SUITS[i & 3], RANKS[i >> 2]) for i in range(52) if mask >> i & 1]
+
+
+def _hand_to_mask(cards):
+    mask = 0
+    for s, r in cards:
+        mask |= 1 << (RANKS.index(r) * 4 + SUITS.index(s))
+    return mask
+
+
+def _format(mask):
+    return ' '.join(_SUIT_LETTER[s] + r for s, r in _mask_to_hand(mask)) or '不出'
+
+
+# ========== 子进程 ==========
+
+def _init_worker(tree):
+    """只从 tree 导入规则与 AI; 旧版本可能直接 print 思考过程, 丢弃标准输出"""
+    global _Game
+    sys.path.insert(0, tree)
+    sys.stdout = open(os.devnull, 'w')
+    from game_logic import Game
+    _Game = Game
+
+
+def _new_game(hands):
+    try:
+        # 记录完整思考过程, 用于统计分支命中
+        game = _Game(trace=True)
+    except TypeError:
+        game = _Game()
+    cards = [_mask_to_hand(h) for h in hands]
+    if hasattr(game, 'set_hands'):
+        game.set_hands(cards)
+    else:
+        game.players = cards
+        game.current_player = next(p for p in range(4) if ('diamond', '3') in cards[p])
+        game.first_turn = True
+    return game
+
+
+def _apply(game, pid, mask):
+    ok, msg = game.play_cards(pid, _mask_to_hand(mask)) if mask else game.pass_turn(pid)
+    if not ok:
+        raise ValueError(f'illegal recorded action by {pid}: {msg}')
+
+
+def _branches(thinking):
+    """思考过程里命中的分支: 新版取 log.append 的模板; 旧版只有格式化后的字符串, 由主进程按模板归类"""
+    steps = getattr(thinking, 'steps', None)
+    if steps is not None:
+        return tuple(msg for msg, _ in steps), True
+    return tuple(thinking or ()), False
+
+
+def _run_chunk(games):
+    """对一批对局的每一步做一次决策, 返回 [(标签, 步数, 玩家, 出牌掩码, 毫秒, 分支, 分支是否为模板)]"""
+    out = []
+    for tag, hands, actions in games:
+        game = _new_game(hands)
+        for step, (pid, mask) in enumerate(actions):
+            snap = game.snapshot() if hasattr(game, 'snapshot') else None
+            random.seed(tag * 1009 + step)
+            t0 = time.perf_counter()
+            thinking, cards = game.ai_play(pid)
+            ms = (time.perf_counter() - t0) * 1000
+            out.append((tag, step, pid, _hand_to_mask(cards or ()), ms) + _branches(thinking))
+            if snap is not None:
+                game.restore(snap)
+            else:
+                game = _new_game(hands)
+                for p, m in actions[:step]:
+                    _apply(game, p, m)
+            _apply(game, pid, mask)
+    return out
+
+
+# ========== 主进程 ==========
+
+def checkout(ref):
+    """ref 是目录时直接使用, 否则用 git archive 解出该提交, 返回 (目录, 临时目录对象)"""
+    if os.path.isdir(ref):
+        return os.path.abspath(ref), None
+    tmp = tempfile.TemporaryDirectory(prefix='regression-')
+    archive = subprocess.run(['git', '-C', HERE, 'archive', ref], check=True, capture_output=True).stdout
+    subprocess.run(['tar', '-x', '-C', tmp.name], input=archive, check=True)
+    return tmp.name, tmp
+
+
+def load_corpus(replay_path=None, n_games=200, seed=0):
+    """[(标签, 起手四家掩码, [(玩家, 出牌掩码)])]; 没有回放文件时用当前代码按种子生成"""
+    from replay import decode_game, read_replays
+    if replay_path:
+        reps = read_replays(replay_path)
+    else:
+        from simulate import play_game
+        reps = (decode_game(play_game(seed + i, record=True)['replay']) for i in range(n_games))
+    corpus = []
+    for rep in reps:
+        if len(corpus) >= n_games:
+            break
+        corpus.append((rep.tag, rep.hands, list(rep.actions())))
+    return corpus
+
+
+def run_side(tree, corpus, workers, chunk_size):
+    # 子进程初始化失败时进程池只报 BrokenProcessPool, 先单独导入一次给出真正的错误
+    check = subprocess.run([sys.executable, '-c', 'import game_logic'], cwd=tree, capture_output=True, text=True)
+    if check.returncode:
+        raise SystemExit(f'{tree}: 无法导入 game_logic\n{check.stderr.strip()}')
+    chunks = [corpus[i:i + chunk_size] for i in range(0, len(corpus), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                             initializer=_init_worker, initargs=(tree,)) as pool:
+        results = []
+        for part in pool.map(_run_chunk, chunks):
+            results.extend(part)
+        return results
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+class _Templates:
+    """把格式化后的思考行归到已知模板上; 归不上的行原样作为分支"""
+
+    def __init__(self, results):
+        templates = {b for res in results if res[6] for b in res[5]}
+        # 字面部分长的模板优先, 避免只有占位符的模板吞掉所有行
+        self._patterns = [(re.compile(_PLACEHOLDER.sub('.*?', re.escape(t)), re.S), t)
+                          for t in sorted(templates, key=lambda t: -len(_PLACEHOLDER.sub('', t)))]
+        self._cache = {}
+
+    def branches(self, res):
+        if res[6]:
+            return res[5]
+        return tuple(self._match(line) for line in res[5])
+
+    def _match(self, line):
+        hit = self._cache.get(line)
+        if hit is None:
+            hit = next((t for p, t in self._patterns if p.fullmatch(line)), line)
+            self._cache[line] = hit
+        return hit
+
+
+def compare(corpus, old, new):
+    """汇总两侧结果: 决策差异、分支命中次数、耗时"""
+    hands = {}
+    for tag, deal, actions in corpus:
+        cur = list(deal)
+        for step, (pid, mask) in enumerate(actions):
+            hands[tag, step] = cur[pid]
+            cur[pid] &= ~mask
+    templates = _Templates(old + new)
+    diffs = []
+    hits = {}
+    for o, n in zip(old, new):
+        tag, step, pid = o[:3]
+        if o[3] != n[3]:
+            diffs.append({
+                'tag': tag, 'step': step, 'player': pid,
+                'hand': _format(hands[tag, step]),
+                'old': _format(o[3]), 'new': _format(n[3]),
+                'old_ms': round(o[4], 3), 'new_ms': round(n[4], 3),
+                'new_branches': list(dict.fromkeys(templates.branches(n))),
+            })
+        for side, res in ((0, o), (1, n)):
+            for branch in set(templates.branches(res)):
+                counts = hits.setdefault(branch, [0, 0])
+                counts[side] += 1
+    old_ms = [r[4] for r in old]
+    new_ms = [r[4] for r in new]
+    timing = {}
+    for name, ms in (('old', old_ms), ('new', new_ms)):
+        timing[name] = {
+            'total_s': round(sum(ms) / 1000, 2),
+            'mean_ms': round(sum(ms) / len(ms), 3) if ms else 0,
+            'p50_ms': round(_percentile(ms, 0.5), 3),
+            'p99_ms': round(_percentile(ms, 0.99), 3),
+        }
+    slowest = sorted(zip(new, old), key=lambda p: p[1][4] - p[0][4])[:5]
+    timing['slowest'] = [{'tag': n[0], 'step': n[1], 'old_ms': round(o[4], 3), 'new_ms': round(n[4], 3)}
+                         for n, o in slowest]
+    return {'positions': len(old), 'changed': len(diffs), 'diffs': diffs, 'branches': hits, 'timing': timing}
+
+
+def print_report(report, limit, out=sys.stdout):
+    n = report['positions']
+    print(f"局面 {n}, 决策不同 {report['changed']} ({report['changed'] / n:.2%})" if n else '没有局面', file=out)
+    for d in report['diffs'][:limit]:
+        print(f"  [{d['tag']}#{d['step']} P{d['player']}] 手牌 {d['hand']}: {d['old']} -> {d['new']}"
+              f"  ({'; '.join(d['new_branches'][-2:])})", file=out)
+    if report['changed'] > limit:
+        print(f"  ... 另有 {report['changed'] - limit} 处", file=out)
+
+    changed = sorted(((b, c) for b, c in report['branches'].items() if c[0] != c[1]),
+                     key=lambda x: -abs(x[1][1] - x[1][0]))
+    print('分支命中变化(旧 -> 新):', file=out)
+    for branch, (o, nw) in changed[:limit]:
+        print(f'  {o:>7} -> {nw:<7} {nw - o:+}  {branch}', file=out)
+    if not changed:
+        print('  无', file=out)
+
+    t = report['timing']
+    print('决策耗时:', file=out)
+    for name in ('old', 'new'):
+        s = t[name]
+        print(f"  {name}: 合计 {s['total_s']}s, 平均 {s['mean_ms']}ms, p50 {s['p50_ms']}ms, p99 {s['p99_ms']}ms", file=out)
+    for s in t['slowest']:
+        print(f"  变慢最多 [{s['tag']}#{s['step']}] {s['old_ms']}ms -> {s['new_ms']}ms", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='对比新旧 AI 在同一批局面上的决策')
+    parser.add_argument('--old', default='HEAD', help='旧版: git 提交或源码目录(默认 HEAD)')
+    parser.add_argument('--new', default=HERE, help='新版: 源码目录(默认当前工作区)')
+    parser.add_argument('--replay', default=None, help='局面语料的回放文件(默认按种子现场生成)')
+    parser.add_argument('-n', '--games', type=int, default=200, help='使用的对局数')
+    parser.add_argument('--seed', type=int, default=0, help='现场生成语料时的基础种子')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='每侧进程数(默认 CPU 核数)')
+    parser.add_argument('--chunk-size', type=int, default=20, help='每个任务包含的对局数')
+    parser.add_argument('--limit', type=int, default=20, help='报告中列出的差异条数')
+    parser.add_argument('--json', default=None, help='完整报告写入该 JSON 文件')
+    args = parser.parse_args(argv)
+
+    # 两侧读同一份开局表(旧版解出的目录里没有构建产物)
+    from opening_book import BOOK_PATH
+    os.environ.setdefault('OPENING_BOOK', BOOK_PATH)
+
+    t0 = time.perf_counter()
+    corpus = load_corpus(args.replay, args.games, args.seed)
+    old_tree, tmp = checkout(args.old)
+    try:
+        workers = args.workers or os.cpu_count() or 1
+        old = run_side(old_tree, corpus, workers, args.chunk_size)
+        new = run_side(os.path.abspath(args.new), corpus, workers, args.chunk_size)
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+    report = compare(corpus, old, new)
+    print_report(report, args.limit)
+    print(f'{len(corpus)} 局, 耗时 {time.perf_counter() - t0:.1f}s', file=sys.stderr)
+    if args.json:
+        report['branches'] = [{'branch': b, 'old': c[0], 'new': c[1]} for b, c in report['branches'].items()]
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+紧凑的二进制对局回放
+  - 文件 = 8 字节文件头 + 逐局追加的记录; 每条记录 = 定长记录头(长度、赢家、发牌格式、标签) + 发牌 + 动作
+  - 发牌: 52 张牌全部发出时每张牌 2 位记归属, 共 13 字节; 否则记四家 52 位掩码(各 7 字节)
+  - 动作: 每步 1 字节头(玩家 << 4 | 张数, 过牌张数为 0) + 每张牌 1 字节编号(cards 的 0~51 编码)
+    一局通常约 100 字节
+  - ReplayWriter 只追加, 每条记录一次 os.write(O_APPEND), 多线程/多进程写同一文件时记录不会交错
+  - read_replays 是生成器, 按记录流式读取, 百万局也只占一条记录的内存; 文件尾部不完整的记录
+    (写入中途崩溃)直接忽略
+
+用法:
+  python replay.py replays.bin            # 汇总统计
+  python replay.py replays.bin --check    # 逐局用 Game 重放并校验赢家
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+import time
+
+from cards import FULL_MASK, mask_to_hand, mask_to_indices
+from game_logic import Game
+from game_state import unpack_action
+
+_MAGIC = b'PKRP'
+_FORMAT_VERSION = 1
+# 魔数, 版本, 保留
+_FILE_HEADER = struct.Struct('<4sHH')
+# 记录长度(不含记录头), 赢家(-1 为未结束), 发牌格式, 标签(模拟种子 / 对局号)
+_RECORD = struct.Struct('<HbBQ')
+
+# 标签按 64 位无符号存储; 负的模拟种子取补码, 与 dealer.deal_from_seed 对种子的处理一致, 发出的仍是同一副牌
+_TAG_MASK = (1 << 64) - 1
+
+DEAL_OWNERS = 0
+DEAL_MASKS = 1
+_MASK_BYTES = 7
+_NONE = -1
+
+
+def _encode_deal(hands):
+    if hands[0] | hands[1] | hands[2] | hands[3] == FULL_MASK and sum(bin(h).count('1') for h in hands) == 52:
+        owners = bytearray(13)
+        for pid, mask in enumerate(hands):
+            for idx in mask_to_indices(mask):
+                owners[idx >> 2] |= pid << 2 * (idx & 3)
+        return DEAL_OWNERS, bytes(owners)
+    return DEAL_MASKS, b''.join(h.to_bytes(_MASK_BYTES, 'little') for h in hands)
+
+
+def _decode_deal(fmt, data):
+    """返回 (四家掩码, 发牌占用的字节数)"""
+    if fmt == DEAL_OWNERS:
+        hands = [0, 0, 0, 0]
+        for idx in range(52):
+            hands[data[idx >> 2] >> 2 * (idx & 3) & 3] |= 1 << idx
+        return hands, 13
+    if fmt == DEAL_MASKS:
+        return [int.from_bytes(data[i:i + _MASK_BYTES], 'little') for i in range(0, 4 * _MASK_BYTES, _MASK_BYTES)], 4 * _MASK_BYTES
+    raise ValueError(f'unknown deal format {fmt}')
+
+
+def encode_game(game, tag=0):
+    """把一局(可以未结束)编码成一条回放记录; 起手牌由当前手牌加上历史中各家打出的牌还原
+    tag 为负数时存为其 64 位补码"""
+    st = game.state
+    hands = list(st.hands)
+    actions = bytearray()
+    for entry in st.history:
+        pid, mask = unpack_action(entry)
+        hands[pid] |= mask
+        cards = mask_to_indices(mask)
+        actions.append(pid << 4 | len(cards))
+        actions.extend(cards)
+    fmt, deal = _encode_deal(hands)
+    winner = _NONE if st.winner is None else st.winner
+    return _RECORD.pack(len(deal) + len(actions), winner, fmt, tag & _TAG_MASK) + deal + actions
+
+
+class Replay:
+    """一条回放记录; 动作保持编码形式, 需要时再解码"""
+    __slots__ = ('hands', 'winner', 'tag', '_actions')
+
+    def __init__(self, hands, winner, tag, actions):
+        self.hands = hands
+        self.winner = winner
+        self.tag = tag
+        self._actions = actions
+
+    def actions(self):
+        """逐步产出 (玩家, 出牌掩码), 过牌的掩码为 0"""
+        data = self._actions
+        i, end = 0, len(data)
+        while i < end:
+            head = data[i]
+            n = head & 0xF
+            mask = 0
+            for idx in data[i + 1:i + 1 + n]:
+                mask |= 1 << idx
+            yield head >> 4, mask
+            i += 1 + n
+
+    def __len__(self):
+        return sum(1 for _ in self.actions())
+
+    def to_game(self, **kwargs):
+        """按规则重放出一个 Game(会校验每一步), 供分析或生成训练样本; kwargs 传给 Game"""
+        game = Game(**kwargs)
+        game.set_hands([mask_to_hand(h) for h in self.hands])
+        for pid, mask in self.actions():
+            ok, msg = game.play_cards(pid, mask_to_hand(mask)) if mask else game.pass_turn(pid)
+            if not ok:
+                raise ValueError(f'replay {self.tag}: illegal action by {pid}: {msg}')
+        return game
+
+
+def decode_record(head, payload):
+    _, winner, fmt, tag = _RECORD.unpack(head)
+    hands, used = _decode_deal(fmt, payload)
+    return Replay(hands, None if winner == _NONE else winner, tag, payload[used:])
+
+
+def decode_game(record):
+    """解码一条 encode_game 的结果"""
+    return decode_record(record[:_RECORD.size], record[_RECORD.size:])
+
+
+def read_replays(path, buffer_size=1 << 20):
+    """逐条产出文件中的 Replay"""
+    with open(path, 'rb', buffering=buffer_size) as f:
+        magic, version, _ = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError(f'unsupported replay file {path}')
+        while True:
+            head = f.read(_RECORD.size)
+            if len(head) < _RECORD.size:
+                return
+            length = _RECORD.unpack_from(head)[0]
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            yield decode_record(head, payload)
+
+
+class ReplayWriter:
+    """追加写回放文件; write 线程安全, 每条记录一次系统调用"""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            # 只有创建文件的一方写文件头
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            pass
+        else:
+            os.write(fd, _FILE_HEADER.pack(_MAGIC, _FORMAT_VERSION, 0))
+            os.close(fd)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def write(self, game, tag=0):
+        self.write_record(encode_game(game, tag))
+
+    def write_record(self, record):
+        """写入 encode_game 的结果(例如在工作进程里编码好的记录)"""
+        with self._lock:
+            if self._fd is None:
+                raise ValueError('replay writer is closed')
+            os.write(self._fd, record)
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='回放文件统计')
+    parser.add_argument('path', help='回放文件')
+    parser.add_argument('--check', action='store_true', help='逐局用 Game 重放并校验赢家')
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    wins = [0, 0, 0, 0]
+    count = unfinished = actions = 0
+    for rep in read_replays(args.path):
+        count += 1
+        actions += len(rep)
+        if rep.winner is None:
+            unfinished += 1
+        else:
+            wins[rep.winner] += 1
+        if args.check and rep.to_game().winner != rep.winner:
+            raise ValueError(f'replay {rep.tag}: winner mismatch')
+    elapsed = time.perf_counter() - t0
+    size = os.path.getsize(args.path)
+    print(json.dumps({
+        'games': count,
+        'wins_by_seat': wins,
+        'unfinished': unfinished,
+        'avg_actions': round(actions / count, 2) if count else 0,
+        'bytes_per_game': round(size / count, 1) if count else 0,
+        'seconds': round(elapsed, 2),
+        'games_per_sec': round(count / elapsed, 1) if elapsed else 0,
+    }, ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
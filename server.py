@@ -0,0 +1,244 @@
+"""
+生产环境入口
+  - 每个工作进程是一个 gunicorn(gthread 工作方式, 每个连接一个线程, SSE 长连接各占一个)服务,
+    第 i 个监听 port + i; 主进程按 --workers 启动若干个并看护(异常退出的自动重启),
+    只有一个工作进程时不启动主进程, 直接运行 gunicorn
+  - 工作进程的编号(WORKER_ID)由 post_fork 钩子交给 app.create_app: 对局号以进程编号开头, 前端代理按查询串里的
+    game_id 把同一局的请求(出牌、SSE 推送)都送到创建它的进程, 没有 game_id 的请求(新对局、页面)轮流分给各进程;
+    python server.py -w 4 --nginx 打印对应的 nginx 配置
+  - AI 决策由 AI_WORKERS(--threads)个线程执行, 与连接数无关
+  - 优雅停机(SIGTERM): 停止监听, 拒绝新的对局与玩家动作(503), 等进行中的 AI 回合走完, 断开牌桌订阅(客户端自动重连),
+    等进行中的请求返回, 对局落盘后退出; SIGHUP 让主进程逐个重启工作进程
+  - 座位令牌的密钥来自 SECRET_KEY 或 SECRET_KEY_FILE, 各进程与重启前后一致; 对局存储使用 SQLite 时重启不丢局
+本文件同时是 gunicorn 配置文件(钩子), 也可以直接用 gunicorn 启动, 每个端口一个 gunicorn、每个 gunicorn 一个工作进程:
+  WORKER_ID=0 gunicorn -c server.py -k gthread --threads 100 -b 127.0.0.1:5001 app:app
+
+用法:
+  python server.py -w 4 --threads 4 --port 5001
+  python server.py -w 4 --port 5001 --nginx --listen 80 > poker.conf
+"""
+
+import argparse
+import math
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# 工作进程启动后不到这么多秒就退出时, 等一会儿再重启, 避免配置错误时反复拉起
+MIN_UPTIME = 5.0
+RESTART_DELAY = 1.0
+
+
+# ========== gunicorn 钩子 ==========
+
+def pre_fork(server, worker):
+    """(gunicorn 主进程)给新工作进程分配槽位: 存活的工作进程没有用到的最小编号, 重启的进程沿用原来的编号"""
+    used = {getattr(w, 'slot', None) for w in server.WORKERS.values()}
+    worker.slot = next(i for i in range(len(used) + 1) if i not in used)
+
+
+def post_fork(server, worker):
+    """(工作进程)WORKER_ID 加上槽位作为本进程的编号, 创建进程级资源"""
+    import app as poker
+    worker_id = int(os.environ.get('WORKER_ID', 0)) + getattr(worker, 'slot', 0)
+    os.environ['WORKER_ID'] = str(worker_id)
+    poker.create_app(worker_id)
+
+
+def post_worker_init(worker):
+    """(工作进程)SIGTERM 时 gunicorn 停止监听并等进行中的连接; 同时在后台排空 AI 回合、断开牌桌订阅,
+    SSE 长连接才会结束"""
+    import app as poker
+    stop = worker.handle_exit
+
+    def on_term(sig, frame):
+        stop(sig, frame)
+        if getattr(worker, 'drainer', None) is None:
+            worker.drainer = threading.Thread(target=poker.drain, args=(worker.cfg.graceful_timeout,),
+                                              name='poker-drain', daemon=True)
+            worker.drainer.start()
+
+    signal.signal(signal.SIGTERM, on_term)
+
+
+def worker_exit(server, worker):
+    """(工作进程)连接都已结束或超时: 停止 AI 线程, 对局落盘"""
+    import app as poker
+    if poker.runner is None:
+        return
+    drainer = getattr(worker, 'drainer', None)
+    if drainer is not None:
+        drainer.join(worker.cfg.graceful_timeout)
+    poker.close()
+    server.log.info('worker %s stopped', poker.WORKER_ID)
+
+
+def serve(host, port, worker_id, grace, connections, access_log=False):
+    """在当前进程运行一个 gunicorn 主进程(一个 gthread 工作进程), 收到 SIGTERM 后优雅停机"""
+    from gunicorn.app.base import BaseApplication
+
+    class PokerServer(BaseApplication):
+
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                # 较旧的 gunicorn 没有的设置(如控制套接字)跳过
+                if key in self.cfg.settings:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            import app as poker
+            return poker.app
+
+    os.environ['WORKER_ID'] = str(worker_id)
+    PokerServer({
+        'bind': f'{host}:{port}',
+        'workers': 1,
+        'worker_class': 'gthread',
+        'threads': connections,
+        'graceful_timeout': math.ceil(grace),
+        'accesslog': '-' if access_log else None,
+        'proc_name': f'poker-{worker_id}',
+        'pre_fork': pre_fork,
+        'post_fork': post_fork,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+        # 各端口的 gunicorn 由主进程管理; 默认的控制套接字路径各进程相同, 会互相覆盖
+        'control_socket_disable': True,
+    }).run()
+
+
+class Supervisor:
+    """启动并看护工作进程; 第 i 个工作进程监听 port + i"""
+
+    def __init__(self, args):
+        self.args = args
+        self.procs = {}
+        self.started = {}
+        self.stopping = False
+        self.reload = False
+
+    def spawn(self, i):
+        a = self.args
+        cmd = [sys.executable, os.path.abspath(__file__), '--worker-id', str(i), '--host', a.host,
+               '--port', str(a.port + i), '--grace', str(a.grace), '--connections', str(a.connections)]
+        if a.access_log:
+            cmd.append('--access-log')
+        env = dict(os.environ, WORKER_ID=str(i))
+        if a.threads:
+            env['AI_WORKERS'] = str(a.threads)
+        self.procs[i] = subprocess.Popen(cmd, env=env)
+        self.started[i] = time.monotonic()
+
+    def stop(self, i):
+        proc = self.procs[i]
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(self.args.grace + 10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self._on_reload)
+        for i in range(self.args.workers):
+            self.spawn(i)
+        while not self.stopping:
+            time.sleep(0.2)
+            if self.reload:
+                self.reload = False
+                # 逐个重启: 其余进程照常服务, 重启中的进程上的对局稍后由新进程从存储中加载
+                for i in sorted(self.procs):
+                    if self.stopping:
+                        break
+                    self.stop(i)
+                    self.spawn(i)
+                continue
+            for i, proc in list(self.procs.items()):
+                code = proc.poll()
+                if code is None:
+                    continue
+                print(f'worker {i} exited with {code}, restarting', file=sys.stderr)
+                if time.monotonic() - self.started[i] < MIN_UPTIME:
+                    time.sleep(RESTART_DELAY)
+                self.spawn(i)
+        # 各进程并行停机
+        for proc in self.procs.values():
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + self.args.grace + 10
+        for proc in self.procs.values():
+            try:
+                proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+    def _on_stop(self, *_):
+        self.stopping = True
+
+    def _on_reload(self, *_):
+        self.reload = True
+
+
+def nginx_config(host, port, workers, listen):
+    """按对局号开头的进程编号路由的 nginx 配置"""
+    addr = '127.0.0.1' if host in ('0.0.0.0', '::', '') else host
+    servers = [f'{addr}:{port + i}' for i in range(workers)]
+    lines = ['upstream poker_any {']
+    lines += [f'    server {s};' for s in servers]
+    lines += ['}', '', 'map $arg_game_id $poker_upstream {', '    default poker_any;']
+    lines += [f'    ~^{i:02x} {s};' for i, s in enumerate(servers)]
+    lines += ['}', '', 'server {', f'    listen {listen};', '    location / {',
+              '        proxy_pass http://$poker_upstream;',
+              '        proxy_http_version 1.1;',
+              '        proxy_set_header Connection "";',
+              '        proxy_set_header Host $host;',
+              '        # SSE 推送不缓冲, 长连接不超时',
+              '        proxy_buffering off;',
+              '        proxy_read_timeout 1h;',
+              '    }', '}']
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='扑克游戏服务(多进程、按对局路由、优雅停机)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='工作进程数(默认 CPU 核数)')
+    parser.add_argument('--threads', type=int, default=None, help='每个进程的 AI 决策线程数(默认取 AI_WORKERS)')
+    parser.add_argument('--connections', type=int, default=100, help='每个进程同时服务的连接数(含 SSE 长连接)')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=5000, help='第一个工作进程的端口, 第 i 个为 port + i')
+    parser.add_argument('--grace', type=float, default=30.0, help='停机时等待 AI 回合与请求结束的秒数')
+    parser.add_argument('--access-log', action='store_true', help='输出每个请求的访问日志')
+    parser.add_argument('--nginx', action='store_true', help='只打印按对局路由的 nginx 配置')
+    parser.add_argument('--listen', default='80', help='--nginx 配置中的对外监听端口')
+    parser.add_argument('--worker-id', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if not 1 <= args.workers <= 256:
+        parser.error('--workers must be between 1 and 256')
+
+    if args.nginx:
+        print(nginx_config(args.host, args.port, args.workers, args.listen))
+        return
+    if args.worker_id is not None:
+        serve(args.host, args.port, args.worker_id, args.grace, args.connections, args.access_log)
+        return
+    if args.workers == 1:
+        if args.threads:
+            os.environ['AI_WORKERS'] = str(args.threads)
+        serve(args.host, args.port, 0, args.grace, args.connections, args.access_log)
+        return
+    Supervisor(args).run()
+
+
+if __name__ == '__main__':
+    main()
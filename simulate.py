@@ -0,0 +1,141 @@
+"""
+无界面批量自我对局
+  - 不经过 Flask 路由、不打印思考过程, 直接驱动 Game + AIPlayer
+  - 对局按批分发到 ProcessPoolExecutor, 每局种子 = 基础种子 + 局号, 与进程数无关可复现;
+    每批用 dealer.deal_batch 一次发完, 第 k 局的牌即 deal_from_seed(种子)
+  - 每局结果(赢家、回合数、各牌型出牌次数、耗时)以 JSONL 逐行写出
+  - --replay 时每局在工作进程里编码成回放记录(replay.py), 由主进程追加写入, 标签为种子
+
+用法:
+  python simulate.py -n 100000 -w 8 --seed 1 -o results.jsonl --replay replays.bin
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from cards import classify_mask
+from dealer import deal_batch, deal_from_seed
+from game_logic import Game
+from game_state import CARD_MASK
+from replay import ReplayWriter, encode_game
+
+# 防止 AI 出现非法出牌导致死循环
+MAX_TURNS = 1000
+
+
+def play_game(seed, record=False, deck=None):
+    """用给定种子完整模拟一局, 返回结果字典; record 时附带回放记录(replay 字段, bytes);
+    deck 为已按该种子发好的牌(缺省现场 deal_from_seed)"""
+    t0 = time.perf_counter()
+    game = Game()
+    game.set_deck(deal_from_seed(seed) if deck is None else deck)
+    starter = game.current_player
+
+    turns = 0
+    while game.winner is None and turns < MAX_TURNS:
+        game.ai_play(game.current_player)
+        turns += 1
+
+    hand_types = {}
+    for entry in game.state.history:
+        if entry & CARD_MASK:
+            htype, _ = classify_mask(entry & CARD_MASK)
+            hand_types[htype] = hand_types.get(htype, 0) + 1
+
+    rec = {
+        'seed': seed,
+        'winner': game.winner,
+        'starter': starter,
+        'turns': turns,
+        'hand_types': hand_types,
+        'cards_left': game.hand_sizes(),
+        'duration_ms': round((time.perf_counter() - t0) * 1000, 3),
+    }
+    if record:
+        rec['replay'] = encode_game(game, seed)
+    return rec
+
+
+def _run_batch(seeds, record=False):
+    decks = deal_batch(seeds)
+    return [play_game(s, record, deck) for s, deck in zip(seeds, decks)]
+
+
+def _batches(n_games, seed, batch_size):
+    for start in range(0, n_games, batch_size):
+        yield [seed + i for i in range(start, min(start + batch_size, n_games))]
+
+
+def run(n_games, workers=None, seed=0, batch_size=200, record=False):
+    """逐局产出结果(按完成顺序); workers=1 时在当前进程内运行"""
+    batches = _batches(n_games, seed, batch_size)
+    if workers == 1:
+        for seeds in batches:
+            yield from _run_batch(seeds, record)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    # 在途批次数有上限, 百万局也不会一次性把任务全部堆进内存
+    max_pending = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for seeds in batches:
+            pending.add(pool.submit(_run_batch, seeds, record))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield from fut.result()
+        for fut in pending:
+            yield from fut.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批量 AI 自我对局')
+    parser.add_argument('-n', '--games', type=int, default=1000, help='对局数')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='进程数(默认 CPU 核数, 1 为单进程)')
+    parser.add_argument('--seed', type=int, default=0, help='基础种子')
+    parser.add_argument('--batch-size', type=int, default=200, help='每个任务包含的对局数')
+    parser.add_argument('-o', '--output', default=None, help='JSONL 输出文件(默认标准输出)')
+    parser.add_argument('--replay', default=None, help='同时把每局追加写入该回放文件')
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    replays = ReplayWriter(args.replay) if args.replay else None
+    t0 = time.perf_counter()
+    wins = [0, 0, 0, 0]
+    count = unfinished = turns = 0
+    try:
+        for rec in run(args.games, args.workers, args.seed, args.batch_size, replays is not None):
+            if replays is not None:
+                replays.write_record(rec.pop('replay'))
+            out.write(json.dumps(rec, ensure_ascii=False) + '\n')
+            count += 1
+            turns += rec['turns']
+            if rec['winner'] is None:
+                unfinished += 1
+            else:
+                wins[rec['winner']] += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if replays is not None:
+            replays.close()
+
+    elapsed = time.perf_counter() - t0
+    summary = {
+        'games': count,
+        'wins_by_seat': wins,
+        'unfinished': unfinished,
+        'avg_turns': round(turns / count, 2) if count else 0,
+        'seconds': round(elapsed, 2),
+        'games_per_sec': round(count / elapsed, 1) if elapsed else 0,
+    }
+    print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
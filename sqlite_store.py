@@ -0,0 +1,259 @@
+"""
+SQLite 对局存储(WAL 模式)
+  - 前端是进程内 GameStore 热缓存, 命中时不访问数据库
+  - 写入走后台线程批量落盘(write-behind): put() 只登记脏对局, 请求路径不等待提交
+  - 每局一行: 紧凑状态(GameState.to_bytes)、AI 类型、追踪开关、真人座位(位掩码)、版本号、更新时间
+  - 多个工作进程共用一个数据库文件; server.py 按对局号把同一局的请求都送到创建它的进程, 缓存命中即可直接使用。
+    没有按对局路由时开启 validate_cache: 取缓存时比对版本号, 其他进程写过的对局会重新加载
+    (同一对局的连续请求之间最多有 flush_interval 的落盘延迟)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from ai_player import AIPlayer
+from card_tracker import CardTracker
+from decision_log import log_event
+from game_logic import Game
+from game_state import GameState, PackedHistory
+from game_store import GameStore
+from mc_player import MonteCarloAIPlayer
+
+# 落盘失败后重试的最长间隔(秒)
+MAX_BACKOFF = 5.0
+
+AI_TYPES = {cls.__name__: cls for cls in (AIPlayer, MonteCarloAIPlayer)}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id    TEXT PRIMARY KEY,
+    version    INTEGER NOT NULL,
+    ai         TEXT NOT NULL,
+    state      BLOB NOT NULL,
+    finished   INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    trace      INTEGER NOT NULL DEFAULT 0,
+    humans     INTEGER NOT NULL DEFAULT 1
+)
+"""
+# 旧库缺少的列与补列语句
+_MIGRATIONS = {
+    'trace': 'ALTER TABLE games ADD COLUMN trace INTEGER NOT NULL DEFAULT 0',
+    'humans': 'ALTER TABLE games ADD COLUMN humans INTEGER NOT NULL DEFAULT 1',
+}
+
+
+def dump_game(game):
+    humans = sum(1 << p for p in game.humans)
+    return game.state.to_bytes(), type(game.ai).__name__, game.trace, humans
+
+
+def load_game(blob, ai_name, trace=False, humans=1):
+    seats = [p for p in range(4) if humans >> p & 1]
+    game = Game(ai=AI_TYPES.get(ai_name, AIPlayer)(), trace=bool(trace), humans=seats)
+    game.state = GameState.from_bytes(blob)
+    # 记牌器可由历史完全重建, 不单独存储
+    game.tracker = CardTracker.from_history(PackedHistory(game.state.history))
+    return game
+
+
+class SQLiteGameStore:
+
+    def __init__(self, path='games.db', max_cached=10000, ttl=3600, finished_ttl=300,
+                 flush_interval=0.05, max_batch=500, sweep_interval=30, validate_cache=False):
+        self.path = path
+        self.ttl = ttl
+        self.finished_ttl = finished_ttl
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.sweep_interval = sweep_interval
+        self.validate_cache = validate_cache
+        self.cache = GameStore(max_games=max_cached, ttl=ttl, finished_ttl=finished_ttl)
+        self._versions = {}  # game_id -> 本进程已知的最新版本
+        self._dirty = {}     # game_id -> game, 等待落盘
+        self._flushing = {}  # 正在写入的批次, 提交前仍可读到
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._local = threading.local()
+        self._writer = None
+        self._sweeper = None
+        self.flushed = 0
+        self.batches = 0
+        self.loads = 0
+        self.errors = 0
+        with self._conn() as conn:
+            conn.execute(_SCHEMA)
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(games)')}
+            for column, ddl in _MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(ddl)
+
+    def _conn(self):
+        """每个线程一条连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # ========== 读写接口(与 GameStore 一致) ==========
+
+    def get(self, game_id):
+        with self._lock:
+            game = self._dirty.get(game_id) or self._flushing.get(game_id)
+            known = self._versions.get(game_id)
+        if game is not None:
+            return game
+        game = self.cache.get(game_id)
+        if game is not None and not self.validate_cache:
+            return game
+        conn = self._conn()
+        if game is not None:
+            # 缓存命中时只比对版本号, 不读状态
+            row = conn.execute('SELECT version FROM games WHERE game_id = ?', (game_id,)).fetchone()
+            if row is not None and row[0] == known:
+                return game
+        row = conn.execute(
+            'SELECT version, ai, state, trace, humans FROM games WHERE game_id = ?', (game_id,)).fetchone()
+        if row is None:
+            self.cache.delete(game_id)
+            return None
+        version, ai_name, blob, trace, humans = row
+        game = load_game(blob, ai_name, trace, humans)
+        self.loads += 1
+        with self._lock:
+            self._versions[game_id] = version
+        self.cache.put(game_id, game)
+        return game
+
+    def put(self, game_id, game):
+        """登记为脏对局, 由后台线程批量写入"""
+        self.cache.put(game_id, game)
+        with self._lock:
+            self._dirty[game_id] = game
+            pending = len(self._dirty)
+        if pending >= self.max_batch:
+            self._wake.set()
+
+    def delete(self, game_id):
+        self.cache.delete(game_id)
+        with self._lock:
+            self._dirty.pop(game_id, None)
+            self._versions.pop(game_id, None)
+        with self._conn() as conn:
+            conn.execute('DELETE FROM games WHERE game_id = ?', (game_id,))
+
+    def __contains__(self, game_id):
+        return self.get(game_id) is not None
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM games').fetchone()[0] + len(self._dirty)
+
+    # ========== 后台落盘 ==========
+
+    def flush(self):
+        """把当前脏对局在一个事务里写入, 返回写入数量"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._flushing = dirty
+        if not dirty:
+            return 0
+        now = time.time()
+        versions = {}
+        try:
+            with self._conn() as conn:
+                for game_id, game in dirty.items():
+                    blob, ai_name, trace, humans = dump_game(game)
+                    versions[game_id] = conn.execute(
+                        'INSERT INTO games (game_id, version, ai, state, finished, updated_at, trace, humans) '
+                        'VALUES (?, 1, ?, ?, ?, ?, ?, ?) '
+                        'ON CONFLICT(game_id) DO UPDATE SET version = version + 1, ai = excluded.ai, '
+                        'state = excluded.state, finished = excluded.finished, updated_at = excluded.updated_at, '
+                        'trace = excluded.trace, humans = excluded.humans '
+                        'RETURNING version',
+                        (game_id, ai_name, blob, game.winner is not None, now, trace, humans)).fetchone()[0]
+        except Exception:
+            # 事务已回滚: 这批对局放回脏对局等下次重试, 期间又改过的以新的为准
+            with self._lock:
+                for game_id, game in dirty.items():
+                    self._dirty.setdefault(game_id, game)
+            raise
+        finally:
+            with self._lock:
+                self._versions.update(versions)
+                self._flushing = {}
+        self.flushed += len(dirty)
+        self.batches += 1
+        return len(dirty)
+
+    def _write_loop(self):
+        backoff = 0.0
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                backoff = 0.0
+            except sqlite3.Error as exc:
+                # 数据库暂时不可写(如其他进程持有写锁): 记录后退避重试, 写入线程不能退出
+                self.errors += 1
+                backoff = min(MAX_BACKOFF, max(self.flush_interval, backoff * 2))
+                log_event('store_flush_failed', error=str(exc), pending=len(self._dirty), retry_in=backoff)
+                self._stop.wait(backoff)
+        self.flush()
+
+    def sweep(self):
+        """删除过期对局(数据库与缓存), 并丢弃已不在缓存中的对局的版本号"""
+        now = time.time()
+        with self._conn() as conn:
+            cur = conn.execute(
+                'DELETE FROM games WHERE (finished = 0 AND updated_at < ?) OR (finished = 1 AND updated_at < ?)',
+                (now - self.ttl, now - self.finished_ttl))
+        self.cache.sweep()
+        # 版本号只用于校验缓存命中, 被淘汰或过期的对局下次读取时会从数据库重新取得
+        cached = self.cache.ids()
+        with self._lock:
+            for game_id in [gid for gid in self._versions if gid not in cached]:
+                del self._versions[game_id]
+        return cur.rowcount
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            self.sweep()
+
+    def start_sweeper(self):
+        """启动后台写入线程与过期清理线程"""
+        if self._writer is not None:
+            return
+        self._writer = threading.Thread(target=self._write_loop, name='sqlite-store-writer', daemon=True)
+        self._writer.start()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name='sqlite-store-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop(self):
+        """停止后台线程并把剩余脏对局写完"""
+        self._stop.set()
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+
+    def stats(self):
+        stats = self.cache.stats()
+        conn = self._conn()
+        stats.update({
+            'backend': 'sqlite',
+            'db_path': os.path.abspath(self.path),
+            'stored_games': conn.execute('SELECT COUNT(*) FROM games').fetchone()[0],
+            'pending_writes': len(self._dirty),
+            'flushed_writes': self.flushed,
+            'flush_batches': self.batches,
+            'flush_errors': self.errors,
+            'db_loads': self.loads,
+        })
+        return stats
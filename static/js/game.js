@@ -1,4 +1,8 @@
-let gid=null,myHand=[],sel=new Set(),curP=-1,free=false,busy=false;
+let gid=null,myHand=[],sel=new Set(),curP=-1,free=false,firstTurn=false,busy=false;
+/* me: 自己的座位; 多人牌桌有 token, 座位按相对位置显示(自己总在下方) */
+let me=0,token=null,humans=[0],tableES=null;
+/* ver: 已见到的状态版本(动作数), 单人牌桌按增量协议只取 ver 之后的动作 */
+let ver=0,counts=[13,13,13,13];
 
 const N=['你','电脑B','电脑C','电脑D'];
 const SC={diamond:'var(--s-dia)',club:'var(--s-clb)',heart:'var(--s-hrt)',spade:'var(--s-spd)'};
@@ -8,6 +12,12 @@ const SS={
     heart:'<svg viewBox="0 0 40 40"><path d="M20 34C11 27 3 19 3 13A8.5 8.5 0 0 1 20 10 8.5 8.5 0 0 1 37 13C37 19 29 27 20 34Z" fill="var(--s-hrt)"/></svg>',
     spade:'<svg viewBox="0 0 40 40"><path d="M20 4C11 13 3 17 3 23A8.5 8.5 0 0 0 17 26L15 36H25L23 26A8.5 8.5 0 0 0 37 23C37 17 29 13 20 4Z" fill="var(--s-spd)"/></svg>'
 };
+/* 增量协议的紧凑编码: 牌编号 = 点数序号*4 + 花色序号, 牌型编号对应 HT */
+const SUITS=['diamond','club','heart','spade'];
+const RANKS=['3','4','5','6','7','8','9','10','J','Q','K','A','2'];
+const HT=[null,'single','pair','triple','triple_two','straight','consecutive_pairs','bomb','airplane','airplane_pure'];
+const C=i=>[SUITS[i&3],RANKS[i>>2]];
+const idxOf=c=>RANKS.indexOf(c.r)*4+SUITS.indexOf(c.s);
 const SN={diamond:'方块',club:'梅花',heart:'红心',spade:'黑桃'};
 const TN={
     single:'单张',pair:'对子',triple:'三条',triple_two:'三带二',
@@ -24,8 +34,18 @@ function cardImagePath(suit,rank){
 
 const AI_STEP_DELAY=1000;
 const AI_FINAL_DELAY=500;
+const ASYNC_AI=typeof EventSource!=='undefined';
 
 const $=id=>document.getElementById(id);
+const V=p=>(p-me+4)%4;
+
+function nameOf(p){
+    if(p===me) return '你';
+    return humans.includes(p)?'玩家'+(p+1):N[p];
+}
+function labelSeats(){
+    for(let p=0;p<4;p++) $('name-'+V(p)).textContent=nameOf(p);
+}
 
 /* ==== Theme ==== */
 function detectTheme(){
@@ -50,7 +70,7 @@ matchMedia('(prefers-color-scheme:dark)').addEventListener('change',e=>{
 
 /* ==== AI msg ==== */
 function aiMsg(a){
-    const name=N[a.player];
+    const name=nameOf(a.player);
     if(a.action==='pass') return name+' 不出';
     const ht=a.hand_type;
     if(!ht||ht==='single'){
@@ -72,47 +92,141 @@ function startGame(){
     sel.clear();busy=false;
     for(let i=0;i<4;i++) $('zone-'+i).innerHTML='';
     msg('');
+    closeTable();
+    me=0;token=null;humans=[0];
+    $('invite').classList.add('hidden');
+    const n=+$('humans').value;
 
-    fetch('/api/new_game',{method:'POST',headers:{'Content-Type':'application/json'}})
+    /* 单人牌桌从版本 0 开始取增量(带手牌), 多人牌桌的状态经牌桌连接推送 */
+    fetch('/api/new_game',{method:'POST',headers:{'Content-Type':'application/json'},
+        body:JSON.stringify({async:ASYNC_AI,humans:n,v:n>1?undefined:0})})
     .then(r=>r.json()).then(data=>{
+        if(data.error){msg(data.error);return}
         gid=data.game_id;
-        sync(data,true);
-        if(data.ai_actions&&data.ai_actions.length){
-            busy=true;
-            let d=600;
-            data.ai_actions.forEach((a)=>{
-                setTimeout(()=>{
-                    showZone(a.player,a.cards,a.action==='pass');
-                    msg(aiMsg(a));
-                    if(a.other_counts){
-                        for(let j=0;j<4;j++) $('cnt-'+j).textContent=a.other_counts[j];
-                    }
-                    for(let j=0;j<4;j++) $('seat-'+j).classList.toggle('on',j===a.player);
-                },d);
-                d+=AI_STEP_DELAY;
-            });
-            setTimeout(()=>{
-                sync(data);
-                msg('轮到你出牌');
-                busy=false;
-            },d+AI_FINAL_DELAY);
-        }else{
-            msg('你有方块3，请出牌');
+        if(data.token){
+            token=data.token;
+            sync(data,true);
+            showInvites(data.invites);
+            openTable();
+            return;
+        }
+        labelSeats();
+        handle(data,true);
+    });
+}
+
+function showAI(a){
+    showZone(a.player,a.cards,a.action==='pass');
+    msg(aiMsg(a));
+    const counts=a.other_counts||a.counts;
+    if(counts){
+        for(let i=0;i<4;i++) $('cnt-'+V(i)).textContent=counts[i];
+    }
+    for(let i=0;i<4;i++) $('seat-'+V(i)).classList.toggle('on',i===a.player);
+}
+
+/* 多人牌桌: 一条 SSE 长连接接收整桌的动作(先收到本座位的完整状态), 出牌请求只返回确认 */
+function openTable(){
+    closeTable();
+    tableES=new EventSource('/api/table_stream?game_id='+gid+'&token='+token);
+    tableES.onmessage=e=>{
+        const ev=JSON.parse(e.data);
+        if(ev.type==='sync'){
+            sync(ev);
+            if(ev.winner!=null) showResult(ev.winner);
+            return;
+        }
+        if(ev.type==='game_over'){
+            closeTable();
+            turnUI(true);
+            setTimeout(()=>showResult(ev.winner),1000);
+            return;
+        }
+        if(ev.action==='play'){
+            firstTurn=false;
+            if(ev.player===me){
+                const out=new Set(ev.cards.map(c=>c[0]+c[1]));
+                myHand=myHand.filter(c=>!out.has(c.s+c.r));
+                sel.clear();
+                renderHand(false);
+            }
         }
+        showAI(ev);
+        curP=ev.next;free=ev.is_free;
+        turnUI(false);
+        if(curP===me) msg('轮到你出牌');
+    };
+}
+function closeTable(){
+    if(tableES){tableES.close();tableES=null}
+}
+function showInvites(list){
+    const box=$('invite');
+    box.innerHTML='';
+    list.forEach(i=>{
+        const url=location.origin+'/?game='+gid+'&token='+i.token;
+        const row=document.createElement('div');
+        row.innerHTML=nameOf(i.seat)+' 邀请链接: <a href="'+url+'" target="_blank">'+url+'</a>';
+        box.appendChild(row);
     });
+    box.classList.toggle('hidden',!list.length);
+}
+
+/* 应用一个增量动作: 更新张数与自己的手牌, 返回 showAI 使用的动作对象 */
+function applyEvent(e){
+    const cards=(e[1]||[]).map(C);
+    counts[e[0]]-=cards.length;
+    if(cards.length) firstTurn=false;
+    if(e[0]===me&&cards.length){
+        const out=new Set(cards.map(c=>c[0]+c[1]));
+        myHand=myHand.filter(c=>!out.has(c.s+c.r));
+        renderHand(false);
+    }
+    return {player:e[0],cards,action:cards.length?'play':'pass',
+        hand_type:cards.length?HT[e[2]]:null,counts:counts.slice()};
+}
+
+/* 异步模式: 服务器立即返回, AI 动作经 SSE 逐个到达, 仍按 AI_STEP_DELAY 的节奏展示 */
+function streamAI(first,finish){
+    const es=new EventSource('/api/stream?game_id='+gid);
+    let t=Date.now()+first;
+    es.onmessage=e=>{
+        const ev=JSON.parse(e.data);
+        const at=Math.max(t,Date.now());
+        if(ev.type==='done'){
+            es.close();
+            setTimeout(()=>{
+                if(ev.error){msg(ev.error);busy=false;return}
+                finish(ev);
+            },at-Date.now()+AI_FINAL_DELAY);
+            return;
+        }
+        setTimeout(()=>showAI(applyEvent(ev.e)),at-Date.now());
+        t=at+AI_STEP_DELAY;
+    };
+    es.onerror=()=>{
+        if(es.readyState===EventSource.CLOSED){msg('连接中断');busy=false}
+    };
 }
 
 function sync(s,deal){
+    if(s.seat!=null) me=s.seat;
+    if(s.humans) humans=s.humans;
+    labelSeats();
     myHand=s.hand.map(c=>({s:c[0],r:c[1]}));
-    curP=s.current_player;free=s.is_free;
+    curP=s.current_player;free=s.is_free;firstTurn=s.first_turn;
     sel.clear();
     renderHand(deal);
-    for(let i=0;i<4;i++) $('cnt-'+i).textContent=s.other_counts[i];
-    $('turn-info').textContent='当前: '+N[curP];
-    $('btn-play').disabled=curP!==0||s.winner!=null;
-    $('btn-pass').disabled=curP!==0||s.winner!=null||free||s.first_turn;
+    for(let i=0;i<4;i++) $('cnt-'+V(i)).textContent=s.other_counts[i];
+    turnUI(s.winner!=null);
+}
+
+function turnUI(over){
+    $('turn-info').textContent='当前: '+nameOf(curP);
+    $('btn-play').disabled=curP!==me||over;
+    $('btn-pass').disabled=curP!==me||over||free||firstTurn;
     for(let i=0;i<4;i++){
-        $('seat-'+i).classList.toggle('on',i===curP);
+        $('seat-'+V(i)).classList.toggle('on',i===curP);
     }
 }
 
@@ -164,7 +278,7 @@ function toggle(i,el){
 }
 
 function showZone(pid,cards,pass){
-    const z=$('zone-'+pid);
+    const z=$('zone-'+V(pid));
     z.innerHTML='';
     if(pass){
         const b=document.createElement('div');
@@ -237,66 +351,88 @@ function msg(t){
 /* ==== Play / Pass ==== */
 function playCards(){
     if(busy||!sel.size)return;busy=true;
-    const cards=[...sel].map(i=>[myHand[i].s,myHand[i].r]);
-    fetch('/api/play',{method:'POST',headers:{'Content-Type':'application/json'},
-        body:JSON.stringify({game_id:gid,cards})})
-    .then(r=>r.json()).then(handle).catch(()=>{busy=false});
+    const cards=[...sel].map(i=>idxOf(myHand[i]));
+    fetch('/api/play?game_id='+gid,{method:'POST',headers:{'Content-Type':'application/json'},
+        body:JSON.stringify({game_id:gid,cards,token,v:token?undefined:ver,async:ASYNC_AI})})
+    .then(r=>r.json()).then(token?ack:handle).catch(()=>{busy=false});
 }
 function passTurn(){
     if(busy)return;busy=true;
-    fetch('/api/pass_turn',{method:'POST',headers:{'Content-Type':'application/json'},
-        body:JSON.stringify({game_id:gid})})
-    .then(r=>r.json()).then(handle).catch(()=>{busy=false});
+    fetch('/api/pass_turn?game_id='+gid,{method:'POST',headers:{'Content-Type':'application/json'},
+        body:JSON.stringify({game_id:gid,token,v:token?undefined:ver,async:ASYNC_AI})})
+    .then(r=>r.json()).then(token?ack:handle).catch(()=>{busy=false});
 }
 
-function handle(data){
-    if(data.error){msg(data.error);busy=false;return}
-    sel.clear();
+/* 多人牌桌: 动作结果经牌桌连接推送, 这里只处理错误 */
+function ack(data){
+    if(data.error) msg(data.error);
+    busy=false;
+}
 
+/* 单人牌桌的响应: 版本 ver 之后的动作(自己的立即显示, 电脑的逐个展示)与局面标量;
+   带 hand 时是完整状态, 张数先回退到这些动作之前再逐个应用 */
+function handle(d,start){
+    if(d.error){msg(d.error);busy=false;return}
+    busy=true;
+    sel.clear();
     for(let i=0;i<4;i++) $('zone-'+i).innerHTML='';
 
-    const pa=data.player_action;
-    if(pa) showZone(0,pa.cards,pa.action==='pass');
-
-    if(data.state){
-        myHand=data.state.hand.map(c=>({s:c[0],r:c[1]}));
-        renderHand(false);
-        $('cnt-0').textContent=data.state.other_counts[0];
+    if(d.hand){
+        myHand=d.hand.map(i=>{const c=C(i);return {s:c[0],r:c[1]}});
+        counts=d.counts.slice();
+        d.events.forEach(e=>{counts[e[0]]+=(e[1]||[]).length});
+        renderHand(start);
+        for(let i=0;i<4;i++) $('cnt-'+V(i)).textContent=counts[i];
     }
 
-    if(data.ai_actions&&data.ai_actions.length){
-        let d=700;
-        data.ai_actions.forEach((a)=>{
-            setTimeout(()=>{
-                showZone(a.player,a.cards,a.action==='pass');
-                msg(aiMsg(a));
-                if(a.other_counts){
-                    for(let i=0;i<4;i++) $('cnt-'+i).textContent=a.other_counts[i];
-                }
-                for(let i=0;i<4;i++) $('seat-'+i).classList.toggle('on',i===a.player);
-            },d);
-            d+=AI_STEP_DELAY;
-        });
-        setTimeout(()=>done(data),d+AI_FINAL_DELAY);
-    }else done(data);
+    let t=start?600:700,shown=false;
+    d.events.forEach(e=>{
+        if(e[0]===me){
+            const a=applyEvent(e);
+            showZone(a.player,a.cards,a.action==='pass');
+            $('cnt-'+V(me)).textContent=counts[me];
+            return;
+        }
+        setTimeout(()=>showAI(applyEvent(e)),t);
+        t+=AI_STEP_DELAY;
+        shown=true;
+    });
+
+    if(d.pending) streamAI(t,ev=>done(ev,start));
+    else if(shown) setTimeout(()=>done(d,start),t+AI_FINAL_DELAY);
+    else done(d,start);
 }
 
-function done(data){
-    sync(data.state);
-    if(data.winner!=null){
-        setTimeout(()=>showResult(data.winner),1000);
+function done(d,start){
+    if(d.error){msg(d.error);busy=false;return}
+    ver=d.v;curP=d.cur;free=d.free;firstTurn=d.first;
+    turnUI(d.winner!=null);
+    if(d.winner!=null){
+        setTimeout(()=>showResult(d.winner),1000);
+    }else if(start&&curP===me){
+        msg(firstTurn?'你有方块3，请出牌':'轮到你出牌');
     }
     busy=false;
 }
 
 function showResult(w){
     const t=$('m-txt'),ic=$('m-ico');
-    if(w===0){
+    if(w===me){
         t.textContent='恭喜你赢了!';t.className='cw';
         ic.innerHTML='<svg viewBox="0 0 80 80" width="64"><circle cx="40" cy="40" r="34" fill="#f5c542" stroke="#d4a520" stroke-width="2.5"/><circle cx="29" cy="34" r="3" fill="#6b4c00"/><circle cx="51" cy="34" r="3" fill="#6b4c00"/><path d="M26 48Q40 57 54 48" stroke="#6b4c00" stroke-width="2.5" fill="none" stroke-linecap="round"/></svg>';
     }else{
-        t.textContent=N[w]+' 赢了';t.className='cl';
+        t.textContent=nameOf(w)+' 赢了';t.className='cl';
         ic.innerHTML='<svg viewBox="0 0 80 80" width="64"><circle cx="40" cy="40" r="34" fill="#5a6678" stroke="#47525f" stroke-width="2.5"/><circle cx="29" cy="34" r="3" fill="#1e2530"/><circle cx="51" cy="34" r="3" fill="#1e2530"/><path d="M28 52Q40 45 52 52" stroke="#1e2530" stroke-width="2.5" fill="none" stroke-linecap="round"/></svg>';
     }
     $('overlay').classList.remove('hidden');
  }
+
+/* 通过邀请链接进入多人牌桌 */
+(function(){
+    const q=new URLSearchParams(location.search);
+    if(!q.get('game')||!q.get('token')) return;
+    gid=q.get('game');token=q.get('token');
+    $('title-screen').classList.add('hidden');
+    $('board').classList.remove('hidden');
+    openTable();
+})();
@@ -0,0 +1,110 @@
+"""
+多人牌桌的事件广播与座位令牌
+  - 每张牌桌一个只追加的事件频道: 玩家与电脑的每个动作发布一次(带序号), 该桌所有连接订阅同一频道,
+    断线后按序号(SSE 的 Last-Event-ID)续传
+  - 频道只保留最近 CHANNEL_EVENTS 个事件, 落后太多的连接收到 gap, 需重新取完整状态;
+    进程重启后频道从头计数, 续传序号超前的连接同样收到 gap
+  - 事件里的牌数、轮到谁都是绝对值, 快照与事件有重叠时重复应用无害
+  - 座位令牌 = HMAC(密钥, 对局号:座位), 不需要存储; 持有令牌即可代表该座位出牌与订阅
+"""
+
+import hashlib
+import hmac
+import threading
+from collections import OrderedDict, deque
+
+# 每个频道保留的事件数(一局通常不到 100 个动作)
+CHANNEL_EVENTS = 256
+# 最多保留多少张牌桌的频道(超出时优先淘汰已结束的)
+MAX_CHANNELS = 10000
+
+
+def seat_token(secret, game_id, seat):
+    return hmac.new(secret, f'{game_id}:{seat}'.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def seat_of(secret, game_id, token, seats):
+    """令牌对应的座位; 无效时返回 None"""
+    if not token:
+        return None
+    for seat in seats:
+        if hmac.compare_digest(seat_token(secret, game_id, seat), token):
+            return seat
+    return None
+
+
+class Channel:
+
+    def __init__(self, maxlen=CHANNEL_EVENTS):
+        self.events = deque(maxlen=maxlen)
+        self.seq = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def publish(self, event):
+        with self.cond:
+            self.seq += 1
+            event['seq'] = self.seq
+            self.events.append(event)
+            self.cond.notify_all()
+            return self.seq
+
+    def close(self):
+        """对局结束; 订阅者取完剩余事件后断开"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def wait(self, since, timeout):
+        """等待序号大于 since 的事件; 返回 (事件列表, 是否已结束, 是否需要重新同步)
+        since 之后有事件已被丢弃, 或 since 超过本频道的序号(频道已重建)时需要重新同步"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > since or self.closed or since > self.seq, timeout)
+            first = self.seq - len(self.events) + 1
+            if since + 1 < first or since > self.seq:
+                return list(self.events), self.closed, True
+            return list(self.events)[since - first + 1:], self.closed, False
+
+
+class TableHub:
+
+    def __init__(self, max_channels=MAX_CHANNELS):
+        self.max_channels = max_channels
+        self._channels = OrderedDict()
+        self._lock = threading.Lock()
+
+    def channel(self, game_id, create=False):
+        with self._lock:
+            ch = self._channels.get(game_id)
+            if ch is None:
+                if not create:
+                    return None
+                ch = self._channels[game_id] = Channel()
+                self._prune()
+            self._channels.move_to_end(game_id)
+            return ch
+
+    def publish(self, game_id, event):
+        return self.channel(game_id, create=True).publish(event)
+
+    def _prune(self):
+        excess = len(self._channels) - self.max_channels
+        if excess <= 0:
+            return
+        for gid in [g for g, ch in self._channels.items() if ch.closed][:excess]:
+            del self._channels[gid]
+            excess -= 1
+        while excess > 0:
+            self._channels.popitem(last=False)
+            excess -= 1
+
+    def close_all(self):
+        """停机: 结束所有订阅连接, 客户端按 Last-Event-ID 重连到新进程"""
+        with self._lock:
+            channels = list(self._channels.values())
+        for ch in channels:
+            ch.close()
+
+    def stats(self):
+        with self._lock:
+            return {'channels': len(self._channels)}
@@ -0,0 +1,6 @@
+"""测试从项目根目录导入各模块(与 python app.py 等入口一致)"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from ai_runner import AIRunner, QueueFull
+
+
+def steps(n, log=None, name=None, gate=None):
+    """走 n 步的 step 函数: 每步发布一个事件"""
+    left = [n]
+
+    def step(feed, late):
+        if gate is not None:
+            gate.wait(5)
+        left[0] -= 1
+        if log is not None:
+            log.append(name)
+        feed.publish({'type': 'ai', 'late': late})
+        return left[0] > 0
+
+    return step
+
+
+def wait_until(cond, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def finish(feed):
+    feed.finish({'state': 'end'})
+
+
+@pytest.fixture
+def runner():
+    runners = []
+
+    def make(**kwargs):
+        r = AIRunner(**kwargs)
+        runners.append(r)
+        return r
+
+    yield make
+    for r in runners:
+        r.shutdown()
+
+
+def test_events_in_order_with_done(runner):
+    r = runner(workers=2)
+    feed = r.start('g', steps(3), finish)
+    events, done = feed.wait(3, 5)
+    events, done = feed.wait(0, 0)
+    assert done and [e['seq'] for e in events] == [1, 2, 3, 4]
+    assert events[-1] == {'state': 'end', 'seq': 4, 'type': 'done'}
+    assert r.feed('g') is feed and not r.busy('g')
+
+
+def test_tables_take_turns(runner):
+    r = runner(workers=1)
+    log = []
+    gate = threading.Event()
+    fa = r.start('a', steps(3, log, 'a', gate), finish)
+    fb = r.start('b', steps(3, log, 'b'), finish)
+    gate.set()
+    fa.wait(4, 5)
+    fb.wait(4, 5)
+    assert fa.wait(0, 0)[1] and fb.wait(0, 0)[1]
+    assert log == ['a', 'b', 'a', 'b', 'a', 'b']
+
+
+def test_admit_reserves_and_full_queue_rejects(runner):
+    gate = threading.Event()
+    r = runner(workers=1, max_queue=1)
+    busy = r.start('busy', steps(1, gate=gate), finish)
+    wait_until(lambda: r.stats()['active'] == 1)  # 工作线程被占住, 队列为空
+    assert r.admit()
+    assert not r.admit()
+    with pytest.raises(QueueFull):
+        r.start('other', steps(1), finish)
+    assert r.feed('other').events == [] and not r.busy('other')
+    feed = r.start('mine', steps(1), finish, reserved=True)
+    assert r.stats()['reserved'] == 0 and r.stats()['queued'] == 1
+    gate.set()
+    assert feed.wait(1, 5)[0] and busy.wait(0, 5)
+    assert r.counters['rejected'] == 2
+
+
+def test_late_decisions_and_errors(runner):
+    r = runner(workers=1, deadline=-1)
+    feed = r.start('late', steps(1), finish)
+    feed.wait(1, 5)
+    assert feed.events[0]['late'] is True
+
+    def broken(feed, late):
+        raise RuntimeError('boom')
+
+    feed = r.start('err', broken, finish)
+    feed.wait(0, 5)
+    assert feed.events[-1]['error'] == 'boom' and feed.events[-1]['type'] == 'done'
+    assert r.counters['errors'] == 1
+
+
+def test_drain_waits_for_running_and_reserved(runner):
+    gate = threading.Event()
+    r = runner(workers=1)
+    feed = r.start('g', steps(2, gate=gate), finish)
+    assert r.admit()
+    assert not r.drain(0.05)
+    assert not r.admit()  # 排空中拒绝新请求
+    r.release()
+    gate.set()
+    assert r.drain(5)
+    assert feed.wait(0, 0)[1] and len(feed.events) == 3
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+pytest.importorskip('flask')
+
+
+@pytest.fixture(scope='module')
+def poker(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('app')
+    env = {
+        'GAME_STORE': 'memory',
+        'SECRET_KEY': 'test-secret',
+        'AI_LOG_FILE': '',
+        'AI_WORKERS': '2',
+        'REPLAY_FILE': str(tmp / 'replays.bin'),
+        'WORKER_ID': '5',
+    }
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    import app as poker
+    yield poker
+    if poker.runner is not None:
+        poker.drain(5)
+        poker.close()
+    for k, v in saved.items():
+        if v is None:
+            os.environ.pop(k, None)
+        else:
+            os.environ[k] = v
+
+
+@pytest.fixture(scope='module')
+def client(poker):
+    return poker.app.test_client()
+
+
+def test_first_request_initializes_app(poker, client):
+    # 直接加载 app:app 的 WSGI 服务器不调用 create_app, 第一个请求负责初始化
+    res = client.post('/api/new_game', json={})
+    assert res.status_code == 200
+    assert poker.runner is not None and poker.WORKER_ID == 5
+    assert res.get_json()['game_id'].startswith('05')
+    assert poker.create_app() is poker.app
+
+
+def test_single_player_game_to_the_end(client):
+    state = client.post('/api/new_game', json={}).get_json()
+    game_id = state['game_id']
+    for _ in range(200):
+        if state.get('winner') is not None:
+            break
+        assert state['current_player'] == 0
+        # 自由出牌时出一张单牌, 否则不要: 总是合法
+        if state['is_free']:
+            res = client.post('/api/play', json={'game_id': game_id, 'cards': [state['hand'][0]]})
+        else:
+            res = client.post('/api/pass_turn', json={'game_id': game_id})
+        assert res.status_code == 200, res.get_json()
+        body = res.get_json()
+        state = dict(body['state'], winner=body.get('winner'))
+    assert state['winner'] is not None
+    stats = client.get('/api/stats').get_json()
+    assert stats['ai']['active'] == 0
+
+
+@pytest.mark.parametrize('cards', [[[9, 9]], [52], [['x']], [[1]], 'a', [True], [[True]], [False]])
+def test_malformed_cards_are_rejected(poker, client, cards):
+    game_id = client.post('/api/new_game', json={}).get_json()['game_id']
+    res = client.post('/api/play', json={'game_id': game_id, 'cards': cards})
+    assert res.status_code == 400
+    assert 'error' in res.get_json()
+    with pytest.raises((TypeError, ValueError)):
+        poker.parse_cards(cards)
+
+
+def test_unknown_game_and_bad_version(client):
+    assert client.post('/api/play', json={'game_id': 'nope', 'cards': []}).status_code == 400
+    assert client.post('/api/pass_turn', json={'game_id': 'nope', 'v': 'x'}).status_code == 400
+    assert client.post('/api/new_game', json={'seats': [0, 4]}).status_code == 400
+
+
+def test_delta_protocol_new_game(client):
+    delta = client.post('/api/new_game', json={'v': 0}).get_json()
+    assert 'game_id' in delta and delta['v'] == len(delta['events'])
+
+
+def test_multi_seat_tokens(poker, client):
+    state = client.post('/api/new_game', json={'seats': [0, 2]}).get_json()
+    game_id = state['game_id']
+    assert state['seat'] == 0 and [i['seat'] for i in state['invites']] == [2]
+    res = client.post('/api/pass_turn', json={'game_id': game_id})
+    assert res.status_code == 403
+    res = client.post('/api/pass_turn', json={'game_id': game_id, 'token': 'bogus'})
+    assert res.status_code == 403
+
+
+def test_metrics_endpoint(client):
+    client.post('/api/new_game', json={})
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'poker_http_request_seconds_bucket' in body
+    assert '# TYPE' in body
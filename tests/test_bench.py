@@ -0,0 +1,28 @@
+from bench import build_suite, compare, measure_alloc, measure_time, parse_hand
+
+
+def test_parse_hand_takes_suits_in_order():
+    assert parse_hand('3 3 4 3') == [('diamond', '3'), ('club', '3'), ('diamond', '4'), ('heart', '3')]
+
+
+def test_quick_suite_runs_every_benchmark_once():
+    """语料自检(牌型用例与期望一致)通过, 每项的函数都能在其输入上执行"""
+    suite = build_suite(quick=True)
+    names = [name for name, _, _ in suite]
+    assert len(names) == len(set(names))
+    for name, fn, inputs in suite:
+        assert inputs, name
+        fn(*inputs[0])
+
+
+def test_measurements_and_compare():
+    res = measure_time(lambda x: x + 1, [(1,), (2,)], 0.01)
+    assert res['samples'] >= 2 and res['p50_us'] <= res['p99_us']
+    alloc = measure_alloc(lambda n: [0] * n, [(1000,), (10,)])
+    assert alloc['alloc_peak_max_bytes'] >= 8000 and alloc['alloc_retained_bytes'] < 8000
+    base = {'results': {'a': {'p50_us': 1.0}, 'b': {'p50_us': 2.0}}}
+    new = {'results': {'a': {'p50_us': 1.5}, 'b': {'p50_us': 2.1}, 'c': {'p50_us': 1.0}}}
+    lines = compare(base, new).splitlines()
+    assert len(lines) == 3
+    assert lines[1].startswith('a') and lines[1].endswith('!')
+    assert not lines[2].endswith('!')
@@ -0,0 +1,60 @@
+from card_tracker import CardTracker
+from cards import FULL_MASK, RANK_ORDER, hand_to_mask, mask_count, mask_rank_counts
+from game_logic import Game
+
+
+def play(seed, turns=400):
+    game = Game()
+    game.deal(seed=seed)
+    while game.winner is None and turns:
+        game.ai_play(game.current_player)
+        turns -= 1
+    return game
+
+
+def state_of(tracker):
+    return (tracker.remaining, tracker.played_by, tracker.rank_left, tracker.high_cards_seen, tracker.bombs_seen,
+            tracker.passes, tracker.voids, tracker.caps, list(tracker.recent))
+
+
+def test_incremental_matches_rebuild_from_history():
+    for seed in range(5):
+        game = play(seed)
+        assert state_of(game.tracker) == state_of(CardTracker.from_history(game.history))
+
+
+def test_played_cards_account_for_the_deck():
+    game = play(7)
+    tracker = game.tracker
+    hands = [hand_to_mask(game.hand(p)) for p in range(4)]
+    held = hands[0] | hands[1] | hands[2] | hands[3]
+    assert tracker.remaining == held
+    for p in range(4):
+        assert tracker.played_by[p] & hands[p] == 0
+    assert tracker.played_by[0] | tracker.played_by[1] | tracker.played_by[2] | tracker.played_by[3] == FULL_MASK & ~held
+    assert tracker.rank_left == mask_rank_counts(held)
+    assert tracker.high_cards_seen == 8 - sum(tracker.rank_left[RANK_ORDER[r]] for r in ('A', '2'))
+    assert mask_count(tracker.remaining) == sum(game.hand_sizes())
+
+
+def test_pass_infers_voids_and_caps_until_rank_is_played():
+    tracker = CardTracker()
+    tracker.on_pass(1, 'single', RANK_ORDER['10'], 1)
+    assert not tracker.may_hold(1, 'J') and not tracker.may_hold(1, '2')
+    assert tracker.may_hold(1, '10') and tracker.may_hold(2, '2')
+    assert tracker.caps[1][RANK_ORDER['K']] == 0
+    tracker.on_play(1, [('spade', 'K')], 'single', RANK_ORDER['K'])
+    assert tracker.may_hold(1, 'K') and tracker.caps[1][RANK_ORDER['K']] == 4
+    tracker.on_pass(2, 'pair', RANK_ORDER['Q'], 2)
+    assert tracker.caps[2][RANK_ORDER['A']] == 1 and tracker.caps[2][RANK_ORDER['Q']] == 4
+    assert tracker.trick() == (1, 1)
+    assert tracker.recent_enemy_passes(1) == 1
+
+
+def test_copy_is_independent():
+    game = play(3, turns=10)
+    snap = game.tracker.copy()
+    before = state_of(snap)
+    game.tracker.on_pass(0, 'single', 5, 1)
+    game.tracker.on_play(1, [('heart', '2')], 'single', 12)
+    assert state_of(snap) == before
@@ -0,0 +1,76 @@
+import random
+from itertools import combinations
+
+from cards import (ALL_CARDS, CARD_INDEX, FULL_MASK, HAND_TABLE, card_to_index, classify_cards, classify_counts,
+                   classify_mask, counts_to_signature, hand_to_mask, index_to_card, mask_count, mask_rank_counts,
+                   mask_signature, mask_to_hand, mask_to_indices, rank_counts, signature, signature_to_counts)
+from game_logic import card_sort_key
+
+
+def test_index_round_trip():
+    for i, card in enumerate(ALL_CARDS):
+        assert card_to_index(card) == i == CARD_INDEX[card]
+        assert index_to_card(i) == card
+    # 编号顺序即 card_sort_key 顺序
+    assert sorted(ALL_CARDS, key=card_sort_key) == ALL_CARDS
+
+
+def test_mask_round_trip():
+    rng = random.Random(1)
+    assert mask_to_hand(FULL_MASK) == ALL_CARDS
+    assert hand_to_mask([]) == 0 and mask_to_hand(0) == []
+    for _ in range(200):
+        hand = rng.sample(ALL_CARDS, rng.randint(1, 20))
+        mask = hand_to_mask(hand)
+        assert mask_to_hand(mask) == sorted(hand, key=card_sort_key)
+        assert mask_to_indices(mask) == sorted(CARD_INDEX[c] for c in hand)
+        assert mask_count(mask) == len(hand)
+        # JSON 传来的 list 与 tuple 等价
+        assert hand_to_mask([list(c) for c in hand]) == mask
+
+
+def test_signature_round_trip():
+    rng = random.Random(2)
+    for _ in range(200):
+        hand = rng.sample(ALL_CARDS, rng.randint(0, 52))
+        counts = rank_counts(hand)
+        sig = signature(hand)
+        assert counts_to_signature(counts) == sig == mask_signature(hand_to_mask(hand))
+        assert signature_to_counts(sig) == counts == mask_rank_counts(hand_to_mask(hand))
+
+
+def test_table_matches_counting_algorithm():
+    """查表结果与计数算法一致: 表里的条目逐一核对, 表外的随机手牌都不成牌型"""
+    for sig, hit in HAND_TABLE.items():
+        assert classify_counts(signature_to_counts(sig)) == hit
+    rng = random.Random(3)
+    for _ in range(2000):
+        hand = rng.sample(ALL_CARDS, rng.randint(1, 16))
+        expected = classify_counts(rank_counts(hand))
+        assert classify_cards(hand) == expected
+        assert classify_mask(hand_to_mask(hand)) == expected
+
+
+def test_classify_examples():
+    def c(*names):
+        return classify_cards([(s, r) for s, r in (n.split(':') for n in names)])
+
+    assert c('spade:3') == ('single', 0)
+    assert c('spade:2', 'heart:2') == ('pair', 12)
+    assert c('spade:3', 'heart:4', 'club:5') == ('straight', 2)
+    assert c('spade:3', 'heart:3', 'spade:4', 'heart:4') == ('consecutive_pairs', 1)
+    assert c('spade:9', 'heart:9', 'club:9', 'diamond:9') == ('bomb', 6)
+    assert c('spade:7', 'heart:7', 'club:7', 'spade:K', 'heart:Q') == ('triple_two', 4)
+    assert c('spade:7', 'heart:7', 'club:7', 'spade:8', 'heart:8', 'club:8') == ('airplane_pure', 5)
+    assert c('spade:3', 'heart:5') == (None, -1)
+    assert classify_cards([]) == (None, -1)
+
+
+def test_every_small_subset_of_a_rank_run():
+    """一组连续点数的所有子集: 查表与计数算法逐一比对(含 13 张以上走缓存的路径)"""
+    cards = [c for c in ALL_CARDS if c[1] in ('3', '4', '5', '6')] + [('spade', '2')]
+    for n in (1, 2, 3, 4, 5, 6):
+        for hand in combinations(cards, n):
+            assert classify_cards(hand) == classify_counts(rank_counts(hand))
+    big = [c for c in ALL_CARDS if c[1] in ('3', '4', '5', '6', '7')]
+    assert classify_cards(big[:15]) == classify_counts(rank_counts(big[:15]))
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+import decision_log
+from decision_log import NULL_TRACE, DecisionTrace, LazyCards, log_decision, log_event, new_trace, setup_logging
+
+
+class Counted:
+    calls = 0
+
+    def __str__(self):
+        Counted.calls += 1
+        return 'x'
+
+
+@pytest.fixture
+def jsonl(tmp_path):
+    """把 poker.* 日志写到临时文件, 返回读取已写记录的函数; 结束后还原 logger"""
+    logger = decision_log.logger
+    saved = list(logger.handlers), logger.level, logger.propagate
+    listener = {}
+
+    def start(level):
+        listener['l'] = setup_logging(str(tmp_path / 'ai.jsonl'), level=level, console=False)
+
+    def read():
+        listener['l'].stop()
+        with open(tmp_path / 'ai.jsonl', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    yield start, read
+    logger.handlers[:], logger.level, logger.propagate = saved
+
+
+def test_trace_formats_lazily():
+    Counted.calls = 0
+    trace = DecisionTrace()
+    trace.append('出 %s', Counted())
+    trace.append('无参数 %s')
+    assert Counted.calls == 0 and len(trace) == 2
+    assert trace.lines() == ['出 x', '无参数 %s'] and Counted.calls == 1
+    assert str(LazyCards([('spade', '3'), ('heart', 'A')])) == '3 A'
+
+
+def test_null_trace_records_nothing():
+    NULL_TRACE.append('%s', Counted())
+    assert not NULL_TRACE and len(NULL_TRACE) == 0 and NULL_TRACE.lines() == []
+    assert list(NULL_TRACE) == []
+
+
+def test_info_level_logs_summary_only(jsonl):
+    start, read = jsonl
+    start('INFO')
+    trace = new_trace()
+    assert trace is NULL_TRACE
+    log_decision('g1', 2, [('spade', '3')], trace, 0.0012, 'single')
+    log_event('new_game', game_id='g1')
+    entries = read()
+    assert [e['event'] for e in entries] == ['ai_decision', 'new_game']
+    assert entries[0]['cards'] == [['spade', '3']] and entries[0]['ms'] == 1.2
+    assert 'thinking' not in entries[0]
+
+
+def test_traced_game_logs_thinking_at_any_level(jsonl):
+    start, read = jsonl
+    start('WARNING')
+    trace = new_trace(full=True)
+    trace.append('手牌(%d)', 1)
+    log_decision('g2', 1, None, trace, 0.0, full=True)
+    log_decision('g3', 1, None, NULL_TRACE, 0.0)
+    log_event('new_game', game_id='g3')
+    entries = read()
+    assert len(entries) == 1
+    assert entries[0]['action'] == 'pass' and entries[0]['thinking'] == ['手牌(1)']
+
+
+def test_debug_level_records_thinking(jsonl):
+    start, read = jsonl
+    start('DEBUG')
+    assert isinstance(new_trace(), DecisionTrace)
+    assert read() == []
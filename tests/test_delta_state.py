@@ -0,0 +1,65 @@
+from cards import classify_cards, index_to_card, mask_to_indices
+from game_logic import Game, encode_action
+from game_state import HAND_TYPES
+
+
+class Client:
+    """按增量协议维护的客户端局面: 只靠 v0 的完整状态与之后的动作"""
+
+    def __init__(self, pid, delta):
+        self.pid = pid
+        self.hand = set(delta['hand'])
+        self.counts = list(delta['counts'])
+        self.v = 0
+        self.apply(delta)
+
+    def apply(self, delta):
+        for event in delta['events']:
+            if len(event) == 1:
+                continue
+            player, cards, code = event
+            assert HAND_TYPES[code] == classify_cards([index_to_card(i) for i in cards])[0]
+            self.counts[player] -= len(cards)
+            if player == self.pid:
+                self.hand -= set(cards)
+        self.v = delta['v']
+        self.cur, self.winner = delta['cur'], delta['winner']
+
+
+def test_client_tracks_game_from_deltas():
+    for seed in range(5):
+        game = Game()
+        game.deal(seed=seed)
+        client = Client(0, game.get_delta_for_player(0, 0))
+        while game.winner is None:
+            for _ in range(seed % 3 + 1):
+                if game.winner is None:
+                    game.ai_play(game.current_player)
+            client.apply(game.get_delta_for_player(0, client.v))
+            assert client.counts == game.hand_sizes()
+            assert sorted(client.hand) == mask_to_indices(game.state.hands[0])
+            assert (client.cur, client.winner) == (game.current_player, game.winner)
+        assert client.v == len(game.history)
+
+
+def test_invalid_version_returns_full_state():
+    game = Game()
+    game.deal(seed=1)
+    for _ in range(6):
+        game.ai_play(game.current_player)
+    for since in (0, -1, 99):
+        delta = game.get_delta_for_player(2, since)
+        assert delta['hand'] == mask_to_indices(game.state.hands[2])
+        assert len(delta['events']) == 6
+    delta = game.get_delta_for_player(2, 6)
+    assert delta['events'] == [] and 'hand' not in delta
+
+
+def test_encode_action():
+    game = Game()
+    game.deal(seed=3)
+    game.ai_play(game.current_player)
+    pid, cards, code = encode_action(game.state.history[0])
+    assert pid == game.history[0]['player']
+    assert [list(index_to_card(i)) for i in cards] == game.history[0]['cards']
+    assert encode_action(2 << 52) == [2]
@@ -0,0 +1,120 @@
+import random
+import threading
+
+from card_tracker import CardTracker
+from cards import ALL_CARDS, hand_to_mask, mask_to_hand, signature
+from endgame import PASS, BoundedTable, EndgameSolver, ThreadLocalSolver, is_endgame, take_cards
+from game_state import HAND_TYPES, GameState
+from move_gen import legal_moves
+from opponent_model import OpponentModel
+
+
+def brute_wins(st, root, memo):
+    """不用置换表与排序的与/或搜索: 真实手牌(含花色), 三家对手联手"""
+    if st.winner is not None:
+        return st.winner == root
+    key = (tuple(st.hands), st.current, st.last_mask, st.last_player, st.pass_count)
+    if key in memo:
+        return memo[key]
+    pid = st.current
+    hand = mask_to_hand(st.hands[pid])
+    if st.is_free(pid):
+        moves = legal_moves(hand)
+        options = [hand_to_mask(m[2]) for m in moves]
+    else:
+        moves = legal_moves(hand, HAND_TYPES[st.last_type], st.last_value, st.last_count)
+        options = [hand_to_mask(m[2]) for m in moves] + [0]
+    results = []
+    for mask in options:
+        st.apply(pid, mask)
+        results.append(brute_wins(st, root, memo))
+        st.undo()
+    memo[key] = result = any(results) if pid == root else all(results)
+    return result
+
+
+def random_state(rng, sizes, last=False):
+    st = GameState()
+    cards = rng.sample(ALL_CARDS, sum(sizes) + 1)
+    for p in range(4):
+        st.hands[p] = hand_to_mask(cards[sum(sizes[:p]):sum(sizes[:p + 1])])
+    st.first_turn = False
+    st.current = rng.randrange(4)
+    if last:
+        # 上家刚出了一张单张(该牌不在任何人手里), 轮到当前玩家跟牌
+        pid = (st.current + 3) % 4
+        st.hands[pid] |= hand_to_mask(cards[-1:])
+        st.apply(pid, hand_to_mask(cards[-1:]))
+    return st
+
+
+def test_solve_matches_brute_force():
+    rng = random.Random(5)
+    solver = EndgameSolver(budget=10 ** 7)
+    for i in range(120):
+        st = random_state(rng, [rng.randint(1, 3) for _ in range(4)], last=i % 2 == 1)
+        root = st.current
+        won, move = solver.solve_state(st)
+        assert won == brute_wins(st, root, {})
+        if won:
+            # 给出的出法本身必胜
+            cards = [] if move == PASS else take_cards(mask_to_hand(st.hands[root]), move)
+            assert signature(cards) == move
+            st.apply(root, hand_to_mask(cards))
+            assert brute_wins(st, root, {})
+
+
+def test_budgets_give_up_without_an_answer():
+    st = random_state(random.Random(9), [6, 6, 6, 6])
+    assert EndgameSolver(budget=1).solve_state(st) == (None, None)
+    assert EndgameSolver(time_budget=0.0).solve_state(st) == (None, None)
+    assert EndgameSolver(budget=10 ** 7).solve_state(st)[0] is not None
+
+
+def test_evaluate_counts_wins_per_sampled_world():
+    hand = [('spade', '3'), ('spade', '4'), ('heart', '4'), ('spade', '2')]
+    model = OpponentModel(CardTracker(), hand, 0, [4, 2, 3, 2])
+    solver = EndgameSolver(budget=10 ** 6, worlds=8)
+    scores, done = solver.evaluate(hand, 0, None, None, 0, model, seed=1)
+    assert done == 8
+    moves = {m[0] for m in solver.moves(signature(hand), None)}
+    assert set(scores) == moves and all(0 <= n <= done for n in scores.values())
+
+
+def test_bounded_table_keeps_two_generations():
+    table = BoundedTable(4)
+    for k in range(1, 4):
+        table.store(k, k * 10)
+    assert len(table) == 3 and table.get(1) == 10 and table.get(3) == 30
+    for k in range(4, 10):
+        table.store(k, k * 10)
+    assert len(table) <= 4
+    assert table.get(1) is None and table.get(9) == 90
+    table.clear()
+    assert len(table) == 0
+
+
+def test_thread_local_solvers_are_separate():
+    shared = ThreadLocalSolver(budget=10 ** 6)
+    seen = []
+
+    def run():
+        seen.append(shared.solver)
+        assert shared.solver is seen[-1]
+
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(s) for s in seen}) == 3
+    hands = [signature([('spade', '2')]), signature([('spade', '3')]), signature([('spade', '4')]),
+             signature([('spade', '5')])]
+    assert shared.solve(hands, 0) == (True, hands[0])
+
+
+def test_is_endgame():
+    hand = [('spade', '3'), ('spade', '5'), ('spade', '7')]
+    assert is_endgame(hand, [3, 4, 6, 5], 0)
+    assert not is_endgame(hand, [3, 7, 6, 5], 0)
+    assert not is_endgame([('spade', '3')], [1, 2, 2, 2], 0)  # 一手就能出完, 不需要搜索
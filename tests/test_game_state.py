@@ -0,0 +1,90 @@
+import random
+
+from cards import hand_to_mask
+from game_logic import Game
+from game_state import GameState, PackedHistory, pack_action, unpack_action
+
+
+def fields(st):
+    return {slot: getattr(st, slot) for slot in GameState.__slots__}
+
+
+def random_game(seed):
+    """每步在合法出法(及可过牌时的过牌)中随机选, 返回对局及每步之前的状态"""
+    rng = random.Random(seed)
+    game = Game()
+    game.deal(seed=seed)
+    before = []
+    while game.winner is None:
+        pid = game.current_player
+        moves = game.legal_moves(pid)
+        can_pass = not game.state.is_free(pid) and not game.first_turn
+        before.append(game.state.clone())
+        if can_pass and (not moves or rng.random() < 0.3):
+            ok, msg = game.pass_turn(pid)
+        else:
+            ok, msg = game.play_cards(pid, list(rng.choice(moves)[2]))
+        assert ok, msg
+    return game, before
+
+
+def test_undo_restores_every_step():
+    for seed in range(20):
+        game, before = random_game(seed)
+        st = game.state
+        for prev in reversed(before):
+            st.undo()
+            assert fields(st) == fields(prev)
+
+
+def test_snapshot_restore():
+    game, before = random_game(100)
+    st = GameState.from_bytes(before[10].to_bytes())
+    snap = st.snapshot()
+    expected = fields(st.clone())
+    for entry in game.state.history[10:20]:
+        st.apply(*unpack_action(entry))
+    st.restore(snap)
+    assert fields(st) == expected
+
+
+def test_bytes_round_trip():
+    for seed in range(10):
+        game, before = random_game(seed)
+        for st in before[::7] + [game.state]:
+            assert fields(GameState.from_bytes(st.to_bytes())) == fields(st)
+
+
+def test_clone_is_independent():
+    game, _ = random_game(5)
+    st = game.state
+    copy = st.clone()
+    st.undo()
+    assert copy.history != st.history and copy.hands != st.hands
+    assert copy.winner is not None and st.winner is None
+
+
+def test_packed_history_view():
+    game, _ = random_game(3)
+    history = game.history
+    assert isinstance(history, PackedHistory) and len(history) == len(game.state.history)
+    for entry, action in zip(game.state.history, history):
+        pid, mask = unpack_action(entry)
+        assert pack_action(pid, mask) == entry
+        assert action['player'] == pid
+        assert action['action'] == ('play' if mask else 'pass')
+        assert hand_to_mask(action['cards']) == mask
+    assert history[-2:] == list(history)[-2:]
+
+
+def test_play_cards_rejects_malformed_cards():
+    game = Game()
+    game.deal(seed=1)
+    pid = game.current_player
+    for cards in ([('diamond', '3'), ('joker', '3')], [('diamond', '3'), ('spade', '1')], [('diamond',)],
+                  [('diamond', '3'), ('diamond', '3')]):
+        assert game.play_cards(pid, cards) == (False, '你没有这些牌')
+    assert game.play_cards(pid, [('spade', '4')]) == (False, '第一手必须包含方块3')
+    assert game.pass_turn(pid) == (False, '自由出牌必须出')
+    assert game.play_cards((pid + 1) % 4, [('diamond', '3')]) == (False, '不是你的回合')
+    assert len(game.history) == 0
@@ -0,0 +1,54 @@
+import game_store
+from game_logic import Game
+from game_store import GameStore, approx_size
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def test_lru_eviction_keeps_recently_used(monkeypatch):
+    monkeypatch.setattr(game_store, 'time', Clock())
+    store = GameStore(max_games=3)
+    games = [Game() for _ in range(4)]
+    for i, g in enumerate(games[:3]):
+        store.put(i, g)
+    assert store.get(0) is games[0]  # 0 变为最近使用
+    store.put(3, games[3])
+    assert store.ids() == {0, 2, 3}
+    assert store.evicted_lru == 1 and len(store) == 3
+
+
+def test_ttl_and_shorter_ttl_for_finished_games(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(game_store, 'time', clock)
+    store = GameStore(ttl=100, finished_ttl=10)
+    live, done = Game(), Game()
+    done.state.winner = 2
+    store.put('live', live)
+    store.put('done', done)
+    clock.now += 11
+    assert store.sweep() == 1
+    assert store.ids() == {'live'}
+    assert store.get('live') is live  # 访问刷新时间
+    clock.now += 99
+    assert 'live' in store
+    clock.now += 101
+    assert store.get('live') is None
+    assert store.evicted_ttl == 2
+    store.delete('missing')
+
+
+def test_stats_estimates_memory():
+    store = GameStore()
+    game = Game()
+    game.deal(seed=1)
+    store.put('a', game)
+    stats = store.stats()
+    assert stats['live_games'] == 1 and stats['finished_games'] == 0
+    assert stats['approx_bytes_per_game'] == approx_size(game) > 0
+    assert approx_size([1, 'x', None]) == approx_size([2, 'y', None])
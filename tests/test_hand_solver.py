@@ -0,0 +1,61 @@
+import random
+from functools import lru_cache
+from itertools import product
+
+from cards import ALL_CARDS, HAND_TABLE, classify_cards, counts_to_signature, rank_counts, signature
+from hand_solver import best_next_play, counts_min_plays, decompose, min_plays
+
+
+@lru_cache(maxsize=None)
+def brute_min_plays(counts):
+    """不剪枝的穷举: 任意一个成型的子集都可以作为下一手"""
+    if not any(counts):
+        return 0
+    best = sum(counts)
+    for sub in product(*(range(c + 1) for c in counts)):
+        if any(sub) and counts_to_signature(sub) in HAND_TABLE:
+            rest = tuple(c - s for c, s in zip(counts, sub))
+            best = min(best, 1 + brute_min_plays(rest))
+    return best
+
+
+def sample_hands(seed, n, size, ranks=('3', '4', '5', '6', '7', '8', '9', '10')):
+    rng = random.Random(seed)
+    deck = [c for c in ALL_CARDS if c[1] in ranks]
+    return [rng.sample(deck, size) for _ in range(n)]
+
+
+def test_min_plays_matches_exhaustive_search():
+    for size in (4, 7, 9):
+        for hand in sample_hands(size, 60, size):
+            counts = tuple(rank_counts(hand))
+            assert min_plays(hand) == brute_min_plays(counts) == counts_min_plays(list(counts))
+
+
+def test_decompose_is_an_optimal_partition():
+    for hand in sample_hands(1, 100, 13, ranks=tuple(c[1] for c in ALL_CARDS[::4])):
+        parts = decompose(hand)
+        assert len(parts) == min_plays(hand)
+        used = [c for _, _, cards in parts for c in cards]
+        assert sorted(used) == sorted(hand)
+        for htype, hvalue, cards in parts:
+            assert classify_cards(cards) == (htype, hvalue)
+        lead = best_next_play(hand)
+        assert lead in parts
+
+
+def test_known_hands():
+    def h(text):
+        used = {}
+        out = []
+        for r in text.split():
+            k = used[r] = used.get(r, -1) + 1
+            out.append((('diamond', 'club', 'heart', 'spade')[k], r))
+        return out
+
+    assert min_plays([]) == 0 and best_next_play([]) is None
+    assert min_plays(h('3 4 5 6 7 8 9 10 J Q K A 2')) == 1
+    assert min_plays(h('3 3 3 4 4 4 5 5 6 6 9')) == 2
+    assert min_plays(h('3 5 7 9 J')) == 5
+    assert signature(h('2 2 2 2')) in HAND_TABLE
+    assert min_plays(h('2 2 2 2 3')) == 1  # 三条 2 带 2 与 3
@@ -0,0 +1,78 @@
+import random
+
+from cards import hand_to_mask, mask_count
+from decision_log import DecisionTrace
+from game_logic import Game
+from mc_player import MonteCarloAIPlayer, _position, _world, rollout_batch
+
+
+def position_at(seed, turns):
+    game = Game()
+    game.deal(seed=seed)
+    for _ in range(turns):
+        game.ai_play(game.current_player)
+    st = game.state
+    pid = st.current
+    pos = _position(game.hand(pid), game.last_play_type, st.last_value, st.last_count, st.is_free(pid),
+                    st.first_turn, st.hand_sizes(), pid, game.history, game.tracker)
+    return game, pos
+
+
+def test_sampled_world_is_consistent_with_position():
+    game, pos = position_at(1, 9)
+    rng = random.Random(0)
+    for _ in range(20):
+        world = _world(pos, rng)
+        st = world.state
+        assert st.hands[pos['pid']] == game.state.hands[pos['pid']]
+        assert st.hand_sizes() == game.hand_sizes()
+        # 对手手牌恰好分完未见过的牌
+        others = 0
+        for i in range(4):
+            if i != pos['pid']:
+                others |= st.hands[i]
+        assert others == hand_to_mask(pos['unseen'])
+        assert (st.last_mask, st.last_player, st.pass_count) == (game.state.last_mask, game.state.last_player,
+                                                                  game.state.pass_count)
+
+
+def test_rollouts_share_worlds_and_respect_deadline():
+    _, pos = position_at(2, 6)
+    candidates = [None] if pos['last_type'] is not None else []
+    candidates += [m[2] for m in _world(pos, random.Random(0)).legal_moves(pos['pid'])[:2]]
+    wins, runs = rollout_batch(pos, candidates, 1, 5, float('inf'))
+    assert runs == 5 and len(wins) == len(candidates) and all(0 <= w <= 5 for w in wins)
+    assert rollout_batch(pos, candidates, 1, 5, 0) == ([0] * len(candidates), 0)
+
+
+def test_decisions_are_always_legal():
+    ai = MonteCarloAIPlayer(time_limit=0.02, max_rollouts=24, seed=3)
+    for seed in range(3):
+        game = Game()
+        game.deal(seed=seed)
+        while game.winner is None:
+            before = len(game.history)
+            pid = game.current_player
+            cards_before = mask_count(game.state.hands[pid])
+            _, cards = game.ai_play(pid, ai=ai if pid == 0 else None)
+            # 非法出牌会被 play_cards 拒绝, 对局不会前进
+            assert len(game.history) == before + 1
+            assert mask_count(game.state.hands[pid]) == cards_before - len(cards or ())
+
+
+def test_trace_has_one_decision_line():
+    ai = MonteCarloAIPlayer(time_limit=0.05, max_rollouts=40, seed=5)
+    game = Game()
+    game.deal(seed=4)
+    overrides = 0
+    for _ in range(12):
+        if game.winner is not None:
+            break
+        trace = DecisionTrace()
+        game.ai_play(game.current_player, trace=trace, ai=ai)
+        lines = trace.lines()
+        # 启发式的决策行只有一条, 蒙特卡洛只在改选时另记一行
+        assert sum(line.startswith('决策 ->') for line in lines) == 1
+        assert sum(line.startswith('蒙特卡洛改选') for line in lines) <= 1
+        overrides += any(line.startswith('蒙特卡洛改选') for line in lines)
+    assert overrides < 12
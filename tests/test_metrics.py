@@ -0,0 +1,83 @@
+import pstats
+import threading
+
+import pytest
+
+from metrics import Registry, SamplingProfiler
+
+
+def parse(text):
+    """Prometheus 文本 -> {带标签的序列名: 数值}, 同时检查每个指标都有 HELP 与 TYPE"""
+    values = {}
+    declared = set()
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            declared.add(line.split()[2])
+        elif line.startswith('# TYPE '):
+            assert line.split()[2] in declared
+        elif line:
+            name, value = line.rsplit(' ', 1)
+            values[name] = float(value)
+    return values
+
+
+def test_histogram_buckets_are_cumulative():
+    reg = Registry()
+    hist = reg.histogram('poker_request_seconds', '请求耗时', labels=('route',), buckets=(0.01, 0.1, 1))
+    for v in (0.005, 0.05, 0.05, 0.5, 5):
+        hist.observe(v, '/api/play')
+    with hist.time('/api/new_game'):
+        pass
+    values = parse(reg.render())
+    play = 'route="/api/play"'
+    assert [values[f'poker_request_seconds_bucket{{{play},le="{le}"}}'] for le in ('0.01', '0.1', '1', '+Inf')] \
+        == [1, 3, 4, 5]
+    assert values[f'poker_request_seconds_count{{{play}}}'] == 5
+    assert values[f'poker_request_seconds_sum{{{play}}}'] == pytest.approx(5.605)
+    assert values['poker_request_seconds_count{route="/api/new_game"}'] == 1
+    with pytest.raises(ValueError):
+        hist.labels('a', 'b')
+
+
+def test_concurrent_observations_are_not_lost():
+    hist = Registry().histogram('h', 'doc')
+
+    def work():
+        for _ in range(2000):
+            hist.observe(0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert hist.labels().counts[-1] + sum(hist.labels().counts[:-1]) == 8000
+
+
+def test_callback_and_label_escaping():
+    reg = Registry()
+    reg.callback('poker_store', '对局存储', lambda: {'live_games': 3, 'evicted_lru': 2, 'backend': 'sqlite',
+                                                 'draining': False}, counters=('evicted_lru',))
+    reg.histogram('h', 'doc', labels=('path',)).observe(1, 'a"b\\c')
+    text = reg.render()
+    values = parse(text)
+    assert values['poker_store_live_games'] == 3 and values['poker_store_evicted_lru_total'] == 2
+    assert '# TYPE poker_store_evicted_lru_total counter' in text
+    assert 'backend' not in text and 'draining' not in text
+    assert 'h_count{path="a\\"b\\\\c"} 1' in text
+
+
+def test_sampling_profiler(tmp_path):
+    off = SamplingProfiler(0.0, str(tmp_path))
+    assert off.start() is None and off.stop(None, 'x') is None
+    prof = SamplingProfiler(1.0, str(tmp_path))
+    handle = prof.start()
+    assert handle is not None
+    assert prof.start() is None  # 同一时刻只剖析一处
+    sum(range(1000))
+    path = prof.stop(handle, '/api/play')
+    assert path.startswith(str(tmp_path / 'api_play-')) and prof.dumped == 1
+    assert pstats.Stats(path).total_calls > 0
+    handle = prof.start()  # 锁已释放
+    assert handle is not None
+    prof.stop(handle, 'again')
@@ -0,0 +1,70 @@
+import random
+from itertools import combinations
+
+from cards import ALL_CARDS, classify_cards, signature
+from game_logic import card_sort_key
+from move_gen import can_beat, legal_moves, move_strength
+
+HAND_TYPES = ('single', 'pair', 'triple', 'triple_two', 'straight', 'consecutive_pairs', 'bomb',
+              'airplane', 'airplane_pure')
+
+
+def brute_force(hand, last=None):
+    """穷举 hand 的所有子集, 按点数签名去重(花色不同的同点数出法只算一种)"""
+    out = {}
+    for n in range(1, len(hand) + 1):
+        for cards in combinations(hand, n):
+            htype, hvalue = classify_cards(cards)
+            if htype is None:
+                continue
+            if last is not None and not can_beat(*last, htype, hvalue, n):
+                continue
+            out[signature(cards)] = (htype, hvalue, n)
+    return out
+
+
+def generated(hand, last=None):
+    moves = legal_moves(hand, *(last or ()))
+    out = {}
+    for htype, hvalue, cards in moves:
+        sig = signature(cards)
+        # 每种点数组合只生成一次, 牌都来自手牌且按编号排序
+        assert sig not in out
+        assert set(cards) <= set(hand)
+        assert list(cards) == sorted(cards, key=card_sort_key)
+        assert classify_cards(cards) == (htype, hvalue)
+        out[sig] = (htype, hvalue, len(cards))
+    assert moves == sorted(moves, key=move_strength)
+    return out
+
+
+def sample_hands(seed, n, size):
+    rng = random.Random(seed)
+    # 只用 7 个点数, 小手牌里也常有三条、炸弹、连对和飞机
+    deck = [c for c in ALL_CARDS if c[1] in ('3', '4', '5', '6', '7', '8', '9')]
+    return [rng.sample(deck, size) for _ in range(n)]
+
+
+def test_free_moves_match_brute_force():
+    for hand in sample_hands(1, 150, 11):
+        assert generated(hand) == brute_force(hand)
+
+
+def test_responses_match_brute_force():
+    lasts = [('single', 3, 1), ('pair', 2, 2), ('triple', 1, 3), ('triple_two', 0, 5), ('straight', 3, 3),
+             ('straight', 2, 5), ('consecutive_pairs', 2, 4), ('consecutive_pairs', 1, 6), ('bomb', 2, 4),
+             ('airplane_pure', 1, 6), ('airplane', 1, 10)]
+    for hand in sample_hands(2, 60, 12):
+        for last in lasts:
+            assert generated(hand, last) == brute_force(hand, last)
+
+
+def test_bomb_beats_everything_but_a_bigger_bomb():
+    for last_type in HAND_TYPES:
+        if last_type != 'bomb':
+            assert can_beat(last_type, 12, 5, 'bomb', 0, 4)
+    assert can_beat('bomb', 3, 4, 'bomb', 4, 4)
+    assert not can_beat('bomb', 4, 4, 'bomb', 3, 4)
+    assert not can_beat('bomb', 0, 4, 'single', 12, 1)
+    assert not can_beat('straight', 3, 5, 'straight', 4, 6)
+    assert not can_beat('pair', 3, 2, 'triple', 4, 3)
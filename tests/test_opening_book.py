@@ -0,0 +1,51 @@
+import pytest
+
+from cards import mask_signature, mask_to_hand
+from dealer import deal_from_seed
+from opening_book import OpeningBook, build, finishing_ranks, write_book
+
+
+def deck_mask(indices):
+    mask = 0
+    for i in indices:
+        mask |= 1 << i
+    return mask
+
+
+def test_finishing_ranks():
+    assert finishing_ranks(1, [5, 0, 3, 9]) == [6, 2, 4, 8]
+    # 并列取平均名次: 2.5 x2 = 5
+    assert finishing_ranks(0, [0, 4, 4, 1]) == [2, 7, 7, 4]
+    assert sum(finishing_ranks(2, [3, 3, 0, 3])) == 2 * (1 + 2 + 3 + 4)
+
+
+@pytest.fixture(scope='module')
+def built():
+    return build(40, workers=1, seed=10, batch_size=15)
+
+
+def test_build_is_deterministic_and_counts_every_seat(built):
+    exact, features = built
+    assert sum(n for n, _, _ in exact.values()) == 4 * 40
+    assert sum(w for _, w, _ in exact.values()) == 40
+    assert (exact, features) == build(40, workers=1, seed=10, batch_size=7)
+
+
+def test_book_file_round_trip(tmp_path, built):
+    exact, features = built
+    path = str(tmp_path / 'book.bin')
+    write_book(path, exact, features)
+    book = OpeningBook(path)
+    try:
+        assert len(book) == len(exact)
+        for sig, stats in exact.items():
+            assert book.stats(sig) == tuple(stats)
+        first = deck_mask(deal_from_seed(10)[:13])
+        hand = mask_to_hand(first)
+        est = book.estimate(hand)
+        assert est['games'] == exact[mask_signature(first)][0]
+        assert 1 <= est['expected_rank'] <= 4 and 0 <= est['win_rate'] <= 1
+        # 未收录的手牌用特征统计估计
+        assert book.stats(12345) is None and book.estimate(hand[:5])['games'] == 0
+    finally:
+        book.close()
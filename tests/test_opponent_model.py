@@ -0,0 +1,59 @@
+import pytest
+
+import opponent_model
+from card_tracker import CardTracker
+from cards import RANK_ORDER
+from game_logic import Game
+from opponent_model import OpponentModel
+
+
+def model_at(seed=4, turns=10):
+    game = Game()
+    game.deal(seed=seed)
+    for _ in range(turns):
+        if game.winner is not None:
+            break
+        game.ai_play(game.current_player)
+    pid = game.current_player
+    return OpponentModel(game.tracker, game.hand(pid), pid, game.hand_sizes())
+
+
+def test_expected_matches_margins_and_caps():
+    for seed in range(5):
+        m = model_at(seed)
+        e = m.expected
+        for i in range(3):
+            assert sum(e[i]) == pytest.approx(m.counts[i], abs=0.05)
+            assert all(e[i][r] <= m.caps[i][r] + 1e-9 for r in range(13))
+        for r in range(13):
+            assert e[0][r] + e[1][r] + e[2][r] == pytest.approx(m.unseen[r], abs=0.05)
+
+
+def test_pass_caps_rule_out_holding():
+    tracker = CardTracker()
+    hand = [('diamond', '3')]
+    # 下家面对单张 K 不出: 推断没有 A 和 2
+    tracker.on_pass(1, 'single', RANK_ORDER['K'], 1)
+    m = OpponentModel(tracker, hand, 0, [1, 13, 13, 13])
+    assert m.p_hold(0, RANK_ORDER['A']) == 0.0 and m.p_hold(0, RANK_ORDER['2']) == 0.0
+    assert 0.0 < m.p_hold(1, RANK_ORDER['2']) < 1.0
+    assert m.p_hold(1, RANK_ORDER['3'], 4) == 0.0  # 未见的 3 只剩 3 张
+    assert m.p_beat('single', RANK_ORDER['K'], players=(0,)) == 0.0
+    assert m.p_beat('single', RANK_ORDER['K']) > 0.5
+    assert m.p_beat('straight', 3) is None
+
+
+@pytest.mark.parametrize('numpy', [False, True])
+def test_samples_deal_all_unseen_cards(monkeypatch, numpy):
+    if numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(opponent_model, 'np', None)
+    m = model_at(2, 14)
+    samples = [[[int(x) for x in row] for row in deal] for deal in m.sample(50, seed=1)]
+    assert len(samples) == 50
+    for deal in samples:
+        assert [sum(row) for row in deal] == m.counts
+        assert [deal[0][r] + deal[1][r] + deal[2][r] for r in range(13)] == m.unseen
+    within = sum(all(d[i][r] <= m.caps[i][r] for i in range(3) for r in range(13)) for d in samples)
+    assert within >= 45
@@ -0,0 +1,36 @@
+import regression
+from game_logic import Game
+from regression import HERE, _Templates, compare, load_corpus, run_side
+
+
+def test_same_tree_has_no_decision_changes():
+    corpus = load_corpus(n_games=2, seed=30)
+    old = run_side(HERE, corpus, 1, 1)
+    new = run_side(HERE, corpus, 1, 2)
+    assert len(old) == sum(len(actions) for _, _, actions in corpus)
+    report = compare(corpus, old, new)
+    assert report['changed'] == 0 and report['positions'] == len(old)
+    # 沿记录的局面推进: 每一步的决策者就是记录里的出牌者
+    assert [r[2] for r in old] == [pid for _, _, actions in corpus for pid, _ in actions]
+
+
+def test_changed_decision_is_reported(monkeypatch):
+    monkeypatch.setattr(regression, '_Game', Game)
+    corpus = load_corpus(n_games=1, seed=31)
+    old = regression._run_chunk(corpus)
+    new = list(old)
+    tag, step, pid, mask, ms, branches, is_template = old[3]
+    new[3] = (tag, step, pid, 0 if mask else 1, ms, branches, is_template)
+    report = compare(corpus, old, new)
+    assert report['changed'] == 1
+    diff = report['diffs'][0]
+    assert (diff['tag'], diff['step'], diff['player']) == (tag, step, pid)
+    assert sum(old_n for old_n, _ in report['branches'].values()) > 0
+
+
+def test_formatted_lines_map_back_to_templates():
+    new = [(0, 0, 0, 0, 1.0, ('出孤张%s', '对手最少牌数: %s'), True)]
+    old = [(0, 0, 0, 0, 1.0, ('出孤张9', '对手最少牌数: 3', '旧版独有的一行'), False)]
+    templates = _Templates(new + old)
+    assert templates.branches(old[0]) == ('出孤张%s', '对手最少牌数: %s', '旧版独有的一行')
+    assert templates.branches(new[0]) == new[0][5]
@@ -0,0 +1,114 @@
+import os
+import threading
+
+import pytest
+
+from dealer import deal_from_seed
+from game_logic import Game
+from replay import DEAL_MASKS, DEAL_OWNERS, ReplayWriter, _RECORD, decode_game, encode_game, read_replays
+
+
+def play(seed, turns=1000):
+    game = Game()
+    game.deal(seed=seed)
+    while game.winner is None and turns:
+        game.ai_play(game.current_player)
+        turns -= 1
+    return game
+
+
+def start_hands(game):
+    hands = list(game.state.hands)
+    for entry in game.state.history:
+        hands[entry >> 52] |= entry & ((1 << 52) - 1)
+    return hands
+
+
+def check_same(replay, game, tag):
+    assert replay.tag == tag and replay.winner == game.winner
+    assert replay.hands == start_hands(game)
+    assert [p << 52 | m for p, m in replay.actions()] == list(game.state.history)
+    again = replay.to_game()
+    assert again.state.to_bytes() == game.state.to_bytes()
+
+
+def test_record_round_trip():
+    for seed in range(8):
+        game = play(seed, turns=1000 if seed % 2 else 9)
+        record = encode_game(game, tag=seed)
+        assert _RECORD.unpack_from(record)[2] == DEAL_OWNERS  # 整副牌发完, 每张牌 2 位
+        check_same(decode_game(record), game, seed)
+
+
+def test_negative_seed_tag_keeps_the_deal(tmp_path):
+    game = Game()
+    game.set_deck(deal_from_seed(-1))
+    for _ in range(6):
+        game.ai_play(game.current_player)
+    path = str(tmp_path / 'neg.bin')
+    with ReplayWriter(path) as w:
+        w.write(game, tag=-1)
+    [rep] = read_replays(path)
+    check_same(rep, game, 2 ** 64 - 1)
+    # 存下的标签作为种子发出的是同一副牌
+    again = Game()
+    again.set_deck(deal_from_seed(rep.tag))
+    assert again.state.hands[:] == start_hands(game)
+
+
+def test_partial_deal_uses_masks():
+    game = Game()
+    game.set_hands([[('diamond', '3'), ('spade', '2')], [('heart', '5')], [('club', 'K')], [('spade', 'A')]])
+    game.play_cards(0, [('diamond', '3')])
+    record = encode_game(game, tag=7)
+    assert _RECORD.unpack_from(record)[2] == DEAL_MASKS
+    replay = decode_game(record)
+    check_same(replay, game, 7)
+    assert replay.winner is None and len(replay) == 1
+
+
+def test_file_round_trip_and_truncated_tail(tmp_path):
+    path = str(tmp_path / 'r.bin')
+    games = [play(seed) for seed in range(6)]
+    with ReplayWriter(path) as w:
+        for i, g in enumerate(games[:3]):
+            w.write(g, tag=i)
+    # 第二个写入者(如另一个进程)追加, 不重写文件头
+    with ReplayWriter(path) as w:
+        for i, g in enumerate(games[3:], 3):
+            w.write_record(encode_game(g, i))
+    replays = list(read_replays(path))
+    assert len(replays) == 6
+    for i, (r, g) in enumerate(zip(replays, games)):
+        check_same(r, g, i)
+    # 写到一半崩溃的尾部记录被忽略
+    with open(path, 'ab') as f:
+        f.write(encode_game(games[0], 99)[:20])
+    assert [r.tag for r in read_replays(path)] == list(range(6))
+    with pytest.raises(ValueError):
+        w.write(games[0])
+
+
+def test_concurrent_writers_do_not_interleave(tmp_path):
+    path = str(tmp_path / 'r.bin')
+    games = [play(seed) for seed in range(4)]
+    w = ReplayWriter(path)
+    threads = [threading.Thread(target=lambda i=i: [w.write(games[i], tag=i) for _ in range(25)])
+               for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    w.close()
+    counts = [0] * 4
+    for r in read_replays(path):
+        check_same(r, games[r.tag], r.tag)
+        counts[r.tag] += 1
+    assert counts == [25] * 4 and w.count == 100
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / 'x.bin'
+    path.write_bytes(os.urandom(64))
+    with pytest.raises(ValueError):
+        list(read_replays(str(path)))
@@ -0,0 +1,46 @@
+import pytest
+
+import server
+
+
+class Worker:
+    pass
+
+
+class Server:
+
+    def __init__(self, slots):
+        self.WORKERS = {}
+        for pid, slot in enumerate(slots):
+            w = Worker()
+            w.slot = slot
+            self.WORKERS[pid] = w
+
+
+@pytest.mark.parametrize('slots, expected', [([], 0), ([0], 1), ([0, 1, 2], 3), ([0, 2], 1), ([1, 2], 0)])
+def test_pre_fork_reuses_lowest_free_slot(slots, expected):
+    worker = Worker()
+    server.pre_fork(Server(slots), worker)
+    assert worker.slot == expected
+
+
+def test_nginx_config_routes_by_worker_prefix():
+    conf = server.nginx_config('0.0.0.0', 5001, 3, '8080')
+    assert 'listen 8080;' in conf
+    for i in range(3):
+        assert f'server 127.0.0.1:{5001 + i};' in conf
+        assert f'~^{i:02x} 127.0.0.1:{5001 + i};' in conf
+    assert 'default poker_any;' in conf
+    assert '~^03' not in conf
+    assert '10.0.0.2:7000' in server.nginx_config('10.0.0.2', 7000, 1, '80')
+
+
+def test_main_prints_nginx_config(capsys):
+    server.main(['-w', '2', '--port', '6000', '--nginx'])
+    out = capsys.readouterr().out
+    assert '~^01 127.0.0.1:6001;' in out
+
+
+def test_main_rejects_bad_worker_count():
+    with pytest.raises(SystemExit):
+        server.main(['-w', '0', '--nginx'])
@@ -0,0 +1,25 @@
+from replay import decode_game
+from simulate import play_game, run
+
+
+def strip(rec):
+    rec = dict(rec)
+    rec.pop('duration_ms')
+    return rec
+
+
+def test_results_do_not_depend_on_process_count():
+    single = {r['seed']: strip(r) for r in run(12, workers=1, seed=50, batch_size=5)}
+    multi = {r['seed']: strip(r) for r in run(12, workers=2, seed=50, batch_size=5)}
+    assert sorted(single) == list(range(50, 62))
+    assert single == multi
+    assert single[55] == strip(play_game(55))
+
+
+def test_game_result_and_replay_record():
+    rec = play_game(7, record=True)
+    assert rec['winner'] is not None and rec['cards_left'][rec['winner']] == 0
+    assert sum(rec['hand_types'].values()) <= rec['turns']
+    replay = decode_game(rec['replay'])
+    assert replay.tag == 7 and replay.winner == rec['winner'] and len(replay) == rec['turns']
+    assert replay.to_game().winner == rec['winner']
@@ -0,0 +1,135 @@
+import sqlite3
+import time
+
+import pytest
+
+import sqlite_store
+from game_logic import Game
+from mc_player import MonteCarloAIPlayer
+from sqlite_store import SQLiteGameStore
+
+
+def started_game(seed, turns=12, **kwargs):
+    game = Game(**kwargs)
+    game.deal(seed=seed)
+    for _ in range(turns):
+        game.ai_play(game.current_player)
+    return game
+
+
+def test_round_trip_through_database(tmp_path):
+    path = str(tmp_path / 'games.db')
+    game = started_game(1, trace=True, humans=(0, 2))
+    game.ai = MonteCarloAIPlayer()
+    writer = SQLiteGameStore(path)
+    writer.put('g1', game)
+    assert writer.get('g1') is game  # 落盘前从脏对局读到
+    assert writer.flush() == 1
+    # 另一个进程的存储: 没有缓存, 从数据库加载
+    loaded = SQLiteGameStore(path).get('g1')
+    assert loaded is not game
+    assert loaded.state.to_bytes() == game.state.to_bytes()
+    assert type(loaded.ai) is MonteCarloAIPlayer and loaded.trace and loaded.humans == (0, 2)
+    assert loaded.tracker.remaining == game.tracker.remaining
+    assert loaded.tracker.voids == game.tracker.voids
+
+
+def test_cache_reloads_after_another_process_writes(tmp_path):
+    path = str(tmp_path / 'games.db')
+    a, b = SQLiteGameStore(path), SQLiteGameStore(path, validate_cache=True)
+    game = started_game(2, turns=4)
+    a.put('g', game)
+    a.flush()
+    cached = b.get('g')
+    assert b.get('g') is cached and b.loads == 1
+    game.ai_play(game.current_player)
+    a.put('g', game)
+    a.flush()
+    fresh = b.get('g')
+    assert fresh is not cached and b.loads == 2
+    assert len(fresh.history) == len(game.history)
+
+
+def test_cache_hit_skips_database_by_default(tmp_path):
+    path = str(tmp_path / 'games.db')
+    a, b = SQLiteGameStore(path), SQLiteGameStore(path)
+    game = started_game(2, turns=4)
+    a.put('g', game)
+    a.flush()
+    cached = b.get('g')
+    a.put('g', started_game(3, turns=4))
+    a.flush()
+    assert b.get('g') is cached and b.loads == 1
+
+
+def failing_dump(monkeypatch, times, during=None):
+    """前 times 次写入时抛出 database is locked; during 在抛出前调用(模拟落盘期间的新写入)"""
+    calls = {'n': 0}
+    real = sqlite_store.dump_game
+
+    def dump(game):
+        calls['n'] += 1
+        if calls['n'] <= times:
+            if during is not None:
+                during()
+            raise sqlite3.OperationalError('database is locked')
+        return real(game)
+
+    monkeypatch.setattr(sqlite_store, 'dump_game', dump)
+    return calls
+
+
+def test_failed_flush_keeps_batch_and_newer_writes(tmp_path, monkeypatch):
+    store = SQLiteGameStore(str(tmp_path / 'games.db'))
+    old, newer = started_game(1, turns=2), started_game(1, turns=3)
+    store.put('g', old)
+    store.put('h', started_game(2, turns=2))
+    failing_dump(monkeypatch, 1, during=lambda: store.put('g', newer))
+    with pytest.raises(sqlite3.OperationalError):
+        store.flush()
+    assert store._dirty['g'] is newer and 'h' in store._dirty and store._flushing == {}
+    assert store.flush() == 2
+    loaded = SQLiteGameStore(store.path).get('g')
+    assert loaded.state.to_bytes() == newer.state.to_bytes()
+
+
+def test_writer_thread_survives_flush_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_store, 'MAX_BACKOFF', 0.02)
+    store = SQLiteGameStore(str(tmp_path / 'games.db'), flush_interval=0.01, sweep_interval=60)
+    calls = failing_dump(monkeypatch, 3)
+    game = started_game(5, turns=4)
+    store.start_sweeper()
+    try:
+        store.put('g', game)
+        deadline = time.monotonic() + 5
+        while store.flushed == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert store.errors == 3 and calls['n'] == 4
+        assert store._writer.is_alive()
+        assert store.stats()['flush_errors'] == 3
+    finally:
+        store.stop()
+    assert SQLiteGameStore(store.path).get('g').state.to_bytes() == game.state.to_bytes()
+
+
+def test_delete_and_sweep(tmp_path):
+    store = SQLiteGameStore(str(tmp_path / 'games.db'), ttl=0, finished_ttl=0)
+    store.put('x', started_game(3, turns=1))
+    store.put('y', started_game(4, turns=1))
+    store.flush()
+    store.delete('x')
+    assert store.get('x') is None and len(store) == 1
+    assert store.sweep() == 1
+    assert store.get('y') is None and store._versions == {}
+
+
+def test_migrates_old_schema(tmp_path):
+    path = str(tmp_path / 'games.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE games (game_id TEXT PRIMARY KEY, version INTEGER NOT NULL, ai TEXT NOT NULL, '
+                 'state BLOB NOT NULL, finished INTEGER NOT NULL, updated_at REAL NOT NULL)')
+    conn.close()
+    store = SQLiteGameStore(path)
+    store.put('g', started_game(5, turns=2))
+    store.stop()
+    assert SQLiteGameStore(path).get('g').humans == (0,)
@@ -0,0 +1,63 @@
+import threading
+
+from table_hub import Channel, TableHub, seat_of, seat_token
+
+SECRET = b'test-secret'
+
+
+def test_seat_tokens():
+    tokens = {p: seat_token(SECRET, 'g1', p) for p in range(4)}
+    assert len(set(tokens.values())) == 4
+    for p, token in tokens.items():
+        assert seat_of(SECRET, 'g1', token, range(4)) == p
+    assert seat_of(SECRET, 'g1', tokens[2], [0, 1]) is None
+    assert seat_of(SECRET, 'g2', tokens[0], range(4)) is None
+    assert seat_of(b'other', 'g1', tokens[0], range(4)) is None
+    assert seat_of(SECRET, 'g1', '', range(4)) is None
+
+
+def test_resume_from_sequence_number():
+    ch = Channel()
+    for i in range(5):
+        ch.publish({'i': i})
+    events, closed, gap = ch.wait(2, 0)
+    assert [e['seq'] for e in events] == [3, 4, 5] and not closed and not gap
+    assert ch.wait(5, 0) == ([], False, False)
+    ch.close()
+    assert ch.wait(5, 1) == ([], True, False)
+
+
+def test_gap_when_events_dropped_or_channel_rebuilt():
+    ch = Channel(maxlen=3)
+    for i in range(6):
+        ch.publish({'i': i})
+    events, _, gap = ch.wait(1, 0)
+    assert gap and [e['seq'] for e in events] == [4, 5, 6]
+    assert ch.wait(3, 0)[2] is False
+    # 进程重启后频道从头计数, 客户端带着更大的序号重连
+    assert Channel().wait(9, 0)[2] is True
+
+
+def test_wait_wakes_on_publish():
+    ch = Channel()
+    got = []
+    t = threading.Thread(target=lambda: got.append(ch.wait(0, 5)))
+    t.start()
+    ch.publish({'type': 'play'})
+    t.join(5)
+    assert got[0][0] == [{'type': 'play', 'seq': 1}]
+
+
+def test_hub_prunes_closed_channels_first():
+    hub = TableHub(max_channels=2)
+    hub.publish('a', {})
+    hub.publish('b', {})
+    hub.channel('a').close()
+    hub.channel('c', create=True)
+    assert hub.channel('a') is None and hub.channel('b') is not None
+    # 都未结束时淘汰最久未用的(刚查过 b, 淘汰 c)
+    hub.channel('d', create=True)
+    assert hub.channel('c') is None and hub.stats() == {'channels': 2}
+    assert hub.channel('missing') is None
+    hub.close_all()
+    assert hub.channel('b').closed and hub.channel('d').closed
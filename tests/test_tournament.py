@@ -0,0 +1,55 @@
+import math
+
+import pytest
+
+import tournament
+from ai_player import AIParams, AIPlayer
+from tournament import fit, lineup, make_policy, pair_scores, play_deal, ratings
+
+
+def test_lineup_uses_every_policy():
+    for seed in range(20):
+        assert sorted(lineup(seed, 2)) == [0, 0, 1, 1]
+        assert sorted(lineup(seed, 3)) == [0, 0, 1, 2]
+        seats = lineup(seed, 6)
+        assert len(set(seats)) == 4 and max(seats) < 6
+
+
+def test_pair_scores_skip_same_policy():
+    # 座位 0/2 为策略 0, 座位 1/3 为策略 1; 赢家是座位 1, 座位 0 第二
+    scores = pair_scores([([0, 1, 0, 1], [4, 2, 7, 7])])
+    assert scores == {(0, 1): [1.5, 4]}
+
+
+def test_fit_recovers_strength_order():
+    pairs = {(0, 1): [30.0, 40], (0, 2): [36.0, 40], (1, 2): [28.0, 40]}
+    theta = fit(pairs, 3)
+    assert theta[0] > theta[1] > theta[2]
+    assert sum(theta) == pytest.approx(0, abs=1e-9)
+    # 均势时强度相同
+    assert fit({(0, 1): [20.0, 40]}, 2) == pytest.approx([0.0, 0.0], abs=1e-9)
+    groups = [{key: [s / 10, g // 10] for key, (s, g) in pairs.items()} for _ in range(10)]
+    elo, intervals, order, stable = ratings(groups, 3, bootstrap=20)
+    assert order == [0, 1, 2] and all(lo <= hi for lo, hi in intervals)
+    assert len(stable) == 2 and all(0 <= p <= 1 for p in stable)
+    assert math.isclose(elo[0] - elo[2], tournament.ELO_SCALE * (theta[0] - theta[2]))
+
+
+def test_make_policy(tmp_path):
+    assert type(make_policy('no-endgame')).endgame is None
+    assert isinstance(make_policy('ai_player:AIPlayer'), AIPlayer)
+    path = str(tmp_path / 'p.json')
+    AIParams(few_cards=3).save(path)
+    assert make_policy(path).params.few_cards == 3
+    with pytest.raises(ValueError):
+        make_policy('nope')
+
+
+def test_duplicate_deal_rotates_seats(monkeypatch):
+    monkeypatch.setattr(tournament, '_policies', [AIPlayer(), tournament.NoEndgameAI()])
+    results = play_deal(3, 2)
+    assert len(results) == 4
+    base = results[0][0]
+    for shift, (seats, ranks) in enumerate(results):
+        assert seats == [base[(s + shift) % 4] for s in range(4)]
+        assert sorted(ranks)[0] == 2
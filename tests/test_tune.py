@@ -0,0 +1,63 @@
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tune
+from ai_player import PARAM_SPACE, AIParams
+from tune import Candidate, from_unit, propose, race, to_unit
+
+
+def test_params_validate_and_load_old_files(tmp_path):
+    assert AIParams() == AIParams(**{k: v[0] for k, v in PARAM_SPACE.items()})
+    with pytest.raises(ValueError):
+        AIParams(few_cards=99)
+    with pytest.raises(ValueError):
+        AIParams(no_such_param=1)
+    path = tmp_path / 'old.json'
+    path.write_text(json.dumps({'few_cards': 5, 'safe_limit': 9, 'late_high_cards': 2}), encoding='utf-8')
+    assert AIParams.load(str(path)) == AIParams(few_cards=5)
+    assert repr(AIParams(few_cards=5)) == 'AIParams(few_cards=5)'
+
+
+def test_unit_space_round_trip():
+    rng = random.Random(0)
+    assert from_unit(to_unit(AIParams())) == AIParams()
+    for _ in range(50):
+        params = from_unit([rng.random() for _ in PARAM_SPACE])
+        assert from_unit(to_unit(params)) == params
+        for name, (default, lo, hi) in PARAM_SPACE.items():
+            value = getattr(params, name)
+            assert lo <= value <= hi and type(value) is type(default)
+    # 超出 [0, 1] 的坐标截到边界
+    assert from_unit([2.0] * len(PARAM_SPACE)).to_dict() == {k: v[2] for k, v in PARAM_SPACE.items()}
+
+
+def test_propose_distinct_candidates():
+    rng = random.Random(1)
+    base = AIParams()
+    cands = propose(base, 8, 0.2, rng)
+    keys = {tuple(c.to_dict().values()) for c in cands}
+    assert len(keys) == len(cands) == 8 and tuple(base.to_dict().values()) not in keys
+    only = propose(base, 4, 0.3, rng, names={'few_cards'})
+    assert all(c.to_dict() == dict(base.to_dict(), few_cards=c.few_cards) for c in only)
+    # 步长太小扰动不出新的整数值
+    assert propose(base, 3, 1e-9, rng, names={'few_cards'}) == []
+
+
+def test_race_drops_clearly_worse_candidates(monkeypatch):
+    def fake_batch(seeds, challenger, incumbent):
+        # few_cards 越大越"强"; 得分带一点按种子的噪声
+        strength = dict(zip(PARAM_SPACE, challenger))['few_cards'] / 13
+        return [min(1.0, max(0.0, strength + (s % 5 - 2) * 0.02)) for s in seeds]
+
+    monkeypatch.setattr(tune, '_run_batch', fake_batch)
+    weak, strong = Candidate(AIParams(few_cards=1)), Candidate(AIParams(few_cards=13))
+    with ThreadPoolExecutor(2) as pool:
+        played = race(pool, [weak, strong], AIParams(), list(range(60)), 2, 10, 4, 1.645)
+    assert weak.dropped and weak.deals < 60
+    assert not strong.dropped and strong.deals == 60
+    assert played == weak.deals + strong.deals
+    lo, hi = strong.bounds(1.645)
+    assert 0.5 < lo <= strong.mean <= hi
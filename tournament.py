@@ -0,0 +1,297 @@
+"""
+AI 策略锦标赛与等级分
+  - 每个牌局(一个种子的一副牌)选 4 个座位的策略阵容, 同一副牌轮转 4 次, 每个阵容成员都坐过每个座位
+    (复式轮转), 牌运的差异在同一牌局内抵消
+  - 牌局按批分发到 ProcessPoolExecutor, 子进程按名字构造策略; 每局的名次(赢家第 1, 其余按剩余牌数)
+    拆成同桌两两之间的胜负
+  - 等级分: 两两胜负上拟合 Bradley-Terry 模型(ELO 刻度, 平均 1500), 置信区间按牌局整体有放回重抽样;
+    排名中相邻两名的先后在重抽样中都足够稳定时提前停止
+策略: 内置名字(POLICIES)、"模块:可调用对象"(调用后返回带 decide 的 AI), 或 tune.py 写出的参数 JSON 文件
+(按该组参数构造 AIPlayer)。
+
+用法:
+  python tournament.py heuristic no-endgame no-book -w 8
+  python tournament.py heuristic mc --min-deals 50 --max-deals 2000 --json ratings.json
+  python tournament.py heuristic tuned.json
+"""
+
+import argparse
+import importlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from ai_player import AIParams, AIPlayer
+from dealer import deal_from_seed
+from game_logic import Game
+from mc_player import MonteCarloAIPlayer
+from opening_book import finishing_ranks
+
+# 防止 AI 出现非法出牌导致死循环
+MAX_TURNS = 1000
+# ELO 刻度: 相差 400 分对应 10 倍强度
+ELO_SCALE = 400 / math.log(10)
+ELO_BASE = 1500
+# 每对策略预先加一局平局, 全胜/全负时拟合仍有界
+PRIOR_GAMES = 1
+BOOTSTRAP = 200
+
+
+class NoEndgameAI(AIPlayer):
+    """不做残局搜索"""
+    endgame = None
+
+
+class NoBookAI(AIPlayer):
+    """不查开局手牌强度表"""
+    book = None
+
+
+POLICIES = {
+    'heuristic': AIPlayer,
+    'mc': MonteCarloAIPlayer,
+    'no-endgame': NoEndgameAI,
+    'no-book': NoBookAI,
+}
+
+
+def make_policy(spec):
+    """按名字、"模块:可调用对象" 或参数 JSON 文件构造策略"""
+    factory = POLICIES.get(spec)
+    if factory is None:
+        if spec.endswith('.json'):
+            return AIPlayer(AIParams.load(spec))
+        if ':' not in spec:
+            raise ValueError(f'unknown policy {spec!r}; choose from {sorted(POLICIES)}, module:callable or params .json')
+        module, attr = spec.split(':', 1)
+        factory = getattr(importlib.import_module(module), attr)
+    return factory()
+
+
+# ========== 对局(子进程) ==========
+
+_policies = None
+
+
+def _init_worker(specs):
+    global _policies
+    _policies = [make_policy(s) for s in specs]
+
+
+def lineup(seed, n_policies):
+    """牌局的座位阵容(策略序号): 策略不少于 4 个时随机选 4 个, 否则轮流重复补满"""
+    rng = random.Random(seed)
+    if n_policies >= 4:
+        return rng.sample(range(n_policies), 4)
+    seats = [i % n_policies for i in range(4)]
+    rng.shuffle(seats)
+    return seats
+
+
+def play_deal(seed, n_policies):
+    """同一副牌按阵容轮转 4 次, 返回 [(各座位策略序号, 各座位名次x2)], 未分胜负的轮次不计"""
+    base = lineup(seed, n_policies)
+    deck = deal_from_seed(seed)
+    results = []
+    for shift in range(4):
+        seats = [base[(s + shift) % 4] for s in range(4)]
+        game = Game()
+        game.set_deck(deck)
+        turns = 0
+        while game.winner is None and turns < MAX_TURNS:
+            pid = game.current_player
+            game.ai_play(pid, ai=_policies[seats[pid]])
+            turns += 1
+        if game.winner is not None:
+            results.append((seats, finishing_ranks(game.winner, game.hand_sizes())))
+    return results
+
+
+def _run_batch(seeds, n_policies):
+    return [(seed, play_deal(seed, n_policies)) for seed in seeds]
+
+
+# ========== 评分 ==========
+
+def pair_scores(results):
+    """一个牌局的两两结果 {(i, j): [i 的得分, 局数]}, i < j; 同一策略同桌时不计"""
+    scores = {}
+    for seats, ranks in results:
+        for a in range(4):
+            for b in range(a + 1, 4):
+                i, j = seats[a], seats[b]
+                if i == j:
+                    continue
+                s = 1.0 if ranks[a] < ranks[b] else 0.5 if ranks[a] == ranks[b] else 0.0
+                if i > j:
+                    i, j, s = j, i, 1 - s
+                entry = scores.setdefault((i, j), [0.0, 0])
+                entry[0] += s
+                entry[1] += 1
+    return scores
+
+
+def fit(pairs, n, iters=200, tol=1e-9):
+    """Bradley-Terry 最大似然(MM 迭代); pairs = {(i, j): [i 的得分, 局数]}, 返回对数强度(均值为 0)"""
+    wins = [0.0] * n
+    games = {}
+    for i in range(n):
+        for j in range(i + 1, n):
+            s, g = pairs.get((i, j), (0.0, 0))
+            s, g = s + PRIOR_GAMES / 2, g + PRIOR_GAMES
+            wins[i] += s
+            wins[j] += g - s
+            games[i, j] = g
+    gamma = [1.0] * n
+    for _ in range(iters):
+        new = []
+        for i in range(n):
+            denom = sum(games[min(i, j), max(i, j)] / (gamma[i] + gamma[j]) for j in range(n) if j != i)
+            new.append(wins[i] / denom)
+        scale = math.exp(sum(math.log(g) for g in new) / n)
+        new = [g / scale for g in new]
+        done = max(abs(a - b) for a, b in zip(new, gamma)) < tol
+        gamma = new
+        if done:
+            break
+    return [math.log(g) for g in gamma]
+
+
+def _sum_pairs(groups):
+    total = {}
+    for scores in groups:
+        for key, (s, g) in scores.items():
+            entry = total.setdefault(key, [0.0, 0])
+            entry[0] += s
+            entry[1] += g
+    return total
+
+
+def ratings(groups, n, bootstrap=BOOTSTRAP, alpha=0.05, seed=0):
+    """groups 为每个牌局的 pair_scores; 返回 (ELO 列表, 置信区间列表, 排名, 相邻两名先后稳定的比例)"""
+    theta = fit(_sum_pairs(groups), n)
+    elo = [ELO_BASE + ELO_SCALE * t for t in theta]
+    order = sorted(range(n), key=lambda i: -theta[i])
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(bootstrap if groups else 0):
+        pick = [groups[rng.randrange(len(groups))] for _ in groups]
+        samples.append(fit(_sum_pairs(pick), n, iters=50, tol=1e-6))
+    intervals = []
+    for i in range(n):
+        vals = sorted(ELO_BASE + ELO_SCALE * s[i] for s in samples) or [elo[i]]
+        lo = vals[int(alpha / 2 * (len(vals) - 1))]
+        hi = vals[int((1 - alpha / 2) * (len(vals) - 1))]
+        intervals.append((lo, hi))
+    stable = [sum(1 for s in samples if s[a] > s[b]) / len(samples) if samples else 0.0
+              for a, b in zip(order, order[1:])]
+    return elo, intervals, order, stable
+
+
+# ========== 主流程 ==========
+
+def run(specs, workers=None, seed=0, min_deals=100, max_deals=1000, batch_size=4,
+        check_every=20, confidence=0.95, bootstrap=BOOTSTRAP, log=sys.stderr):
+    """运行锦标赛直到排名稳定或达到 max_deals, 返回汇总字典"""
+    n = len(specs)
+    if n < 2:
+        raise ValueError('need at least two policies')
+    groups = []
+    stats = [[0, 0, 0] for _ in range(n)]  # 局数, 胜局, 名次和x2
+    seeds = iter(range(seed, seed + max_deals))
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    settled = False
+    result = None
+    next_check = min_deals
+
+    def batches():
+        while True:
+            chunk = [s for _, s in zip(range(batch_size), seeds)]
+            if not chunk:
+                return
+            yield chunk
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(specs,)) as pool:
+        pending = set()
+        source = batches()
+        for chunk in source:
+            pending.add(pool.submit(_run_batch, chunk, n))
+            if len(pending) >= workers * 2:
+                break
+        while pending and not settled:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                for _, results in fut.result():
+                    groups.append(pair_scores(results))
+                    for seats, ranks in results:
+                        for p, r in zip(seats, ranks):
+                            stats[p][0] += 1
+                            stats[p][1] += r == 2
+                            stats[p][2] += r
+                chunk = next(source, None)
+                if chunk is not None:
+                    pending.add(pool.submit(_run_batch, chunk, n))
+            if len(groups) >= next_check or not pending:
+                result = ratings(groups, n, bootstrap, 1 - confidence, seed)
+                stable = result[3]
+                settled = len(groups) >= min_deals and all(p >= confidence for p in stable)
+                # 重抽样的开销随牌局数增长, 评分间隔按比例放大
+                next_check = max(len(groups) + check_every, len(groups) * 5 // 4)
+                print(f'{len(groups)} 局: ' + ' > '.join(specs[i] for i in result[2]) +
+                      '  (' + ', '.join(f'{p:.2f}' for p in stable) + ')', file=log)
+        for fut in pending:
+            fut.cancel()
+
+    if result is None:
+        result = ratings(groups, n, bootstrap, 1 - confidence, seed)
+    elo, intervals, order, stable = result
+    return {
+        'deals': len(groups),
+        'settled': settled,
+        'seconds': round(time.perf_counter() - t0, 1),
+        'ranking': [{
+            'policy': specs[i],
+            'elo': round(elo[i], 1),
+            'ci': [round(intervals[i][0], 1), round(intervals[i][1], 1)],
+            'games': stats[i][0],
+            'win_rate': round(stats[i][1] / stats[i][0], 4) if stats[i][0] else 0,
+            'mean_rank': round(stats[i][2] / 2 / stats[i][0], 3) if stats[i][0] else 0,
+        } for i in order],
+        'adjacent_confidence': [round(p, 3) for p in stable],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='AI 策略锦标赛(复式轮转, Bradley-Terry 等级分)')
+    parser.add_argument('policies', nargs='+', help=f'策略: {", ".join(POLICIES)}, 模块:可调用对象 或 参数 JSON 文件')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='进程数(默认 CPU 核数)')
+    parser.add_argument('--seed', type=int, default=0, help='基础种子')
+    parser.add_argument('--min-deals', type=int, default=100, help='至少进行的牌局数(每个牌局 4 局; 重抽样在牌局很少时偏乐观)')
+    parser.add_argument('--max-deals', type=int, default=1000, help='最多进行的牌局数')
+    parser.add_argument('--batch-size', type=int, default=4, help='每个任务包含的牌局数')
+    parser.add_argument('--check-every', type=int, default=20, help='至少每隔多少个牌局重新评分')
+    parser.add_argument('--confidence', type=float, default=0.95, help='相邻两名先后需要的重抽样一致比例')
+    parser.add_argument('--bootstrap', type=int, default=BOOTSTRAP, help='重抽样次数')
+    parser.add_argument('--json', default=None, help='结果写入该 JSON 文件')
+    args = parser.parse_args(argv)
+
+    for spec in args.policies:
+        make_policy(spec)
+    summary = run(args.policies, args.workers, args.seed, args.min_deals, args.max_deals,
+                  args.batch_size, args.check_every, args.confidence, args.bootstrap)
+    print(f"{summary['deals']} 个牌局, {'排名已稳定' if summary['settled'] else '未稳定'}, 耗时 {summary['seconds']}s")
+    for rank, r in enumerate(summary['ranking'], 1):
+        print(f"{rank}. {r['policy']:<16} {r['elo']:7.1f}  [{r['ci'][0]:.1f}, {r['ci'][1]:.1f}]  "
+              f"局数 {r['games']}  胜率 {r['win_rate']:.2%}  平均名次 {r['mean_rank']:.2f}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == '__main__':
+    main()
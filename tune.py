@@ -0,0 +1,277 @@
+"""
+AI 决策阈值离线调参
+  - 搜索空间为 ai_player.PARAM_SPACE, 各参数按上下限归一化到 [0, 1]; 每一代以现任参数为中心高斯扰动出
+    一批候选(整数参数取整), 步长按本代是否找到更优参数放大或缩小((1, λ) 进化策略)
+  - 评估用复式牌局: 候选坐一个座位、现任坐其余三个, 同一副牌轮转 4 次, 候选坐过每个座位;
+    牌局得分 = 候选对三家现任两两胜负的均值(0~1, 0.5 为持平)。同一代的候选打同一串牌局(公共随机数)
+  - 牌局按批分发到 ProcessPoolExecutor, 各候选交替推进; 打满 min_deals 后得分的置信上界低于 0.5
+    (明显不如现任)的候选提前淘汰, 进程留给其余候选
+  - 一代结束时, 置信下界高于 0.5 的候选中均值最高的成为新现任, 立即写入输出文件(中断也不丢失进度)
+调好的参数放在 ai_player.PARAMS_PATH(默认 ai_params.json, 环境变量 AI_PARAMS)即被 AIPlayer 采用,
+可用 python tournament.py heuristic ai_params.json 复核。
+
+用法:
+  python tune.py -w 16 --generations 20 --population 16
+  python tune.py --start ai_params.json --only few_cards,bomb_risk --max-deals 4000
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from statistics import NormalDist
+
+from ai_player import PARAM_SPACE, PARAMS_PATH, AIParams, AIPlayer
+from dealer import deal_from_seed
+from game_logic import Game
+from opening_book import finishing_ranks
+from tournament import MAX_TURNS, pair_scores
+
+# 步长(归一化空间的标准差)的范围与调整倍数
+MIN_SIGMA = 0.02
+MAX_SIGMA = 0.5
+SIGMA_UP = 1.2
+SIGMA_DOWN = 0.85
+# 扰动后与现任或已有候选重复时的重采样次数
+MAX_RESAMPLE = 20
+
+
+# ========== 搜索空间 ==========
+
+def to_unit(params):
+    return [(getattr(params, name) - lo) / (hi - lo) for name, (_, lo, hi) in PARAM_SPACE.items()]
+
+
+def from_unit(x):
+    values = {}
+    for v, (name, (default, lo, hi)) in zip(x, PARAM_SPACE.items()):
+        value = lo + min(1.0, max(0.0, v)) * (hi - lo)
+        values[name] = round(value) if isinstance(default, int) else round(value, 4)
+    return AIParams(**values)
+
+
+def perturb(params, sigma, rng, names=None):
+    """names 为 None 时扰动全部参数, 否则只扰动其中列出的"""
+    x = to_unit(params)
+    return from_unit([v + rng.gauss(0, sigma) if names is None or name in names else v
+                      for name, v in zip(PARAM_SPACE, x)])
+
+
+def propose(incumbent, n, sigma, rng, names=None):
+    """n 组互不相同且不同于现任的候选; 步长太小扰动不出新值时可能少于 n 组"""
+    seen = {tuple(incumbent.to_dict().values())}
+    out = []
+    for _ in range(n * MAX_RESAMPLE):
+        if len(out) >= n:
+            break
+        cand = perturb(incumbent, sigma, rng, names)
+        key = tuple(cand.to_dict().values())
+        if key not in seen:
+            seen.add(key)
+            out.append(cand)
+    return out
+
+
+# ========== 对局(子进程) ==========
+
+_players = {}
+
+
+def _player(values):
+    """按参数取值缓存 AIPlayer; values 按 PARAM_SPACE 的顺序"""
+    ai = _players.get(values)
+    if ai is None:
+        if len(_players) >= 64:
+            _players.clear()
+        ai = _players[values] = AIPlayer(AIParams(**dict(zip(PARAM_SPACE, values))))
+    return ai
+
+
+def play_deal(seed, challenger, incumbent):
+    """候选依次坐 4 个座位(其余三家为现任), 返回候选对现任的平均得分; 4 轮都未分胜负时为 None"""
+    deck = deal_from_seed(seed)
+    results = []
+    for seat in range(4):
+        game = Game(ai=incumbent)
+        game.set_deck(deck)
+        turns = 0
+        while game.winner is None and turns < MAX_TURNS:
+            pid = game.current_player
+            game.ai_play(pid, ai=challenger if pid == seat else None)
+            turns += 1
+        if game.winner is not None:
+            seats = [1] * 4
+            seats[seat] = 0
+            results.append((seats, finishing_ranks(game.winner, game.hand_sizes())))
+    score, games = pair_scores(results).get((0, 1), (0.0, 0))
+    return score / games if games else None
+
+
+def _run_batch(seeds, challenger, incumbent):
+    a, b = _player(challenger), _player(incumbent)
+    return [play_deal(seed, a, b) for seed in seeds]
+
+
+# ========== 主流程 ==========
+
+class Candidate:
+    __slots__ = ('params', 'values', 'deals', 'total', 'total_sq', 'next_deal', 'dropped')
+
+    def __init__(self, params):
+        self.params = params
+        self.values = tuple(params.to_dict().values())
+        self.deals = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.next_deal = 0
+        self.dropped = False
+
+    def add(self, score):
+        self.deals += 1
+        self.total += score
+        self.total_sq += score * score
+
+    @property
+    def mean(self):
+        return self.total / self.deals if self.deals else 0.5
+
+    def bounds(self, z):
+        """均值的单侧置信下界与上界(牌局得分的正态近似)"""
+        if self.deals < 2:
+            return 0.0, 1.0
+        var = max(0.0, self.total_sq / self.deals - self.mean ** 2) * self.deals / (self.deals - 1)
+        half = z * math.sqrt(var / self.deals)
+        return self.mean - half, self.mean + half
+
+
+def race(pool, candidates, incumbent, seeds, workers, min_deals, batch_size, z):
+    """在同一串牌局上推进全部候选, 淘汰明显不如现任的; 返回本代打完的牌局数"""
+    inc_values = tuple(incumbent.to_dict().values())
+    pending = {}
+    played = 0
+
+    def fill():
+        while len(pending) < workers * 2:
+            active = [c for c in candidates if not c.dropped and c.next_deal < len(seeds)]
+            if not active:
+                return
+            c = min(active, key=lambda c: c.next_deal)
+            chunk = seeds[c.next_deal:c.next_deal + batch_size]
+            c.next_deal += len(chunk)
+            pending[pool.submit(_run_batch, chunk, c.values, inc_values)] = c
+
+    fill()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            c = pending.pop(fut)
+            for score in fut.result():
+                played += 1
+                if score is not None:
+                    c.add(score)
+            if not c.dropped and c.deals >= min_deals and c.bounds(z)[1] < 0.5:
+                c.dropped = True
+        fill()
+    return played
+
+
+def tune(start=None, generations=10, population=8, workers=None, seed=0, min_deals=40, max_deals=400,
+         batch_size=4, confidence=0.95, sigma=0.15, names=None, output=None, log=sys.stderr):
+    """逐代搜索, 返回汇总字典; output 非空时每次更新现任及结束时都写入该文件"""
+    rng = random.Random(seed)
+    incumbent = start or AIParams()
+    z = NormalDist().inv_cdf(confidence)
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    total_deals = 0
+    report = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for gen in range(generations):
+            candidates = [Candidate(p) for p in propose(incumbent, population, sigma, rng, names)]
+            if not candidates:
+                print(f'第 {gen + 1} 代: 步长 {sigma:.3f} 扰动不出新参数, 停止', file=log)
+                break
+            # 每代换一串新牌局, 避免现任对某串牌局过拟合
+            base = seed + gen * max_deals
+            seeds = list(range(base, base + max_deals))
+            played = race(pool, candidates, incumbent, seeds, workers, min_deals, batch_size, z)
+            total_deals += played
+
+            winners = [c for c in candidates if not c.dropped and c.bounds(z)[0] > 0.5]
+            best = max(winners, key=lambda c: c.mean) if winners else None
+            dropped = sum(c.dropped for c in candidates)
+            if best is not None:
+                incumbent = best.params
+                sigma = min(MAX_SIGMA, sigma * SIGMA_UP)
+                if output:
+                    incumbent.save(output)
+            else:
+                sigma = max(MIN_SIGMA, sigma * SIGMA_DOWN)
+            top = max(candidates, key=lambda c: c.mean)
+            lo, hi = top.bounds(z)
+            print(f'第 {gen + 1} 代: 候选 {len(candidates)} 组, 淘汰 {dropped}, 牌局 {played}, '
+                  f'最好 {top.mean:.3f} [{lo:.3f}, {hi:.3f}], '
+                  f'{"更新现任 " + repr(incumbent) if best else "现任保持"}, 步长 {sigma:.3f}', file=log)
+            report.append({
+                'generation': gen + 1,
+                'candidates': len(candidates),
+                'dropped': dropped,
+                'deals': played,
+                'best_score': round(top.mean, 4),
+                'improved': best is not None,
+                'sigma': round(sigma, 4),
+            })
+
+    if output:
+        incumbent.save(output)
+    elapsed = time.perf_counter() - t0
+    return {
+        'params': incumbent.to_dict(),
+        'deals': total_deals,
+        'games': total_deals * 4,
+        'seconds': round(elapsed, 1),
+        'games_per_sec': round(total_deals * 4 / elapsed, 1) if elapsed else 0,
+        'generations': report,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='AI 决策阈值离线调参(并行自我对局, 进化策略 + 提前淘汰)')
+    parser.add_argument('--start', default=None, help='起始参数 JSON(默认缺省参数)')
+    parser.add_argument('--only', default=None, help=f'只调这些参数, 逗号分隔: {", ".join(PARAM_SPACE)}')
+    parser.add_argument('--generations', type=int, default=10, help='代数')
+    parser.add_argument('--population', type=int, default=8, help='每代候选数')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='进程数(默认 CPU 核数)')
+    parser.add_argument('--seed', type=int, default=0, help='基础种子')
+    parser.add_argument('--min-deals', type=int, default=40, help='候选至少打多少个牌局才可能被淘汰')
+    parser.add_argument('--max-deals', type=int, default=400, help='每个候选每代最多打的牌局数(每个牌局 4 局)')
+    parser.add_argument('--batch-size', type=int, default=4, help='每个任务包含的牌局数')
+    parser.add_argument('--confidence', type=float, default=0.95, help='淘汰与更新现任所用的单侧置信度')
+    parser.add_argument('--sigma', type=float, default=0.15, help='初始步长(归一化空间的标准差)')
+    parser.add_argument('-o', '--output', default=PARAMS_PATH, help='最优参数写入该 JSON 文件')
+    parser.add_argument('--json', default=None, help='调参过程写入该 JSON 文件')
+    args = parser.parse_args(argv)
+
+    names = None
+    if args.only:
+        names = set(args.only.split(','))
+        unknown = names - set(PARAM_SPACE)
+        if unknown:
+            parser.error(f'unknown params: {", ".join(sorted(unknown))}')
+    start = AIParams.load(args.start) if args.start else None
+    summary = tune(start, args.generations, args.population, args.workers, args.seed, args.min_deals,
+                   args.max_deals, args.batch_size, args.confidence, args.sigma, names, args.output)
+    print(f"{summary['games']} 局, 耗时 {summary['seconds']}s ({summary['games_per_sec']} 局/s)")
+    print(json.dumps(summary['params'], ensure_ascii=False))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == '__main__':
+    main()